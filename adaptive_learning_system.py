@@ -1,18 +1,36 @@
+import heapq
+import json
 import math
+import mmap
+import os
+import pickle
+import sqlite3
+import struct
+import tempfile
 import time
+import weakref
+from collections import OrderedDict, deque
+from collections.abc import MutableMapping
 from datetime import datetime
 
+import numpy as np
+
 class KnowledgeGraph:
     def __init__(self):
         self.graph = {}
         self.node_weights = {}  # 节点权重
         self.edge_types = {}    # 边的类型
+        self.reverse_edges = {}  # 反向邻接索引: to_node -> {edge_type: {from_node: None}}
+        self._ancestor_cache = {}  # 传递前置闭包缓存: node -> frozenset
+        self._topo_rank = None   # 拓扑序缓存: node -> 序号
         
     def add_node(self, node, weight=1.0):
         """添加带权重的节点"""
         if node not in self.graph:
             self.graph[node] = []
             self.node_weights[node] = weight
+            self._ancestor_cache.pop(node, None)
+            self._topo_rank = None
             
     def add_edge(self, from_node, to_node, edge_type="related"):
         """添加带类型的边"""
@@ -20,45 +38,1064 @@ class KnowledgeGraph:
             self.graph[from_node].append(to_node)
             if from_node not in self.edge_types:
                 self.edge_types[from_node] = {}
+            old_type = self.edge_types[from_node].get(to_node)
             self.edge_types[from_node][to_node] = edge_type
             
+            # 维护反向索引，同一条边重复添加时以最新类型为准
+            if to_node not in self.graph and to_node not in self.reverse_edges:
+                self._topo_rank = None
+            incoming = self.reverse_edges.setdefault(to_node, {})
+            if old_type is not None and old_type != edge_type:
+                self._discard_incoming(incoming, old_type, from_node)
+            incoming.setdefault(edge_type, {})[from_node] = None
+            
+            if "prerequisite" in (old_type, edge_type) and old_type != edge_type:
+                self._invalidate_closure(to_node)
+            
+    def remove_edge(self, from_node, to_node):
+        """删除边，返回是否存在该边"""
+        edge_type = self.edge_types.get(from_node, {}).pop(to_node, None)
+        if edge_type is None:
+            return False
+        self.graph[from_node] = [n for n in self.graph[from_node] if n != to_node]
+        incoming = self.reverse_edges.get(to_node)
+        if incoming is not None:
+            self._discard_incoming(incoming, edge_type, from_node)
+            if not incoming:
+                del self.reverse_edges[to_node]
+                self._topo_rank = None
+        if edge_type == "prerequisite":
+            self._invalidate_closure(to_node)
+        return True
+    
+    def remove_node(self, node):
+        """删除节点及其所有出边和入边"""
+        if node not in self.graph and node not in self.reverse_edges:
+            return False
+        for to_node in list(self.edge_types.get(node, {})):
+            self.remove_edge(node, to_node)
+        for from_nodes in list(self.reverse_edges.get(node, {}).values()):
+            for from_node in list(from_nodes):
+                self.remove_edge(from_node, node)
+        self.graph.pop(node, None)
+        self.node_weights.pop(node, None)
+        self.edge_types.pop(node, None)
+        self.reverse_edges.pop(node, None)
+        self._ancestor_cache.pop(node, None)
+        self._topo_rank = None
+        return True
+    
+    @staticmethod
+    def _discard_incoming(incoming, edge_type, from_node):
+        """从反向索引中移除一条入边"""
+        from_nodes = incoming.get(edge_type)
+        if from_nodes is None:
+            return
+        from_nodes.pop(from_node, None)
+        if not from_nodes:
+            del incoming[edge_type]
+            
+    def get_incoming(self, node, edge_type=None):
+        """获取指向节点的所有来源节点，可按边类型过滤"""
+        incoming = self.reverse_edges.get(node)
+        if not incoming:
+            return []
+        if edge_type is not None:
+            return list(incoming.get(edge_type, ()))
+        return [from_node for from_nodes in incoming.values() for from_node in from_nodes]
+            
     def get_prerequisites(self, node):
-        """获取指定节点的所有前置知识点"""
-        prerequisites = []
-        for from_node, to_nodes in self.graph.items():
-            if node in to_nodes:
-                if self.edge_types[from_node][node] == "prerequisite":
-                    prerequisites.append(from_node)
-        return prerequisites
+        """获取指定节点的所有前置知识点（复杂度与节点入度成正比）"""
+        return self.get_incoming(node, "prerequisite")
+    
+    def get_all_prerequisites(self, node):
+        """获取节点的全部传递前置知识点（带缓存）"""
+        cached = self._ancestor_cache.get(node)
+        if cached is not None:
+            return cached
+            
+        ancestors = set()
+        stack = self.get_prerequisites(node)
+        while stack:
+            current = stack.pop()
+            if current in ancestors:
+                continue
+            ancestors.add(current)
+            # 已缓存的祖先集合是完整的，无需继续展开
+            known = self._ancestor_cache.get(current)
+            if known is not None:
+                ancestors.update(known)
+                continue
+            stack.extend(self.get_prerequisites(current))
+            
+        result = frozenset(ancestors)
+        self._ancestor_cache[node] = result
+        return result
+    
+    def _iter_successors(self, node, edge_type):
+        """遍历指定类型的出边"""
+        for to_node, current_type in self.edge_types.get(node, {}).items():
+            if current_type == edge_type:
+                yield to_node
+    
+    def _invalidate_closure(self, node):
+        """前置关系变化时，只失效受影响节点及其后继的缓存"""
+        self._topo_rank = None
+        if not self._ancestor_cache:
+            return
+        visited = {node}
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            self._ancestor_cache.pop(current, None)
+            for next_node in self._iter_successors(current, "prerequisite"):
+                if next_node not in visited:
+                    visited.add(next_node)
+                    stack.append(next_node)
+    
+    def topological_sort(self):
+        """按前置关系返回拓扑学习顺序，存在循环依赖时抛出 ValueError"""
+        return list(self._get_topo_rank())
+    
+    def _get_topo_rank(self):
+        """计算并缓存拓扑序（Kahn 算法）"""
+        if self._topo_rank is not None:
+            return self._topo_rank
+            
+        nodes = dict.fromkeys(self.graph)
+        nodes.update(dict.fromkeys(self.reverse_edges))
+        in_degree = {node: len(self.get_prerequisites(node)) for node in nodes}
+        queue = deque(node for node, degree in in_degree.items() if degree == 0)
+        rank = {}
+        while queue:
+            node = queue.popleft()
+            rank[node] = len(rank)
+            for next_node in self._iter_successors(node, "prerequisite"):
+                in_degree[next_node] -= 1
+                if in_degree[next_node] == 0:
+                    queue.append(next_node)
+                    
+        if len(rank) < len(nodes):
+            cycle_nodes = [node for node in nodes if node not in rank]
+            raise ValueError(f"知识图谱存在循环依赖: {cycle_nodes}")
+        self._topo_rank = rank
+        return rank
     
     def find_learning_path(self, start_node, end_node):
         """使用广度优先搜索找到最短学习路径"""
+        paths = self.find_learning_paths(start_node, [end_node])
+        return paths.get(end_node)
+    
+    def find_learning_paths(self, start_node, end_nodes):
+        """一次广度优先遍历找到从起点到多个目标的最短学习路径
+        
+        返回 {目标节点: 路径}，不可达或不存在的目标对应 None
+        """
+        results = {end_node: None for end_node in end_nodes}
+        if start_node not in self.graph:
+            return results
+        pending = {end_node for end_node in results if end_node in self.graph}
+        if not pending:
+            return results
+            
+        # 父指针代替逐节点复制路径
+        parents = {start_node: None}
+        queue = deque([start_node])
+        
+        while queue and pending:
+            vertex = queue.popleft()
+            for next_node in self.graph.get(vertex, ()):
+                if next_node in pending:
+                    pending.discard(next_node)
+                    results[next_node] = self._build_path(parents, vertex) + [next_node]
+                if next_node not in parents:
+                    parents[next_node] = vertex
+                    queue.append(next_node)
+        return results
+    
+    @staticmethod
+    def _build_path(parents, node):
+        """沿父指针回溯出从起点到节点的路径"""
+        path = []
+        while node is not None:
+            path.append(node)
+            node = parents[node]
+        path.reverse()
+        return path
+    
+    def find_weighted_learning_path(self, start_node, end_node, max_weight=None):
+        """使用 Dijkstra 算法找到总学习权重最小的路径
+        
+        路径权重为途经所有节点的 node_weights 之和，返回 (路径, 总权重)，
+        不可达或超过 max_weight 时返回 None
+        """
         if start_node not in self.graph or end_node not in self.graph:
             return None
-            
-        visited = {start_node}
-        queue = [(start_node, [start_node])]
+        return _weighted_shortest_path(
+            self._successors, self._predecessors, self._node_weight, start_node, end_node, max_weight=max_weight)
+    
+    def find_k_learning_paths(self, start_node, end_node, k=3, max_weight=None):
+        """返回总学习权重最小的 k 条无环备选路径 [(路径, 总权重), ...]"""
+        if start_node not in self.graph or end_node not in self.graph:
+            return []
+        return _k_shortest_paths(
+            self._successors, self._predecessors, self._node_weight, start_node, end_node, k, max_weight)
+    
+    def _successors(self, node):
+        return self.edge_types.get(node, {})
+    
+    def _predecessors(self, node):
+        for from_nodes in self.reverse_edges.get(node, {}).values():
+            yield from from_nodes
+    
+    def _node_weight(self, node):
+        return self.node_weights.get(node, 1.0)
+    
+    def freeze(self):
+        """生成只读的紧凑 CSR 表示"""
+        return FrozenKnowledgeGraph.from_graph(self)
+
+
+def _weighted_shortest_path(successors, predecessors, weight, start, end,
+                            blocked_nodes=(), blocked_edges=(), max_weight=None):
+    """基于二叉堆的双向 Dijkstra 搜索，两侧搜索前沿相遇后提前结束
+    
+    successors/predecessors(node) 返回后继/前驱节点，weight(node) 返回
+    经过该节点的代价。路径总代价为途经所有节点的权重之和。
+    """
+    start_weight = weight(start)
+    if start_weight < 0:
+        raise ValueError(f"节点权重不能为负: {start}")
+    if start == end:
+        return [start], start_weight
+    limit = math.inf if max_weight is None else max_weight - start_weight
+    
+    # 边 (u, v) 的代价为 weight(v)，正向距离不含起点权重，反向距离不含终点之前的节点
+    dist = ({start: 0.0}, {end: 0.0})
+    parents = ({start: None}, {end: None})
+    settled = (set(), set())
+    heaps = ([(0.0, 0, start)], [(0.0, 0, end)])
+    counter = 1
+    best = math.inf
+    meeting = None
+    
+    while heaps[0] and heaps[1]:
+        if heaps[0][0][0] + heaps[1][0][0] >= best:
+            break
+        side = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+        cost, _, node = heapq.heappop(heaps[side])
+        if node in settled[side]:
+            continue
+        settled[side].add(node)
         
-        while queue:
-            vertex, path = queue.pop(0)
-            for next_node in self.graph[vertex]:
-                if next_node == end_node:
-                    return path + [next_node]
-                if next_node not in visited:
-                    visited.add(next_node)
-                    queue.append((next_node, path + [next_node]))
+        if side == 0:
+            node_weight = None
+            neighbors = successors(node)
+        else:
+            node_weight = weight(node)
+            neighbors = predecessors(node)
+        for next_node in neighbors:
+            if next_node in blocked_nodes:
+                continue
+            edge = (node, next_node) if side == 0 else (next_node, node)
+            if edge in blocked_edges:
+                continue
+            edge_cost = weight(next_node) if side == 0 else node_weight
+            if edge_cost < 0:
+                raise ValueError(f"节点权重不能为负: {edge[1]}")
+            new_cost = cost + edge_cost
+            if new_cost > limit:
+                continue
+            if new_cost < dist[side].get(next_node, math.inf):
+                dist[side][next_node] = new_cost
+                parents[side][next_node] = node
+                heapq.heappush(heaps[side], (new_cost, counter, next_node))
+                counter += 1
+            other_cost = dist[1 - side].get(next_node)
+            if other_cost is not None and new_cost + other_cost < best:
+                best = new_cost + other_cost
+                meeting = next_node
+                
+    if meeting is None or best > limit:
         return None
+    path = []
+    node = meeting
+    while node is not None:
+        path.append(node)
+        node = parents[0][node]
+    path.reverse()
+    node = parents[1][meeting]
+    while node is not None:
+        path.append(node)
+        node = parents[1][node]
+    return path, start_weight + best
 
-class AdaptiveLearningSystem:
+
+def _k_shortest_paths(successors, predecessors, weight, start, end, k, max_weight=None):
+    """Yen 算法求 k 条最短无环路径"""
+    first = _weighted_shortest_path(
+        successors, predecessors, weight, start, end, max_weight=max_weight)
+    if first is None:
+        return []
+    paths = [first]
+    seen = {tuple(first[0])}
+    candidates = []
+    counter = 0
+    
+    while len(paths) < k:
+        prev_path = paths[-1][0]
+        root_cost = 0.0
+        for i, spur_node in enumerate(prev_path[:-1]):
+            root = prev_path[:i + 1]
+            blocked_edges = {
+                (path[i], path[i + 1]) for path, _ in paths
+                if len(path) > i + 1 and path[:i + 1] == root
+            }
+            remaining = None if max_weight is None else max_weight - root_cost
+            spur = _weighted_shortest_path(
+                successors, predecessors, weight, spur_node, end,
+                blocked_nodes=set(root[:-1]), blocked_edges=blocked_edges,
+                max_weight=remaining)
+            if spur is not None:
+                path = root[:-1] + spur[0]
+                if tuple(path) not in seen:
+                    seen.add(tuple(path))
+                    heapq.heappush(candidates, (root_cost + spur[1], counter, path))
+                    counter += 1
+            root_cost += weight(spur_node)
+        if not candidates:
+            break
+        cost, _, path = heapq.heappop(candidates)
+        paths.append((path, cost))
+    return paths
+
+
+def _gather_edges(indptr, frontier):
+    """收集一批节点的全部出边位置，返回 (边位置, 对应 frontier 下标)"""
+    starts = indptr[frontier]
+    counts = indptr[frontier + 1] - starts
+    total = int(counts.sum())
+    if total == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+    offsets = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+    positions = offsets + np.arange(total)
+    sources = np.repeat(np.arange(len(frontier)), counts)
+    return positions, sources
+
+
+class _MappedNames:
+    """快照文件中的节点名表，按需解码，不在加载时构建字典
+    
+    names[i] 返回编号 i 的节点名，get(name) 通过按字节序排好的编号数组二分查找
+    """
+    
+    def __init__(self, buffer, blob_offset, offsets, order):
+        self._buffer = buffer
+        self._blob_offset = blob_offset
+        self._offsets = offsets
+        self._order = order
+        
+    def __len__(self):
+        return len(self._order)
+    
+    def _encoded(self, node_id):
+        start = self._blob_offset + int(self._offsets[node_id])
+        end = self._blob_offset + int(self._offsets[node_id + 1])
+        return self._buffer[start:end]
+    
+    def __getitem__(self, node_id):
+        return self._encoded(node_id).decode("utf-8")
+    
+    def get(self, name, default=None):
+        if not isinstance(name, str):
+            return default
+        key = name.encode("utf-8")
+        lo, hi = 0, len(self._order)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._encoded(self._order[mid]) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self._order) and self._encoded(self._order[lo]) == key:
+            return int(self._order[lo])
+        return default
+
+
+class _MappedNameIndex:
+    """节点名到编号的只读映射视图"""
+    
+    def __init__(self, names):
+        self._names = names
+        
+    def get(self, name, default=None):
+        return self._names.get(name, default)
+    
+    def __getitem__(self, name):
+        node_id = self._names.get(name)
+        if node_id is None:
+            raise KeyError(name)
+        return node_id
+
+
+class FrozenKnowledgeGraph:
+    """只读的紧凑知识图谱
+    
+    节点名映射为整数编号，出边和入边以 CSR（压缩稀疏行）数组存储，
+    边类型和节点权重存放在平行的紧凑数组中。编号 [0, num_graph_nodes)
+    是通过 add_node 添加的节点，其余是只作为边终点出现的节点。
+    
+    save() 写出的快照可以用 load() 以内存映射方式打开，多个工作进程
+    共享同一份只读页缓存，加载耗时与图规模无关。用完后调用 close()
+    或使用 with 语句释放映射。
+    """
+    
+    SNAPSHOT_MAGIC = b"KGSNAP01"
+    # 快照头: 魔数, 节点数, add_node 节点数, 边数, 节点名字节数, 边类型表字节数
+    _HEADER = struct.Struct("<8sQQQQQ")
+    # 快照数组段: (属性名, 类型, 长度对应的计数字段)
+    _SECTIONS = [
+        ("indptr", np.int64, "nodes+1"),
+        ("indices", np.int32, "edges"),
+        ("edge_codes", np.uint8, "edges"),
+        ("node_weights", np.float64, "nodes"),
+        ("rev_indptr", np.int64, "nodes+1"),
+        ("rev_indices", np.int32, "edges"),
+        ("rev_edge_codes", np.uint8, "edges"),
+        ("name_offsets", np.int64, "nodes+1"),
+        ("name_order", np.int32, "nodes"),
+    ]
+    
+    def __init__(self, names, num_graph_nodes, node_weights, edge_type_names,
+                 indptr, indices, edge_codes, ids=None, reverse=None, snapshot=None):
+        self.names = names
+        self.num_graph_nodes = num_graph_nodes
+        self.node_weights = node_weights
+        self.edge_type_names = edge_type_names
+        self.indptr = indptr
+        self.indices = indices
+        self.edge_codes = edge_codes
+        self._ids = ids if ids is not None else {name: i for i, name in enumerate(names)}
+        self._prereq_code = (edge_type_names.index("prerequisite")
+                             if "prerequisite" in edge_type_names else -1)
+        if reverse is None:
+            self._build_reverse()
+        else:
+            self.rev_indptr, self.rev_indices, self.rev_edge_codes = reverse
+        self._snapshot = snapshot  # 快照的内存映射，数组直接引用其中的数据
+        self._ancestor_cache = {}
+        self._topo_rank = None
+        
+    @classmethod
+    def from_graph(cls, graph):
+        """从 KnowledgeGraph 构建紧凑表示"""
+        names = list(graph.graph)
+        ids = {name: i for i, name in enumerate(names)}
+        num_graph_nodes = len(names)
+        for to_node in graph.reverse_edges:
+            if to_node not in ids:
+                ids[to_node] = len(names)
+                names.append(to_node)
+                
+        type_codes = {}
+        degrees = []
+        targets = []
+        codes = []
+        for node in names[:num_graph_nodes]:
+            out_edges = graph.edge_types.get(node, {})
+            degrees.append(len(out_edges))
+            for to_node, edge_type in out_edges.items():
+                targets.append(ids[to_node])
+                codes.append(type_codes.setdefault(edge_type, len(type_codes)))
+        degrees.extend([0] * (len(names) - num_graph_nodes))
+        
+        indptr = np.zeros(len(names) + 1, dtype=np.int64)
+        np.cumsum(degrees, out=indptr[1:])
+        node_weights = np.array(
+            [graph.node_weights.get(node, 1.0) for node in names], dtype=np.float64)
+        return cls(
+            names, num_graph_nodes, node_weights, list(type_codes),
+            indptr, np.array(targets, dtype=np.int32), np.array(codes, dtype=np.uint8),
+            ids=ids)
+    
+    def save(self, path):
+        """写出可内存映射的二进制快照，先写临时文件再原子替换"""
+        encoded = []
+        for name in (self.names[i] for i in range(len(self.names))):
+            if not isinstance(name, str):
+                raise TypeError(f"快照只支持字符串节点名: {name!r}")
+            encoded.append(name.encode("utf-8"))
+        name_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=name_offsets[1:])
+        arrays = {
+            "indptr": self.indptr,
+            "indices": self.indices,
+            "edge_codes": self.edge_codes,
+            "node_weights": self.node_weights,
+            "rev_indptr": self.rev_indptr,
+            "rev_indices": self.rev_indices,
+            "rev_edge_codes": self.rev_edge_codes,
+            "name_offsets": name_offsets,
+            "name_order": np.array(sorted(range(len(encoded)), key=encoded.__getitem__),
+                                   dtype=np.int32),
+        }
+        names_blob = b"".join(encoded)
+        types_blob = json.dumps(self.edge_type_names, ensure_ascii=False).encode("utf-8")
+        
+        # 每次保存使用唯一的临时文件，并发保存同一路径时不会互相覆盖
+        f = tempfile.NamedTemporaryFile(
+            dir=os.path.dirname(os.path.abspath(path)), prefix=os.path.basename(path) + ".",
+            suffix=".tmp", delete=False)
+        try:
+            with f:
+                f.write(self._HEADER.pack(
+                    self.SNAPSHOT_MAGIC, len(self.names), self.num_graph_nodes,
+                    len(self.indices), len(names_blob), len(types_blob)))
+                for name, dtype, _ in self._SECTIONS:
+                    f.write(b"\0" * (-f.tell() % 8))  # 按 8 字节对齐
+                    f.write(np.ascontiguousarray(arrays[name], dtype=dtype).tobytes())
+                f.write(types_blob)
+                f.write(names_blob)
+            os.replace(f.name, path)
+        except BaseException:
+            try:
+                os.remove(f.name)
+            except FileNotFoundError:
+                pass
+            raise
+    
+    @classmethod
+    def load(cls, path):
+        """以只读内存映射方式加载快照，数组直接引用映射内存"""
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, num_nodes, num_graph_nodes, num_edges, names_len, types_len = \
+            cls._HEADER.unpack_from(buffer, 0)
+        if magic != cls.SNAPSHOT_MAGIC:
+            buffer.close()
+            raise ValueError(f"无效的知识图谱快照文件: {path}")
+            
+        counts = {"nodes": num_nodes, "nodes+1": num_nodes + 1, "edges": num_edges}
+        arrays = {}
+        offset = cls._HEADER.size
+        for name, dtype, count_key in cls._SECTIONS:
+            offset += -offset % 8
+            count = counts[count_key]
+            arrays[name] = np.frombuffer(buffer, dtype=dtype, count=count, offset=offset)
+            offset += count * np.dtype(dtype).itemsize
+        edge_type_names = json.loads(buffer[offset:offset + types_len].decode("utf-8"))
+        offset += types_len
+        
+        names = _MappedNames(buffer, offset, arrays["name_offsets"], arrays["name_order"])
+        return cls(
+            names, num_graph_nodes, arrays["node_weights"], edge_type_names,
+            arrays["indptr"], arrays["indices"], arrays["edge_codes"],
+            ids=_MappedNameIndex(names),
+            reverse=(arrays["rev_indptr"], arrays["rev_indices"], arrays["rev_edge_codes"]),
+            snapshot=buffer)
+    
+    def close(self):
+        """释放 load() 打开的内存映射，之后不能再使用这个图谱
+        
+        调用方仍持有从图谱取出的数组时，映射要等这些数组释放后才解除。
+        """
+        buffer, self._snapshot = self._snapshot, None
+        if buffer is None:
+            return
+        # 数组引用着映射内存，先解除引用才能关闭映射
+        self.names = self._ids = None
+        self.node_weights = self.indptr = self.indices = self.edge_codes = None
+        self.rev_indptr = self.rev_indices = self.rev_edge_codes = None
+        try:
+            buffer.close()
+        except BufferError:
+            pass
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+    
+    def _build_reverse(self):
+        """由出边 CSR 生成入边 CSR"""
+        num_nodes = len(self.names)
+        sources = np.repeat(np.arange(num_nodes, dtype=np.int32), np.diff(self.indptr))
+        order = np.argsort(self.indices, kind="stable")
+        self.rev_indices = sources[order]
+        self.rev_edge_codes = self.edge_codes[order]
+        self.rev_indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.indices, minlength=num_nodes), out=self.rev_indptr[1:])
+    
+    def __len__(self):
+        return len(self.names)
+    
+    def __contains__(self, node):
+        node_id = self._ids.get(node)
+        return node_id is not None and node_id < self.num_graph_nodes
+    
+    def node_id(self, node):
+        """节点名转换为整数编号，不存在时返回 None"""
+        return self._ids.get(node)
+    
+    def get_incoming(self, node, edge_type=None):
+        """获取指向节点的所有来源节点，可按边类型过滤"""
+        node_id = self._ids.get(node)
+        if node_id is None:
+            return []
+        start, end = self.rev_indptr[node_id], self.rev_indptr[node_id + 1]
+        sources = self.rev_indices[start:end]
+        if edge_type is not None:
+            if edge_type not in self.edge_type_names:
+                return []
+            code = self.edge_type_names.index(edge_type)
+            sources = sources[self.rev_edge_codes[start:end] == code]
+        return [self.names[i] for i in sources]
+    
+    def get_prerequisites(self, node):
+        """获取指定节点的所有前置知识点"""
+        return self.get_incoming(node, "prerequisite")
+    
+    def get_all_prerequisites(self, node):
+        """获取节点的全部传递前置知识点，按层批量展开入边"""
+        cached = self._ancestor_cache.get(node)
+        if cached is not None:
+            return cached
+        node_id = self._ids.get(node)
+        if node_id is None:
+            return frozenset()
+            
+        visited = np.zeros(len(self.names), dtype=bool)
+        frontier = np.array([node_id], dtype=np.int64)
+        while frontier.size:
+            positions, _ = _gather_edges(self.rev_indptr, frontier)
+            positions = positions[self.rev_edge_codes[positions] == self._prereq_code]
+            sources = self.rev_indices[positions]
+            frontier = np.unique(sources[~visited[sources]]).astype(np.int64)
+            visited[frontier] = True
+            
+        result = frozenset(self.names[i] for i in np.flatnonzero(visited))
+        self._ancestor_cache[node] = result
+        return result
+    
+    def topological_sort(self):
+        """按前置关系返回拓扑学习顺序，存在循环依赖时抛出 ValueError"""
+        return list(self._get_topo_rank())
+    
+    def _get_topo_rank(self):
+        """逐层批量执行 Kahn 算法并缓存拓扑序"""
+        if self._topo_rank is not None:
+            return self._topo_rank
+            
+        prereq_mask = self.edge_codes == self._prereq_code
+        in_degree = np.bincount(self.indices[prereq_mask], minlength=len(self.names))
+        frontier = np.flatnonzero(in_degree == 0)
+        order = []
+        while frontier.size:
+            order.append(frontier)
+            positions, _ = _gather_edges(self.indptr, frontier)
+            targets = self.indices[positions[prereq_mask[positions]]]
+            np.subtract.at(in_degree, targets, 1)
+            frontier = np.unique(targets[in_degree[targets] == 0])
+            
+        order = np.concatenate(order) if order else np.empty(0, dtype=np.int64)
+        if len(order) < len(self.names):
+            done = np.zeros(len(self.names), dtype=bool)
+            done[order] = True
+            cycle_nodes = [self.names[i] for i in np.flatnonzero(~done)]
+            raise ValueError(f"知识图谱存在循环依赖: {cycle_nodes}")
+        self._topo_rank = {self.names[i]: rank for rank, i in enumerate(order)}
+        return self._topo_rank
+    
+    def find_learning_path(self, start_node, end_node):
+        """使用广度优先搜索找到最短学习路径"""
+        paths = self.find_learning_paths(start_node, [end_node])
+        return paths.get(end_node)
+    
+    def find_learning_paths(self, start_node, end_nodes):
+        """逐层批量广度优先遍历，结果与 KnowledgeGraph.find_learning_paths 一致"""
+        results = {end_node: None for end_node in end_nodes}
+        if start_node not in self:
+            return results
+        pending = {self._ids[end_node]: end_node for end_node in results if end_node in self}
+        if not pending:
+            return results
+            
+        start = self._ids[start_node]
+        parents = np.full(len(self.names), -1, dtype=np.int64)
+        visited = np.zeros(len(self.names), dtype=bool)
+        visited[start] = True
+        frontier = np.array([start], dtype=np.int64)
+        
+        while frontier.size and pending:
+            positions, source_index = _gather_edges(self.indptr, frontier)
+            neighbors = self.indices[positions]
+            sources = frontier[source_index]
+            
+            # 按遍历顺序检查命中的目标
+            hits = np.flatnonzero(np.isin(neighbors, np.fromiter(pending, dtype=np.int64)))
+            for k in hits:
+                target = int(neighbors[k])
+                if target in pending:
+                    path = self._build_path(parents, int(sources[k]))
+                    results[pending.pop(target)] = path + [self.names[target]]
+                    
+            # 保留首次发现顺序，与队列 BFS 的父节点选择一致
+            fresh = ~visited[neighbors]
+            candidates = neighbors[fresh]
+            _, first = np.unique(candidates, return_index=True)
+            first.sort()
+            frontier = candidates[first].astype(np.int64)
+            parents[frontier] = sources[fresh][first]
+            visited[frontier] = True
+        return results
+    
+    def find_weighted_learning_path(self, start_node, end_node, max_weight=None):
+        """使用 Dijkstra 算法找到总学习权重最小的路径，返回 (路径, 总权重)"""
+        if start_node not in self or end_node not in self:
+            return None
+        result = _weighted_shortest_path(
+            self._successors, self._predecessors, self._node_weight,
+            self._ids[start_node], self._ids[end_node], max_weight=max_weight)
+        if result is None:
+            return None
+        return [self.names[i] for i in result[0]], result[1]
+    
+    def find_k_learning_paths(self, start_node, end_node, k=3, max_weight=None):
+        """返回总学习权重最小的 k 条无环备选路径 [(路径, 总权重), ...]"""
+        if start_node not in self or end_node not in self:
+            return []
+        paths = _k_shortest_paths(
+            self._successors, self._predecessors, self._node_weight,
+            self._ids[start_node], self._ids[end_node], k, max_weight)
+        return [([self.names[i] for i in path], cost) for path, cost in paths]
+    
+    def _successors(self, node_id):
+        return self.indices[self.indptr[node_id]:self.indptr[node_id + 1]].tolist()
+    
+    def _predecessors(self, node_id):
+        return self.rev_indices[self.rev_indptr[node_id]:self.rev_indptr[node_id + 1]].tolist()
+    
+    def _node_weight(self, node_id):
+        return float(self.node_weights[node_id])
+    
+    def _build_path(self, parents, node_id):
+        """沿父指针数组回溯路径"""
+        path = []
+        while node_id != -1:
+            path.append(self.names[node_id])
+            node_id = parents[node_id]
+        path.reverse()
+        return path
+
+class LearnerMetrics:
+    """单个 (用户, 知识点) 的在线学习指标累加器，每次答题 O(1) 更新
+    
+    用 Welford 算法维护答题时间的均值和方差；疲劳度按答题顺序累加相邻两次的
+    时间差和正确性变化，求和顺序与 _analyze_fatigue_level 相同，结果逐位一致。
+    """
+    
+    __slots__ = ('count', 'correct_count', 'mean_time', 'm2_time',
+                 'time_increase_sum', 'correct_change_sum', 'last_time', 'last_correct')
+    
     def __init__(self):
-        self.learning_patterns = {}
+        self.count = 0
+        self.correct_count = 0
+        self.mean_time = 0.0
+        self.m2_time = 0.0
+        self.time_increase_sum = 0
+        self.correct_change_sum = 0
+        self.last_time = 0
+        self.last_correct = 0
+        
+    @classmethod
+    def from_attempts(cls, attempts):
+        """由一份完整的答题记录计算指标，方差用两遍公式，与批量计算逐位一致"""
+        metrics = cls()
+        for attempt in attempts:
+            metrics.add(attempt['time_spent'], attempt['correct'])
+        if metrics.count:
+            times = [attempt['time_spent'] for attempt in attempts]
+            metrics.mean_time = sum(times) / len(times)
+            metrics.m2_time = sum((t - metrics.mean_time) ** 2 for t in times)
+        return metrics
+        
+    def continues(self, attempts):
+        """attempts 是否为已合并记录的延续：条数不少于已合并的次数，且对应位置的最后一条一致"""
+        if len(attempts) < self.count:
+            return False
+        if not self.count:
+            return True
+        last = attempts[self.count - 1]
+        return last['time_spent'] == self.last_time and (1 if last['correct'] else 0) == self.last_correct
+        
+    def add(self, time_spent, correct):
+        """合并一次答题记录"""
+        correct = 1 if correct else 0
+        if self.count:
+            self.time_increase_sum += time_spent - self.last_time
+            self.correct_change_sum += correct - self.last_correct
+        self.count += 1
+        self.correct_count += correct
+        delta = time_spent - self.mean_time
+        self.mean_time += delta / self.count
+        self.m2_time += delta * (time_spent - self.mean_time)
+        self.last_time = time_spent
+        self.last_correct = correct
+        
+    @property
+    def accuracy(self):
+        """准确率"""
+        if not self.count:
+            return 0
+        return self.correct_count / self.count
+    
+    @property
+    def consistency(self):
+        """学习一致性"""
+        if not self.count:
+            return 0
+        return 1 / (1 + self.m2_time / self.count)
+    
+    @property
+    def fatigue_level(self):
+        """学习疲劳度，与 _analyze_fatigue_level 的公式一致"""
+        if self.count < 2:
+            return 0
+        avg_increase = self.time_increase_sum / (self.count - 1)
+        avg_correct_change = self.correct_change_sum / (self.count - 1)
+        fatigue_score = (avg_increase * 0.6 + (-avg_correct_change) * 0.4)
+        return min(max(fatigue_score, 0), 1)
+
+class PerformanceHistogram:
+    """按小时（或一周中的小时）累计学习表现的直方图
+    
+    每个时间段只记录得分总和与次数，新记录 O(1) 合并；最佳时间段在查询时
+    才排序并缓存到下次更新。平均得分相同的时间段按第一次出现的先后排列。
+    """
+    
+    __slots__ = ('buckets', 'sums', 'counts', 'order', '_ranking')
+    
+    HOURS_OF_DAY = 24
+    HOURS_OF_WEEK = 168
+    
+    def __init__(self, buckets=HOURS_OF_DAY):
+        if buckets not in (self.HOURS_OF_DAY, self.HOURS_OF_WEEK):
+            raise ValueError("buckets 只能是 24 或 168")
+        self.buckets = buckets
+        self.sums = [0.0] * buckets
+        self.counts = [0] * buckets
+        self.order = []  # 有记录的桶，按第一次出现的先后
+        self._ranking = []
+        
+    def bucket(self, timestamp):
+        """时间对应的桶编号：一天中的小时，或 星期 * 24 + 小时"""
+        if self.buckets == self.HOURS_OF_WEEK:
+            return timestamp.weekday() * 24 + timestamp.hour
+        return timestamp.hour
+    
+    def add(self, timestamp, score):
+        """合并一条表现记录"""
+        index = self.bucket(timestamp)
+        if not self.counts[index]:
+            self.order.append(index)
+        self.sums[index] += score
+        self.counts[index] += 1
+        self._ranking = None
+        
+    def best_hours(self, k=3):
+        """平均表现最好的 k 个时间段"""
+        if self._ranking is None:
+            self._ranking = _rank_buckets(self.sums, self.counts, self.order)
+        return self._ranking[:k]
+
+
+def _rank_buckets(sums, counts, order):
+    """按平均得分从高到低排列有记录的时间段，得分相同时保持 order 中的先后（稳定排序）"""
+    return sorted(order, key=lambda i: sums[i] / counts[i], reverse=True)
+
+
+class ProfileStore(MutableMapping):
+    """按用户存放数据的有界存储
+    
+    最近使用的 capacity 个条目常驻内存（LRU），被淘汰的冷数据序列化后
+    写入本地 SQLite 文件，再次访问时自动加载回内存。热数据在内存中原地
+    修改，只在被淘汰时写盘，因此不要长期持有取出的对象引用。
+    用完应调用 close() 或使用 with 语句；未关闭的存储在被回收时关闭连接并删除临时文件。
+    """
+    
+    def __init__(self, capacity=10000, spill_path=None, table='profiles'):
+        if capacity < 1:
+            raise ValueError("capacity 必须大于 0")
+        self.capacity = capacity
+        self.spill_path = spill_path
+        self.table = table
+        self._hot = OrderedDict()
+        self._conn = None
+        self._temp_file = spill_path is None
+        self._finalizer = None
+        
+    def _cold(self):
+        """首次淘汰时才创建磁盘存储"""
+        if self._conn is None:
+            if self.spill_path is None:
+                fd, self.spill_path = tempfile.mkstemp(prefix='profiles_', suffix='.db')
+                os.close(fd)
+            self._conn = sqlite3.connect(self.spill_path)
+            self._finalizer = weakref.finalize(
+                self, ProfileStore._cleanup, self._conn, self.spill_path if self._temp_file else None)
+            self._conn.execute(
+                f'CREATE TABLE IF NOT EXISTS {self.table} (key BLOB PRIMARY KEY, value BLOB NOT NULL)')
+        return self._conn
+    
+    @staticmethod
+    def _encode_key(key):
+        return pickle.dumps(key, protocol=pickle.HIGHEST_PROTOCOL)
+    
+    def _delete_cold(self, encoded):
+        """删除磁盘上的条目并立即提交：多个存储共用一个文件时，未提交的写事务会锁住其他存储"""
+        with self._conn:
+            self._conn.execute(f'DELETE FROM {self.table} WHERE key = ?', (encoded,))
+    
+    def _load_cold(self, key):
+        """从磁盘取出条目并删除，返回 (是否存在, 值)"""
+        if self._conn is None:
+            return False, None
+        encoded = self._encode_key(key)
+        row = self._conn.execute(
+            f'SELECT value FROM {self.table} WHERE key = ?', (encoded,)).fetchone()
+        if row is None:
+            return False, None
+        self._delete_cold(encoded)
+        return True, pickle.loads(row[0])
+    
+    def _evict(self):
+        """把最久未使用的条目写入磁盘"""
+        spilled = []
+        while len(self._hot) > self.capacity:
+            key, value = self._hot.popitem(last=False)
+            spilled.append((self._encode_key(key), pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)))
+        if spilled:
+            conn = self._cold()
+            conn.executemany(f'INSERT OR REPLACE INTO {self.table} (key, value) VALUES (?, ?)', spilled)
+            conn.commit()
+            
+    def __getitem__(self, key):
+        if key in self._hot:
+            self._hot.move_to_end(key)
+            return self._hot[key]
+        found, value = self._load_cold(key)
+        if not found:
+            raise KeyError(key)
+        self._hot[key] = value
+        self._evict()
+        return value
+    
+    def __setitem__(self, key, value):
+        self._hot[key] = value
+        self._hot.move_to_end(key)
+        if self._conn is not None:
+            self._delete_cold(self._encode_key(key))
+        self._evict()
+        
+    def __delitem__(self, key):
+        if key in self._hot:
+            del self._hot[key]
+            if self._conn is not None:
+                self._delete_cold(self._encode_key(key))
+            return
+        found, _ = self._load_cold(key)
+        if not found:
+            raise KeyError(key)
+        
+    def __contains__(self, key):
+        if key in self._hot:
+            return True
+        if self._conn is None:
+            return False
+        row = self._conn.execute(
+            f'SELECT 1 FROM {self.table} WHERE key = ?', (self._encode_key(key),)).fetchone()
+        return row is not None
+    
+    def __iter__(self):
+        yield from list(self._hot)
+        if self._conn is not None:
+            for (encoded,) in self._conn.execute(f'SELECT key FROM {self.table}').fetchall():
+                yield pickle.loads(encoded)
+                
+    def __len__(self):
+        cold = 0
+        if self._conn is not None:
+            cold = self._conn.execute(f'SELECT COUNT(*) FROM {self.table}').fetchone()[0]
+        return len(self._hot) + cold
+    
+    @property
+    def hot_size(self):
+        """常驻内存的条目数"""
+        return len(self._hot)
+    
+    @staticmethod
+    def _cleanup(conn, temp_path):
+        """关闭连接并删除临时文件；不能引用存储本身，否则存储永远不会被回收"""
+        try:
+            conn.close()
+        except sqlite3.ProgrammingError:
+            # 回收可能发生在其他线程，连接无法在那里关闭，临时文件照样删除
+            pass
+        if temp_path is not None:
+            try:
+                os.remove(temp_path)
+            except FileNotFoundError:
+                pass
+    
+    def close(self):
+        """关闭磁盘存储，自动创建的临时文件一并删除"""
+        if self._conn is not None:
+            self._finalizer()
+            self._conn = None
+            if self._temp_file:
+                self.spill_path = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+class AdaptiveLearningSystem:
+    def __init__(self, knowledge_graph=None, profile_capacity=10000, spill_path=None):
+        # 按用户存放的数据都使用有界 LRU 存储，冷数据写入同一个 SQLite 文件的不同表
+        self.learning_patterns = ProfileStore(profile_capacity, spill_path, 'learning_patterns')
         self.content_difficulty = {}
-        self.user_profiles = {}
-        self.knowledge_graph = KnowledgeGraph()
-        self.learning_sessions = {}  # 记录学习会话
+        self.user_profiles = ProfileStore(profile_capacity, spill_path, 'user_profiles')
+        # 可传入 FrozenKnowledgeGraph.load() 加载的共享只读快照
+        self.knowledge_graph = knowledge_graph if knowledge_graph is not None else KnowledgeGraph()
+        self.learning_sessions = ProfileStore(profile_capacity, spill_path, 'learning_sessions')  # 记录学习会话
+        # 在线学习指标: user_id -> {topic_id: LearnerMetrics}
+        self.learner_metrics = ProfileStore(profile_capacity, spill_path, 'learner_metrics')
+    
+    def close(self):
+        """关闭各用户数据存储的磁盘文件"""
+        for store in (self.learning_patterns, self.user_profiles,
+                      self.learning_sessions, self.learner_metrics):
+            store.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
     
     class UserProfile:
-        def __init__(self):
+        __slots__ = ('strengths', 'weaknesses', 'learning_speed', 'preferred_times',
+                     'attention_span', 'learning_style', 'fatigue_pattern',
+                     'forgetting_curves', 'best_learning_hours', 'accuracy_history',
+                     'performance_histogram')
+        
+        HISTORY_LIMIT = 100  # 准确率历史默认保留条数
+        
+        def __init__(self, history_limit=None):
             self.strengths = {}  # 强项领域
             self.weaknesses = {}  # 弱项领域
             self.learning_speed = {}  # 各领域学习速度
@@ -68,17 +1105,59 @@ class AdaptiveLearningSystem:
             self.fatigue_pattern = {}  # 疲劳度模式
             self.forgetting_curves = {}  # 遗忘曲线
             self.best_learning_hours = []  # 最佳学习时间段
+            # 准确率历史（环形缓冲，超出上限时丢弃最早的记录）
+            self.accuracy_history = deque(maxlen=history_limit or self.HISTORY_LIMIT)
+            self.performance_histogram = PerformanceHistogram()  # 分时段学习表现
+            
+        def to_dict(self):
+            """转换为字典，便于展示和序列化"""
+            data = {name: getattr(self, name) for name in self.__slots__}
+            data['accuracy_history'] = list(self.accuracy_history)
+            data['performance_histogram'] = self.performance_histogram.best_hours()
+            return data
+    
+    def record_attempt(self, user_id, topic_id, time_spent, correct):
+        """记录一次答题，增量更新在线学习指标"""
+        metrics = self.learner_metrics.setdefault(user_id, {}).setdefault(topic_id, LearnerMetrics())
+        metrics.add(time_spent, correct)
+        return metrics
+    
+    def _learner_metrics(self, user_id, topic_id, topic_data):
+        """获取学习指标：topic_data 带有 exercise_attempts 时按这份记录计算，
+        否则读取 record_attempt 累计的在线指标"""
+        attempts = topic_data.get('exercise_attempts')
+        if attempts is not None:
+            return LearnerMetrics.from_attempts(attempts)
+        return self.learner_metrics.get(user_id, {}).get(topic_id) or LearnerMetrics()
+    
+    def _fold_attempts(self, user_id, topic_id, attempts):
+        """把按时间追加的完整答题记录中新增的部分合并进在线指标
+        
+        累加器已合并前 count 条时只用 record_attempt 合并之后的记录，每次提交的开销与
+        历史长度无关；冷启动（没有累加器）或记录不是已合并记录的延续时才整体重算。
+        """
+        metrics = self.learner_metrics.get(user_id, {}).get(topic_id)
+        if metrics is None or not metrics.continues(attempts):
+            metrics = LearnerMetrics.from_attempts(attempts)
+            self.learner_metrics.setdefault(user_id, {})[topic_id] = metrics
+            return metrics
+        for index in range(metrics.count, len(attempts)):
+            attempt = attempts[index]
+            metrics = self.record_attempt(user_id, topic_id, attempt['time_spent'], attempt['correct'])
+        return metrics
     
     def analyze_learning_ability(self, user_id, topic_data):
         profile = self.user_profiles.get(user_id)
+        metrics = self._learner_metrics(user_id, topic_data['topic_id'], topic_data)
+        total_time = topic_data.get('completion_time', 0)
         
         # 分析学习能力指标
         ability_metrics = {
-            'comprehension_speed': self._calculate_comprehension_speed(topic_data),
-            'accuracy_rate': self._calculate_accuracy(topic_data),
-            'consistency': self._analyze_learning_consistency(topic_data),
+            'comprehension_speed': metrics.correct_count / total_time if total_time > 0 else 0,
+            'accuracy_rate': metrics.accuracy,
+            'consistency': metrics.consistency,
             'difficulty_handling': self._analyze_difficulty_adaptation(topic_data),
-            'fatigue_level': self._analyze_fatigue_level(topic_data),
+            'fatigue_level': metrics.fatigue_level,
             'retention_rate': self._calculate_retention_rate(user_id, topic_data)
         }
         
@@ -86,6 +1165,68 @@ class AdaptiveLearningSystem:
         self._update_user_profile(profile, ability_metrics)
         return ability_metrics
     
+    def analyze_learning_ability_batch(self, attempts, topic_info=None, update_profiles=True):
+        """批量分析多个用户、多个知识点的学习能力
+        
+        attempts 为列式答题记录 {'user_id': [...], 'topic_id': [...],
+        'time_spent': [...], 'correct': [...]}，同一 (用户, 知识点) 的记录
+        按答题先后排列。topic_info 可选提供 {(user_id, topic_id): {'completion_time',
+        'correct_rate'}}。返回 {(user_id, topic_id): 能力指标}，与 _calculate_accuracy、
+        _analyze_learning_consistency、_analyze_fatigue_level 等逐个计算的结果一致。
+        """
+        topic_info = topic_info or {}
+        users, user_codes = np.unique(np.asarray(attempts['user_id']), return_inverse=True)
+        topics, topic_codes = np.unique(np.asarray(attempts['topic_id']), return_inverse=True)
+        times = np.asarray(attempts['time_spent'], dtype=np.float64)
+        correct = np.asarray(attempts['correct'], dtype=bool).astype(np.float64)
+        if times.size == 0:
+            return {}
+            
+        # 按 (用户, 知识点) 分组；bincount 按原始顺序逐项累加，与 Python sum 结果一致
+        keys, groups = np.unique(user_codes * len(topics) + topic_codes, return_inverse=True)
+        n_groups = len(keys)
+        counts = np.bincount(groups, minlength=n_groups).astype(np.float64)
+        correct_counts = np.bincount(groups, weights=correct, minlength=n_groups)
+        accuracy = correct_counts / counts
+        
+        mean_times = np.bincount(groups, weights=times, minlength=n_groups) / counts
+        squared = (times - mean_times[groups]) ** 2
+        variance = np.bincount(groups, weights=squared, minlength=n_groups) / counts
+        consistency = 1 / (1 + variance)
+        
+        # 疲劳度：组内相邻答题的时间与正确率变化
+        order = np.argsort(groups, kind='stable')
+        sorted_groups = groups[order]
+        same_group = sorted_groups[1:] == sorted_groups[:-1]
+        diff_groups = sorted_groups[1:][same_group]
+        time_increases = np.diff(times[order])[same_group]
+        correct_changes = np.diff(correct[order])[same_group]
+        n_diffs = counts - 1
+        with np.errstate(divide='ignore', invalid='ignore'):
+            avg_increase = np.bincount(diff_groups, weights=time_increases, minlength=n_groups) / n_diffs
+            avg_correct_change = np.bincount(diff_groups, weights=correct_changes, minlength=n_groups) / n_diffs
+        fatigue = np.clip(avg_increase * 0.6 + (-avg_correct_change) * 0.4, 0, 1)
+        fatigue[counts < 2] = 0
+        
+        results = {}
+        for i, key in enumerate(keys):
+            user_id = users[key // len(topics)].item()
+            topic_id = topics[key % len(topics)].item()
+            info = topic_info.get((user_id, topic_id), {})
+            total_time = info.get('completion_time', 0)
+            ability_metrics = {
+                'comprehension_speed': correct_counts[i].item() / total_time if total_time > 0 else 0,
+                'accuracy_rate': accuracy[i].item(),
+                'consistency': consistency[i].item(),
+                'difficulty_handling': info.get('correct_rate', 0),
+                'fatigue_level': fatigue[i].item(),
+                'retention_rate': self._calculate_retention_rate(user_id, {'topic_id': topic_id})
+            }
+            if update_profiles:
+                self._update_user_profile(self.user_profiles.get(user_id), ability_metrics)
+            results[(user_id, topic_id)] = ability_metrics
+        return results
+    
     def _calculate_comprehension_speed(self, topic_data):
         """计算理解速度"""
         total_time = topic_data.get('completion_time', 0)
@@ -153,28 +1294,60 @@ class AdaptiveLearningSystem:
         retention_rate = math.exp(-0.1 * hours_passed)
         return retention_rate
     
-    def analyze_best_learning_time(self, user_id, performance_history):
-        """分析用户最佳学习时间段"""
+    def record_performance(self, user_id, timestamp, performance_score):
+        """记录一次学习表现，增量更新用户的分时段直方图和最佳学习时间"""
+        profile = self.user_profiles[user_id]
+        profile.performance_histogram.add(timestamp, performance_score)
+        profile.best_learning_hours = profile.performance_histogram.best_hours()
+    
+    def analyze_best_learning_time(self, user_id, performance_history=None, k=3):
+        """分析用户最佳学习时间段
+        
+        不传 performance_history 时直接读取 record_performance 维护的直方图；
+        传入时按这份历史记录单独统计。
+        """
+        if performance_history is None:
+            profile = self.user_profiles.get(user_id)
+            return profile.performance_histogram.best_hours(k) if profile else []
         if not performance_history:
             return []
             
-        # 按小时统计学习效果
-        hourly_performance = {}
+        histogram = PerformanceHistogram()
         for record in performance_history:
-            hour = record['timestamp'].hour
-            if hour not in hourly_performance:
-                hourly_performance[hour] = []
-            hourly_performance[hour].append(record['performance_score'])
-        
-        # 计算每个小时的平均表现
-        best_hours = []
-        for hour, scores in hourly_performance.items():
-            avg_score = sum(scores) / len(scores)
-            best_hours.append((hour, avg_score))
+            histogram.add(record['timestamp'], record['performance_score'])
+        return histogram.best_hours(k)
+    
+    @staticmethod
+    def best_learning_hours_batch(user_ids, timestamps, performance_scores, k=3,
+                                  buckets=PerformanceHistogram.HOURS_OF_DAY):
+        """批量计算所有用户的最佳学习时间段，返回 {user_id: [时间段, ...]}"""
+        if len(user_ids) == 0:
+            return {}
+        users, user_codes = np.unique(np.asarray(user_ids), return_inverse=True)
+        stamps = np.asarray(timestamps, dtype='datetime64[s]')
+        days = stamps.astype('datetime64[D]')
+        index = (stamps.astype('datetime64[h]') - days).astype(np.int64)
+        if buckets == PerformanceHistogram.HOURS_OF_WEEK:
+            # 1970-01-01 是星期四，换算成 weekday() 的编号（星期一为 0）
+            index += (days.astype(np.int64) + 3) % 7 * 24
+            
+        flat = user_codes * buckets + index
+        size = len(users) * buckets
+        sums = np.bincount(flat, weights=np.asarray(performance_scores, dtype=np.float64),
+                           minlength=size).reshape(len(users), buckets)
+        counts = np.bincount(flat, minlength=size).reshape(len(users), buckets)
+        # 每个桶第一次出现的位置，平均得分相同时先出现的在前，与逐条累计的结果一致
+        first_seen = np.full(size, len(flat), dtype=np.int64)
+        np.minimum.at(first_seen, flat, np.arange(len(flat)))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            averages = np.where(counts > 0, sums / counts, -np.inf)
+        ranking = np.lexsort((first_seen.reshape(len(users), buckets), -averages), axis=1)[:, :k]
         
-        # 返回表现最好的3个时间段
-        best_hours.sort(key=lambda x: x[1], reverse=True)
-        return [hour for hour, _ in best_hours[:3]]
+        results = {}
+        for row, user_id in enumerate(users):
+            top = ranking[row]
+            results[user_id.item()] = top[counts[row, top] > 0].tolist()
+        return results
     
     def recommend_next_steps(self, user_id):
         profile = self.user_profiles[user_id]
@@ -236,10 +1409,18 @@ class AdaptiveLearningSystem:
             self.learning_patterns[user_id] = {}
         self.learning_patterns[user_id][topic_id] = performance_data
         
-        # 更新疲劳度模式
-        current_fatigue = self._analyze_fatigue_level(performance_data)
-        if 'fatigue_pattern' not in profile.__dict__:
-            profile.fatigue_pattern = {}
+        # 更新分时段学习表现
+        score = performance_data.get('performance_score', performance_data.get('accuracy'))
+        if score is not None:
+            self.record_performance(user_id, performance_data.get('timestamp') or datetime.now(), score)
+        
+        # 更新疲劳度模式：新增的答题记录合并进在线指标，不重新遍历完整历史
+        attempts = performance_data.get('exercise_attempts')
+        if attempts is not None:
+            metrics = self._fold_attempts(user_id, topic_id, attempts)
+        else:
+            metrics = self._learner_metrics(user_id, topic_id, performance_data)
+        current_fatigue = metrics.fatigue_level
         profile.fatigue_pattern[topic_id] = current_fatigue
         
         # 分析表现并调整策略
@@ -279,15 +1460,8 @@ class AdaptiveLearningSystem:
             return
         
         # 基于新的度量更新用户能力指标
-        if 'learning_speed' not in profile.__dict__:
-            profile.learning_speed = {'current': 0}
         profile.learning_speed['current'] = metrics['comprehension_speed']
-        
-        if 'strengths' not in profile.__dict__:
-            profile.strengths = {}
-        if 'accuracy_history' not in profile.strengths:
-            profile.strengths['accuracy_history'] = []
-        profile.strengths['accuracy_history'].append(metrics['accuracy_rate'])
+        profile.accuracy_history.append(metrics['accuracy_rate'])
     
     def generate_personalized_plan(self, user_id):
         profile = self.user_profiles[user_id]
@@ -347,9 +1521,11 @@ class AdaptiveLearningSystem:
         """计算学习时间"""
         return 45  # 示例：45分钟
     
-    def _check_prerequisites(self):
-        """检查前置条件"""
-        return ['basic_math']
+    def _check_prerequisites(self, topic, mastered_topics=()):
+        """检查前置条件，按学习顺序返回尚未掌握的前置知识点"""
+        missing = self.knowledge_graph.get_all_prerequisites(topic) - set(mastered_topics)
+        rank = self.knowledge_graph._get_topo_rank()
+        return sorted(missing, key=rank.get)
     
     def _customize_resources(self, learning_style):
         """自定义学习资源"""
@@ -405,7 +1581,7 @@ class TestAdaptiveLearningSystem:
         profile.weaknesses = {"化学": 0.4}
         profile.learning_speed = {"数学": 1.2, "物理": 1.0, "化学": 0.8}
         
-        print(f"用户画像创建成功: {profile.__dict__}")
+        print(f"用户画像创建成功: {profile.to_dict()}")
         
     def test_learning_ability_analysis(self):
         """测试学习能力分析"""
@@ -512,4 +1688,5 @@ class TestAdaptiveLearningSystem:
 
 if __name__ == "__main__":
     test_system = TestAdaptiveLearningSystem()
-    test_system.run_all_tests() 
\ No newline at end of file
+    with test_system.learning_system:
+        test_system.run_all_tests() 
\ No newline at end of file
@@ -1,26 +1,60 @@
-from flask import Flask, request, jsonify, render_template, redirect, url_for
+from flask import Flask, request, jsonify, render_template, redirect, url_for, make_response
 from flask_login import LoginManager, login_user, login_required, current_user, logout_user
-from models import db, User, Problem, Submission, LearningPath
-from services import UserService, ProblemService, RecommendationService
+from models import db, User, Problem, Submission, LearningPath, upgrade_schema
+from services import UserService, ProblemService, RecommendationService, ActivityTrackingService
+from crawl_scheduler import CrawlScheduler
+from cache import ResponseCache, MemoryCache, FileCache
+import asyncio
 import os
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev')
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///app.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['CACHE_BACKEND'] = os.environ.get('CACHE_BACKEND', 'memory')  # memory 或 file
+app.config['CACHE_DIR'] = os.environ.get('CACHE_DIR', 'cache')
+app.config['CACHE_TTL'] = int(os.environ.get('CACHE_TTL', 300))
 
 db.init_app(app)
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
 
+recommendation_service = RecommendationService()
+
+if app.config['CACHE_BACKEND'] == 'file':
+    response_cache = ResponseCache(FileCache(app.config['CACHE_DIR'], ttl=app.config['CACHE_TTL']))
+else:
+    response_cache = ResponseCache(MemoryCache(ttl=app.config['CACHE_TTL']))
+
+def cached_page(name, entities, render, *parts):
+    """按实体版本缓存渲染好的页面，客户端带着相同的 ETag 时直接返回 304，不查询数据库
+
+    页面中显示了当前用户名，所以缓存键和 ETag 中包含用户 ID。
+    """
+    parts = (current_user.get_id(),) + parts
+    # 版本号只读一次，ETag 和页面内容对应同一个版本
+    key = response_cache.key(name, entities, *parts)
+    etag = response_cache.etag_of(key)
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        response = make_response(response_cache.get_or_set(key, render))
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'  # 浏览器每次都带 ETag 验证
+    return response
+
+def row_to_dict(row, columns=None):
+    """把查询结果转成字典再缓存，避免缓存与会话绑定的模型对象"""
+    return {name: getattr(row, name) for name in columns or row.__table__.columns.keys()}
+
 @login_manager.user_loader
 def load_user(user_id):
     return User.query.get(int(user_id))
 
 @app.before_first_request
 def create_tables():
-    db.create_all()
+    upgrade_schema()
 
 @app.route('/')
 def index():
@@ -63,8 +97,11 @@ def register():
 @login_required
 def learning_paths():
     if request.method == 'GET':
-        paths = LearningPath.query.all()
-        return render_template('learning_paths.html', paths=paths)
+        def render():
+            paths = response_cache.cached('learning_paths:rows', ['learning_paths'],
+                                          lambda: [row_to_dict(p) for p in LearningPath.query.all()])
+            return render_template('learning_paths.html', paths=paths)
+        return cached_page('learning_paths', ['learning_paths'], render)
     
     data = request.get_json()
     path = LearningPath(
@@ -74,13 +111,38 @@ def learning_paths():
     )
     db.session.add(path)
     db.session.commit()
+    response_cache.invalidate('learning_paths', f'learning_path:{path.id}')
     return jsonify({'message': '创建成功'})
 
 @app.route('/learning-paths/<int:path_id>')
 @login_required
 def learning_path_detail(path_id):
-    path = LearningPath.query.get_or_404(path_id)
-    return render_template('learning_path_detail.html', path=path)
+    entities = [f'learning_path:{path_id}']
+    def render():
+        path = response_cache.cached('learning_path:row', entities,
+                                     lambda: row_to_dict(LearningPath.query.get_or_404(path_id)), path_id)
+        return render_template('learning_path_detail.html', path=path)
+    return cached_page('learning_path_detail', entities, render, path_id)
+
+# 题目页只缓存展示用的列，提交带来的统计变化不会让缓存失效
+PROBLEM_PAGE_COLUMNS = ('id', 'title', 'content', 'difficulty', 'source', 'url', 'tags')
+
+@app.route('/problems/<int:problem_id>')
+@login_required
+def problem_detail(problem_id):
+    entities = [f'problem:{problem_id}']
+    def render():
+        problem = response_cache.cached(
+            'problem:row', entities,
+            lambda: row_to_dict(Problem.query.get_or_404(problem_id), PROBLEM_PAGE_COLUMNS), problem_id)
+        return render_template('problem_detail.html', problem=problem)
+    return cached_page('problem_detail', entities, render, problem_id)
+
+@app.route('/logout')
+@login_required
+def logout():
+    logout_user()
+    return redirect(url_for('login'))
 
 @app.route('/submit/<int:problem_id>', methods=['POST'])
 @login_required
@@ -96,7 +158,11 @@ def submit_solution(problem_id):
         time_spent=data.get('time_spent')
     )
     db.session.add(submission)
+    ActivityTrackingService.record_submission(submission)
+    ProblemService.record_submission(submission)
     db.session.commit()
+    UserService.invalidate_statistics(current_user.id)
+    recommendation_service.record_submission(submission)
     return jsonify({'message': '提交成功'})
 
 @app.route('/api/statistics')
@@ -105,6 +171,40 @@ def get_statistics():
     stats = UserService.get_user_statistics(current_user)
     return jsonify(stats)
 
+@app.route('/api/recommendations')
+@login_required
+def get_recommendations():
+    count = request.args.get('count', 5, type=int)
+    problems = recommendation_service.recommend_problems(current_user, count)
+    return jsonify([{
+        'id': p.id,
+        'title': p.title,
+        'difficulty': p.difficulty
+    } for p in problems])
+
+@app.cli.command('upgrade-db')
+def upgrade_db():
+    """为已有数据库补齐新增的列和索引"""
+    upgrade_schema()
+    print('数据库结构已升级')
+
+@app.cli.command('rebuild-rollups')
+def rebuild_rollups():
+    """从原始记录重建每日学习汇总"""
+    count = ActivityTrackingService.rebuild_daily_rollups()
+    print(f'已重建 {count} 条每日汇总')
+
+@app.cli.command('recompute-problem-stats')
+def recompute_problem_stats():
+    """从提交记录重算题目的提交数、通过率和平均用时"""
+    count = ProblemService.recompute_statistics()
+    print(f'已重算 {count} 道题目的统计')
+
+@app.cli.command('crawl')
+def crawl():
+    """立即运行一轮抓取并导入新题目，与后台调度共用锁，不会同时运行"""
+    asyncio.run(CrawlScheduler().run_once())
+
 @app.errorhandler(404)
 def not_found_error(error):
     return render_template('404.html'), 404
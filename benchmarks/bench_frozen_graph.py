@@ -0,0 +1,70 @@
+"""知识图谱存储基准测试：嵌套字典 vs 紧凑 CSR 表示
+
+运行: python -m benchmarks.bench_frozen_graph
+"""
+import gc
+import random
+import time
+import tracemalloc
+
+from adaptive_learning_system import KnowledgeGraph
+
+
+def build_graph(n_nodes, avg_degree, seed=42):
+    rng = random.Random(seed)
+    graph = KnowledgeGraph()
+    for i in range(n_nodes):
+        graph.add_node(f"topic_{i}", weight=rng.uniform(0.5, 2.0))
+    for i in range(n_nodes):
+        for _ in range(avg_degree):
+            j = rng.randrange(n_nodes)
+            edge_type = "prerequisite" if rng.random() < 0.7 else "related"
+            graph.add_edge(f"topic_{i}", f"topic_{j}", edge_type)
+    return graph
+
+
+def measure_memory(factory):
+    """返回 factory 生成对象常驻的内存字节数"""
+    gc.collect()
+    tracemalloc.start()
+    obj = factory()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, size
+
+
+def bench(func, args_list):
+    start = time.perf_counter()
+    for args in args_list:
+        func(*args)
+    return (time.perf_counter() - start) / len(args_list)
+
+
+def main(n_nodes=50000, avg_degree=4, queries=100):
+    graph, dict_size = measure_memory(lambda: build_graph(n_nodes, avg_degree))
+    frozen, frozen_size = measure_memory(lambda: build_graph(n_nodes, avg_degree).freeze())
+
+    rng = random.Random(0)
+    nodes = [f"topic_{rng.randrange(n_nodes)}" for _ in range(queries)]
+    pairs = [(nodes[i], nodes[-i - 1]) for i in range(queries)]
+    multi = [(node, nodes[:20]) for node in nodes[:20]]
+
+    print(f"节点数: {n_nodes}, 边数: {n_nodes * avg_degree}")
+    print(f"内存占用: 字典 {dict_size / 2**20:.1f} MiB, CSR {frozen_size / 2**20:.1f} MiB, "
+          f"节省 {1 - frozen_size / dict_size:.0%}")
+
+    cases = [
+        ("前置知识", "get_prerequisites", [(n,) for n in nodes]),
+        ("传递闭包", "get_all_prerequisites", [(n,) for n in nodes]),
+        ("单目标路径", "find_learning_path", pairs),
+        ("多目标路径", "find_learning_paths", multi),
+    ]
+    for label, method, args_list in cases:
+        dict_time = bench(getattr(graph, method), args_list)
+        frozen_time = bench(getattr(frozen, method), args_list)
+        print(f"{label}: 字典 {dict_time * 1e3:.3f} ms, CSR {frozen_time * 1e3:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""前置知识查询基准测试：反向索引 vs 全图扫描
+
+运行: python -m benchmarks.bench_prerequisites
+"""
+import random
+import time
+
+from adaptive_learning_system import KnowledgeGraph
+
+
+def scan_prerequisites(graph, node):
+    """原实现：遍历所有节点的出边列表"""
+    prerequisites = []
+    for from_node, to_nodes in graph.graph.items():
+        if node in to_nodes:
+            if graph.edge_types[from_node][node] == "prerequisite":
+                prerequisites.append(from_node)
+    return prerequisites
+
+
+def build_graph(n_nodes, avg_degree, seed=42):
+    rng = random.Random(seed)
+    graph = KnowledgeGraph()
+    for i in range(n_nodes):
+        graph.add_node(f"topic_{i}")
+    for i in range(n_nodes):
+        for _ in range(avg_degree):
+            j = rng.randrange(n_nodes)
+            edge_type = "prerequisite" if rng.random() < 0.7 else "related"
+            graph.add_edge(f"topic_{i}", f"topic_{j}", edge_type)
+    return graph
+
+
+def bench(func, graph, nodes):
+    start = time.perf_counter()
+    for node in nodes:
+        func(node)
+    return (time.perf_counter() - start) / len(nodes)
+
+
+def main(n_nodes=20000, avg_degree=3, queries=200):
+    graph = build_graph(n_nodes, avg_degree)
+    rng = random.Random(0)
+    nodes = [f"topic_{rng.randrange(n_nodes)}" for _ in range(queries)]
+
+    for node in nodes[:20]:
+        assert sorted(graph.get_prerequisites(node)) == sorted(scan_prerequisites(graph, node))
+
+    scan_time = bench(lambda n: scan_prerequisites(graph, n), graph, nodes)
+    index_time = bench(graph.get_prerequisites, graph, nodes)
+    print(f"节点数: {n_nodes}, 边数: {n_nodes * avg_degree}, 查询次数: {queries}")
+    print(f"全图扫描: {scan_time * 1e6:.1f} us/次")
+    print(f"反向索引: {index_time * 1e6:.1f} us/次")
+    print(f"加速比: {scan_time / index_time:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
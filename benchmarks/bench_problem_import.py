@@ -0,0 +1,46 @@
+"""题目批量导入基准测试：流式读取 JSON Lines 并按批写入
+
+运行: python -m benchmarks.bench_problem_import [题目数]
+"""
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from app import app
+from models import db, Problem
+from services import ProblemService
+
+
+def write_problems(path, count, duplicate_every=10):
+    """生成测试文件，每 duplicate_every 条中有一条与前面的标题重复"""
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(count):
+            title = f'题目{i - 1 if i % duplicate_every == duplicate_every - 1 else i}'
+            f.write(json.dumps({'title': title, 'content': '题目内容' * 20,
+                                'difficulty': ('easy', 'medium', 'hard')[i % 3], 'source': 'bench',
+                                'url': f'https://example.com/problems/{i}', 'tags': ['array']},
+                               ensure_ascii=False) + '\n')
+
+
+def main(count=1_000_000, batch_size=5000):
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'problems.jsonl')
+        write_problems(source, count)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        with app.app_context():
+            db.create_all()
+            start = time.perf_counter()
+            imported, skipped = ProblemService.bulk_import(source, batch_size=batch_size, commit=True)
+            elapsed = time.perf_counter() - start
+            assert Problem.query.count() == imported
+            db.session.remove()
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"导入 {count} 条: 新增 {imported}, 跳过 {skipped}, 用时 {elapsed:.2f} s, "
+              f"{count / elapsed:,.0f} 条/秒, 峰值内存 {peak:.0f} MB")
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:2]))
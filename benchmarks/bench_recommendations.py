@@ -0,0 +1,66 @@
+"""推荐基准测试：单用户 top-N 推荐延迟
+
+运行: python -m benchmarks.bench_recommendations
+超出延迟预算时以非零状态码退出。
+"""
+import random
+import sys
+import time
+
+from app import app
+from models import db, User, Problem, Submission
+from services import RecommendationService
+
+# 单用户推荐的延迟预算（毫秒，按 p95 统计）
+RECOMMEND_BUDGET_MS = 10
+
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+def main(n_users=10000, n_problems=5000, submissions_per_user=40, samples=200):
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    rng = random.Random(0)
+    with app.app_context():
+        db.create_all()
+        db.session.execute(Problem.__table__.insert(), [
+            {'title': f'题目{i}', 'content': '内容', 'difficulty': rng.choice(['easy', 'medium', 'hard']),
+             'source': 'bench'} for i in range(n_problems)
+        ])
+        db.session.execute(User.__table__.insert(), [
+            {'username': f'bench_{i}', 'email': f'bench_{i}@example.com', 'skill_level': rng.random()}
+            for i in range(n_users)
+        ])
+        db.session.commit()
+        user_ids = [i for i, in db.session.query(User.id)]
+        problem_ids = [i for i, in db.session.query(Problem.id)]
+        db.session.execute(Submission.__table__.insert(), [
+            {'user_id': user_id, 'problem_id': rng.choice(problem_ids),
+             'is_correct': rng.random() < 0.6, 'time_spent': rng.randrange(30, 900)}
+            for user_id in user_ids for _ in range(submissions_per_user)
+        ])
+        db.session.commit()
+
+        service = RecommendationService()
+        start = time.perf_counter()
+        service.refresh()
+        print(f"全量构建 {n_users} 用户 × {n_problems} 题目: {time.perf_counter() - start:.2f} s")
+
+        users = User.query.filter(User.id.in_(rng.sample(user_ids, samples))).all()
+        timings = []
+        for user in users:
+            start = time.perf_counter()
+            service.recommend_problems(user, count=10)
+            timings.append((time.perf_counter() - start) * 1e3)
+        p50, p95 = percentile(timings, 0.5), percentile(timings, 0.95)
+        passed = p95 <= RECOMMEND_BUDGET_MS
+        print(f"单用户推荐: p50 {p50:.2f} ms, p95 {p95:.2f} ms, 预算 {RECOMMEND_BUDGET_MS} ms, "
+              f"{'通过' if passed else '超出预算'}")
+        db.drop_all()
+        return passed
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,41 @@
+"""爬虫详情页抓取吞吐量基准测试：不同页面池大小下的每秒页面数
+
+运行: python -m benchmarks.bench_spider_fetch
+需要安装 playwright 及 chromium（playwright install chromium）。
+"""
+import asyncio
+import time
+
+from benchmarks.fixture_server import FixtureServer
+from education_spider import EducationSpider
+
+# 原实现每道题固定等待 3 秒加 0.5 秒
+LEGACY_SLEEP_PER_PROBLEM = 3.5
+
+
+async def fetch_details(base_url, count, concurrency, rate):
+    spider = EducationSpider(concurrency=concurrency, requests_per_second=rate)
+    spider.LEETCODE_BASE_URL = base_url
+    await spider.setup_browser(headless=True, channel=None)
+    try:
+        start = time.perf_counter()
+        contents = await asyncio.gather(*(spider._fetch_leetcode_problem_content(f'/problems/p{i}/')
+                                          for i in range(count)))
+        elapsed = time.perf_counter() - start
+    finally:
+        await spider.browser.close()
+        await spider.playwright.stop()
+    failed = sum(1 for c in contents if c == '题目内容获取失败')
+    return elapsed, failed
+
+
+def main(count=50, latency=0.2, rate=20.0, pool_sizes=(1, 4, 8)):
+    print(f"原实现估计: 至少 {count * LEGACY_SLEEP_PER_PROBLEM:.0f} s（仅固定等待）")
+    with FixtureServer(problem_count=count, latency=latency) as server:
+        for size in pool_sizes:
+            elapsed, failed = asyncio.run(fetch_details(server.base_url, count, size, rate))
+            print(f"页面池 {size:>2}: {count} 页用时 {elapsed:6.2f} s, {count / elapsed:6.2f} 页/秒, 失败 {failed}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""爬虫运行模式基准测试：调试模式与生产模式（无界面、拦截资源）的吞吐量和峰值内存
+
+运行: python -m benchmarks.bench_spider_modes
+使用 benchmarks/fixtures 下保存的列表页和详情页，图片、字体、样式表和视频在本地生成。
+需要安装 playwright 及 chromium（playwright install chromium）；调试模式需要图形界面。
+"""
+import asyncio
+import os
+import re
+import tempfile
+import threading
+import time
+
+from benchmarks.fixture_server import FixtureServer
+from education_spider import EducationSpider
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding='utf-8') as f:
+        return f.read()
+
+
+def asset_routes(list_html, detail_html, count):
+    """为页面引用的静态资源生成内容，大小接近真实站点"""
+    sizes = {'.png': ('image/png', 200_000), '.woff2': ('font/woff2', 100_000),
+             '.css': ('text/css', 150_000), '.mp4': ('video/mp4', 2_000_000)}
+    paths = set(re.findall(r'(/assets/[\w.$]+)', list_html + detail_html))
+    routes = {}
+    for path in paths:
+        for i in range(count) if '$id' in path else [None]:
+            concrete = path.replace('$id', str(i)) if i is not None else path
+            content_type, size = sizes[os.path.splitext(concrete)[1]]
+            body = b'/* */' * (size // 5) if content_type == 'text/css' else os.urandom(size)
+            routes[concrete] = (content_type, body)
+    return routes
+
+
+def process_tree_rss():
+    """当前进程及其所有子进程的常驻内存之和（MB），仅支持 Linux"""
+    children = {}
+    for pid in filter(str.isdigit, os.listdir('/proc')):
+        try:
+            with open(f'/proc/{pid}/stat') as f:
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+            children.setdefault(ppid, []).append(int(pid))
+        except (OSError, IndexError, ValueError):
+            continue
+    total, stack = 0, [os.getpid()]
+    while stack:
+        pid = stack.pop()
+        stack.extend(children.get(pid, []))
+        try:
+            with open(f'/proc/{pid}/status') as f:
+                total += next(int(line.split()[1]) for line in f if line.startswith('VmRSS:'))
+        except (OSError, StopIteration):
+            continue
+    return total / 1024
+
+
+class PeakMemory:
+    """后台线程定期采样进程树内存，记录峰值"""
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak = 0
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, process_tree_rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+async def crawl(base_url, production, limit, store_path):
+    spider = EducationSpider(store_path=store_path, legacy_path=None, concurrency=4,
+                             requests_per_second=50, production=production)
+    spider.LEETCODE_BASE_URL = base_url
+    await spider.setup_browser(channel=None)
+    try:
+        start = time.perf_counter()
+        questions = await spider.fetch_leetcode_problems(limit=limit)
+        return questions, time.perf_counter() - start
+    finally:
+        spider.close_questions()
+        await spider.browser.close()
+        await spider.playwright.stop()
+
+
+def main(latency=0.05):
+    list_html, detail_html = read_fixture('problemset.html'), read_fixture('problem.html')
+    count = list_html.count('class="odd:bg-layer-1"')
+    routes = asset_routes(list_html, detail_html, count)
+    results = []
+    for label, production in (('调试模式', False), ('生产模式', True)):
+        with FixtureServer(latency=latency, extra_routes=routes,
+                           list_html=list_html, detail_html=detail_html) as server:
+            with PeakMemory() as memory, tempfile.TemporaryDirectory() as tmp:
+                questions, elapsed = asyncio.run(crawl(server.base_url, production, count,
+                                                       os.path.join(tmp, 'questions.jsonl')))
+            pages = len(questions) + 1
+            results.append(f"{label}: {pages} 页用时 {elapsed:6.2f} s, {pages / elapsed:6.2f} 页/秒, "
+                           f"请求数 {server.requests}, 峰值内存 {memory.peak:.0f} MB")
+    print('\n'.join(results))
+
+
+if __name__ == '__main__':
+    main()
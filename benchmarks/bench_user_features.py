@@ -0,0 +1,56 @@
+"""用户特征计算基准测试：逐条懒加载 vs 单条聚合查询
+
+运行: python -m benchmarks.bench_user_features
+"""
+import random
+import time
+
+from app import app
+from models import db, User, Problem, Submission
+from services import RecommendationService
+
+
+def legacy_features(user):
+    """原实现：加载全部提交并逐条访问 problem 关系（N+1 查询）"""
+    submissions = Submission.query.filter_by(user_id=user.id).all()
+    return [s.problem.difficulty for s in submissions]
+
+
+def main(volumes=(100, 1000, 10000)):
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    rng = random.Random(0)
+    with app.app_context():
+        db.create_all()
+        problems = [Problem(title=f'题目{i}', content='内容', difficulty=rng.choice(['easy', 'medium', 'hard']),
+                            source='bench') for i in range(500)]
+        db.session.add_all(problems)
+        db.session.commit()
+        problem_ids = [p.id for p in problems]
+        service = RecommendationService()
+
+        for count in volumes:
+            user = User(username=f'bench_{count}', email=f'bench_{count}@example.com')
+            db.session.add(user)
+            db.session.commit()
+            db.session.execute(Submission.__table__.insert(), [
+                {'user_id': user.id, 'problem_id': rng.choice(problem_ids),
+                 'is_correct': rng.random() < 0.6, 'time_spent': rng.randrange(30, 900)}
+                for _ in range(count)
+            ])
+            db.session.commit()
+
+            start = time.perf_counter()
+            legacy_features(user)
+            legacy = (time.perf_counter() - start) * 1e3
+            db.session.expunge_all()
+            user = User.query.get(user.id)
+
+            start = time.perf_counter()
+            service.get_user_features(user)
+            aggregate = (time.perf_counter() - start) * 1e3
+            print(f"提交数 {count:>6}: 逐条加载 {legacy:9.2f} ms, 聚合查询 {aggregate:6.2f} ms")
+        db.drop_all()
+
+
+if __name__ == '__main__':
+    main()
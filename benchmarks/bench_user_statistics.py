@@ -0,0 +1,78 @@
+"""用户统计接口基准测试：ORM 全量加载 vs 聚合查询 + 缓存
+
+运行: python -m benchmarks.bench_user_statistics
+随提交量增长，聚合查询的耗时应远低于逐行加载，缓存命中耗时应保持不变。
+"""
+import time
+from datetime import datetime, timedelta, UTC
+
+from app import app
+from models import db, User, Problem, Submission
+from services import UserService
+
+
+def legacy_statistics(user):
+    """原实现：把窗口内的提交全部加载为 ORM 对象后在 Python 中汇总"""
+    recent_time = datetime.now(UTC) - timedelta(hours=24)
+    recent_submissions = Submission.query.filter(
+        Submission.user_id == user.id,
+        Submission.submitted_at >= recent_time
+    ).all()
+    total_time = sum(s.time_spent for s in recent_submissions) if recent_submissions else 0
+    correct_submissions = [s for s in recent_submissions if s.is_correct]
+    return total_time, len(correct_submissions), len(recent_submissions)
+
+
+def seed(user, problem, count):
+    now = datetime.now(UTC)
+    db.session.execute(Submission.__table__.insert(), [
+        {
+            'user_id': user.id,
+            'problem_id': problem.id,
+            'is_correct': i % 3 != 0,
+            'time_spent': 60 + i % 300,
+            'submitted_at': now - timedelta(seconds=i * 80000 // max(count, 1)),
+        }
+        for i in range(count)
+    ])
+    db.session.commit()
+
+
+def timed(func, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1e3
+
+
+def main(volumes=(100, 1000, 10000, 50000)):
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    with app.app_context():
+        db.create_all()
+        problem = Problem(title='基准题目', content='内容', difficulty='easy', source='bench')
+        db.session.add(problem)
+        db.session.commit()
+
+        for count in volumes:
+            user = User(username=f'bench_{count}', email=f'bench_{count}@example.com')
+            db.session.add(user)
+            db.session.commit()
+            seed(user, problem, count)
+
+            legacy = timed(lambda: legacy_statistics(user))
+
+            def uncached():
+                UserService.invalidate_statistics(user.id)
+                UserService.get_user_statistics(user)
+            aggregate = timed(uncached)
+            UserService.get_user_statistics(user)
+            cached = timed(lambda: UserService.get_user_statistics(user))
+            print(f"提交数 {count:>6}: ORM 加载 {legacy:8.2f} ms, 聚合查询 {aggregate:6.2f} ms, "
+                  f"缓存命中 {cached:6.3f} ms")
+        db.drop_all()
+
+
+if __name__ == '__main__':
+    main()
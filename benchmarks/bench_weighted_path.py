@@ -0,0 +1,56 @@
+"""加权学习路径基准测试：检查 10 万条边规模下的查询延迟预算
+
+运行: python -m benchmarks.bench_weighted_path
+超出延迟预算时以非零状态码退出。
+"""
+import random
+import sys
+import time
+
+from benchmarks.bench_frozen_graph import build_graph
+
+# 延迟预算（毫秒，按 p95 统计）
+SHORTEST_PATH_BUDGET_MS = 50
+K_PATHS_BUDGET_MS = 500
+
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def bench(func, pairs):
+    samples = []
+    found = 0
+    for start, end in pairs:
+        begin = time.perf_counter()
+        result = func(start, end)
+        samples.append((time.perf_counter() - begin) * 1e3)
+        found += bool(result)
+    return percentile(samples, 0.5), percentile(samples, 0.95), found
+
+
+def main(n_nodes=25000, avg_degree=4, queries=50, k=3):
+    graph = build_graph(n_nodes, avg_degree)
+    rng = random.Random(1)
+    pairs = [(f"topic_{rng.randrange(n_nodes)}", f"topic_{rng.randrange(n_nodes)}")
+             for _ in range(queries)]
+
+    print(f"节点数: {n_nodes}, 边数: {n_nodes * avg_degree}, 查询次数: {queries}")
+    checks = [
+        ("最短加权路径", graph.find_weighted_learning_path, pairs, SHORTEST_PATH_BUDGET_MS),
+        (f"{k} 条备选路径", lambda s, e: graph.find_k_learning_paths(s, e, k=k),
+         pairs[:10], K_PATHS_BUDGET_MS),
+    ]
+    ok = True
+    for label, func, args, budget in checks:
+        p50, p95, found = bench(func, args)
+        passed = p95 <= budget
+        ok = ok and passed
+        print(f"{label}: p50 {p50:.1f} ms, p95 {p95:.1f} ms, 预算 {budget} ms, "
+              f"可达 {found}/{len(args)} -> {'通过' if passed else '超出预算'}")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
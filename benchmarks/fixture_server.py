@@ -0,0 +1,79 @@
+"""爬虫基准测试用的本地题目站点
+
+列表页和详情页的结构与 EducationSpider 使用的选择器一致，每个请求可以加上固定延迟来模拟网络往返。
+"""
+import string
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def list_page(count):
+    rows = ''.join(
+        f'<div class="odd:bg-layer-1"><a class="h-5" href="/problems/p{i}/">{i}. 题目{i}</a>'
+        f'<span class="difficulty">{("简单", "中等", "困难")[i % 3]}</span></div>'
+        for i in range(count)
+    )
+    return f'<html><head><title>题库</title></head><body>{rows}</body></html>'
+
+
+def detail_page(i):
+    return (f'<html><head><title>题目{i}</title></head><body><div role="main">'
+            f'<div class="content__1Y2H">题目{i}的描述：给定一个整数数组 nums，返回满足条件的下标。</div>'
+            f'</div></body></html>')
+
+
+class FixtureServer:
+    """在后台线程运行的本地站点，用法: with FixtureServer() as server: server.base_url"""
+    def __init__(self, problem_count=50, latency=0.2, extra_routes=None, list_html=None, detail_html=None):
+        self.problem_count = problem_count
+        self.latency = latency
+        self.extra_routes = extra_routes or {}  # 路径 -> (内容类型, 字节)
+        self.list_html = list_html  # 保存的列表页，不提供时按 problem_count 生成
+        self.detail_html = detail_html  # 保存的详情页模板，$id 替换为题号
+        self.requests = 0
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests += 1
+                time.sleep(server.latency)
+                path = self.path.split('?')[0]
+                if path in server.extra_routes:
+                    content_type, body = server.extra_routes[path]
+                elif path == '/problemset/all/':
+                    content_type = 'text/html; charset=utf-8'
+                    body = (server.list_html or list_page(server.problem_count)).encode()
+                elif path.startswith('/problems/p'):
+                    content_type = 'text/html; charset=utf-8'
+                    problem_id = path.strip('/').rsplit('p', 1)[-1]
+                    if server.detail_html:
+                        body = string.Template(server.detail_html).safe_substitute(id=problem_id).encode()
+                    else:
+                        body = detail_page(problem_id).encode()
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.base_url = f'http://127.0.0.1:{self.httpd.server_address[1]}'
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
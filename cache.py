@@ -0,0 +1,156 @@
+"""读多写少页面的缓存
+
+缓存键中带有所依赖实体的版本号，实体被修改时只需更新版本号，旧的缓存项不会再被命中，
+之后由 LRU 或过期时间自然淘汰。版本号是随机串而不是计数器，版本记录被淘汰后重新生成的
+版本号也不会与旧缓存项的键冲突。ETag 同样由版本号计算，不需要查询数据库就能返回 304。
+
+后端可以是进程内的 MemoryCache，也可以是本地文件的 FileCache（多个进程共享）。
+进程内后端的版本号只有处理了修改请求的那个进程会更新，其他进程（如 gunicorn 的
+其他 worker）看不到，因此版本号和缓存项一样在 ttl 后过期，过期页面最多存在 ttl 秒。
+"""
+import hashlib
+import os
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+
+class MemoryCache:
+    """进程内 LRU 缓存，缓存项超过 ttl 秒后过期，ttl 为 None 表示不过期"""
+    shared = False  # 其他进程看不到这里的写入
+    
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._items = OrderedDict()  # key -> (过期时间, 值)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            if item[0] is not None and item[0] < time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return item[1]
+
+    def set(self, key, value, ttl=0):
+        """ttl 为 0 时使用默认过期时间"""
+        ttl = self.ttl if ttl == 0 else ttl
+        with self._lock:
+            self._items[key] = (time.monotonic() + ttl if ttl is not None else None, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+class FileCache:
+    """本地文件缓存，每个缓存项一个文件，多个进程可以共享同一目录"""
+    shared = True
+    
+    def __init__(self, directory='cache', ttl=300):
+        self.directory = directory
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.cache')
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                expires_at, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if expires_at is not None and expires_at < time.time():
+            self.delete(key)
+            return None
+        return value
+
+    def set(self, key, value, ttl=0):
+        """ttl 为 0 时使用默认过期时间"""
+        ttl = self.ttl if ttl == 0 else ttl
+        path = self._path(key)
+        # 先写临时文件再替换，其他进程不会读到写了一半的文件
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump((time.time() + ttl if ttl is not None else None, value), f)
+        os.replace(tmp_path, path)
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith('.cache'):
+                os.remove(os.path.join(self.directory, name))
+
+
+class ResponseCache:
+    """按实体版本缓存查询结果和渲染结果"""
+    def __init__(self, backend=None):
+        self.backend = backend if backend is not None else MemoryCache()
+
+    @property
+    def _version_ttl(self):
+        # 共享后端的版本号对所有进程可见，可以不过期；进程内后端的版本号按默认 ttl 过期
+        return None if self.backend.shared else 0
+
+    def version(self, entity):
+        version = self.backend.get(f'version:{entity}')
+        if version is None:
+            version = uuid.uuid4().hex[:12]
+            self.backend.set(f'version:{entity}', version, ttl=self._version_ttl)
+        return version
+
+    def invalidate(self, *entities):
+        """实体被修改后调用，依赖这些实体的缓存项随之失效"""
+        for entity in entities:
+            self.backend.set(f'version:{entity}', uuid.uuid4().hex[:12], ttl=self._version_ttl)
+
+    def key(self, name, entities, *parts):
+        versions = ','.join(f'{entity}={self.version(entity)}' for entity in entities)
+        return f"{name}:{versions}:{':'.join(map(str, parts))}"
+
+    @staticmethod
+    def etag_of(key):
+        """由缓存键生成 ETag
+
+        同一个响应的 ETag 和内容要先用 key() 取一次键，再分别传给 etag_of() 和
+        get_or_set()；分开调用 etag() 和 cached() 会各读一次版本号，版本号在两次
+        读取之间过期时 ETag 与内容对不上。
+        """
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def etag(self, name, entities, *parts):
+        return self.etag_of(self.key(name, entities, *parts))
+
+    def cached(self, name, entities, factory, *parts):
+        """读取缓存，未命中时调用 factory 生成并缓存；factory 的结果不能为 None"""
+        return self.get_or_set(self.key(name, entities, *parts), factory)
+
+    def get_or_set(self, key, factory):
+        """按 key() 生成的键读取缓存，未命中时调用 factory 生成并缓存"""
+        value = self.backend.get(key)
+        if value is None:
+            value = factory()
+            self.backend.set(key, value)
+        return value
+
+    def clear(self):
+        self.backend.clear()
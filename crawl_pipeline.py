@@ -0,0 +1,227 @@
+"""异步抓取流水线
+
+各来源以插件形式提供列表、详情和规范化逻辑。流水线把它们串成
+列表 → 详情 → 规范化 → 去重 → 保存 五个阶段，阶段之间用有界队列连接，
+多个来源并发抓取，每个阶段统计处理量、吞吐量和队列深度。
+"""
+import asyncio
+import time
+
+
+class CrawlSource:
+    """抓取来源插件的基类，子类至少实现 list_entries"""
+    name = None
+
+    async def list_entries(self, spider):
+        """返回列表页中的题目条目，每个条目是至少包含 title 和 url 的字典"""
+        raise NotImplementedError
+
+    async def fetch_detail(self, spider, entry):
+        """补充详情内容，默认认为列表页已包含全部信息"""
+        return entry
+
+    def normalize(self, entry):
+        """把条目转换成题库记录"""
+        return entry
+
+
+class CrawlItem:
+    __slots__ = ('source', 'position', 'data')
+
+    def __init__(self, source, position, data):
+        self.source = source
+        self.position = position  # 条目在来源列表中的位置，用于推进断点
+        self.data = data
+
+
+class Stage:
+    """流水线的一个阶段：若干个协程从有界队列取数据，处理结果交给下一阶段"""
+    def __init__(self, name, handler, workers=1, queue_size=100, batch_size=1):
+        self.name = name
+        self.handler = handler  # 接收一批输入，返回输出列表
+        self.workers = workers
+        self.batch_size = batch_size
+        self.queue = asyncio.Queue(queue_size)
+        self.output = None
+        self.on_error = None
+        self.processed = 0
+        self.started_at = None
+
+    async def _work(self):
+        while True:
+            items = [await self.queue.get()]
+            while len(items) < self.batch_size and not self.queue.empty():
+                items.append(self.queue.get_nowait())
+            try:
+                results = await self.handler(items)
+                if self.output is not None:
+                    for result in results:
+                        await self.output.queue.put(result)
+            except Exception as e:
+                print(f"{self.name} 阶段处理出错: {str(e)}")
+                if self.on_error is not None:
+                    self.on_error(items)
+            finally:
+                self.processed += len(items)
+                for _ in items:
+                    self.queue.task_done()
+
+    def start(self):
+        self.started_at = time.monotonic()
+        return [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    def stats(self):
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0
+        return {
+            'stage': self.name,
+            'processed': self.processed,
+            'per_second': self.processed / elapsed if elapsed else 0.0,
+            'queue_depth': self.queue.qsize(),
+            'queue_size': self.queue.maxsize,
+        }
+
+
+class SourceProgress:
+    """记录来源本轮尚未完成的条目，断点推进到最早未完成的位置"""
+    def __init__(self, start, end, total):
+        self.start = start
+        self.end = end
+        self.total = total
+        self.pending = set()
+
+    @property
+    def watermark(self):
+        return min(self.pending) if self.pending else self.end
+
+
+class CrawlPipeline:
+    """把多个来源接入 列表 → 详情 → 规范化 → 去重 → 保存 流水线
+
+    store 是题库（QuestionStore），用于断点、过期判断和去重；save 负责写入一批题目。
+    每个来源每轮从断点开始处理最多 limit 个条目，未过期的已知题目在列表阶段直接跳过。
+    """
+    def __init__(self, spider, sources, store, save=None, limit=50, refetch_ttl=None,
+                 detail_workers=4, queue_size=100, persist_batch=20):
+        self.spider = spider
+        self.sources = {source.name: source for source in sources}
+        self.store = store
+        self.save = save or store.upsert_many
+        self.limit = limit
+        self.refetch_ttl = refetch_ttl
+        self.progress = {}
+        self.saved = []
+        self._seen_titles, self._seen_urls = set(), set()
+
+        self.stages = [
+            Stage('list', self._list, workers=max(1, len(self.sources)), queue_size=max(1, len(self.sources))),
+            Stage('detail', self._detail, workers=detail_workers, queue_size=queue_size),
+            Stage('normalize', self._normalize, queue_size=queue_size),
+            Stage('dedup', self._dedup, queue_size=queue_size),
+            Stage('persist', self._persist, queue_size=queue_size, batch_size=persist_batch),
+        ]
+        for stage, next_stage in zip(self.stages, self.stages[1:]):
+            stage.output = next_stage
+        for stage in self.stages[1:]:
+            stage.on_error = self._drop
+
+    def stats(self):
+        return [stage.stats() for stage in self.stages]
+
+    async def run(self, report_interval=None):
+        """运行一轮抓取，返回保存的题目"""
+        workers = [task for stage in self.stages for task in stage.start()]
+        monitor = asyncio.create_task(self._report(report_interval)) if report_interval else None
+        try:
+            for name in self.sources:
+                await self.stages[0].queue.put(name)
+            # 逐级等待各阶段队列清空，上一阶段清空后下一阶段不会再有新输入
+            for stage in self.stages:
+                await stage.queue.join()
+        finally:
+            for task in workers + ([monitor] if monitor else []):
+                task.cancel()
+            await asyncio.gather(*workers, *([monitor] if monitor else []), return_exceptions=True)
+
+        for name, progress in self.progress.items():
+            if not progress.pending and progress.end >= progress.total:
+                # 整个列表处理完，下一轮从头开始
+                self.store.set_checkpoint(name, {'offset': 0, 'completed_at': time.time()})
+        return self.saved
+
+    async def _report(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            print(' | '.join(f"{s['stage']}: {s['processed']} 项 {s['per_second']:.1f}/s 队列 {s['queue_depth']}/{s['queue_size']}"
+                             for s in self.stats()))
+
+    def _advance(self, name):
+        self.store.set_checkpoint(name, {'offset': self.progress[name].watermark})
+
+    def _drop(self, items):
+        """条目处理失败或被丢弃，本轮不再重试，断点照常推进"""
+        for name in {item.source for item in items}:
+            for item in items:
+                if item.source == name:
+                    self.progress[name].pending.discard(item.position)
+            self._advance(name)
+
+    async def _list(self, names):
+        items = []
+        for name in names:
+            source = self.sources[name]
+            try:
+                entries = await source.list_entries(self.spider)
+            except Exception as e:
+                print(f"获取 {name} 题目列表失败: {str(e)}")
+                continue
+
+            offset = self.store.get_checkpoint(name).get('offset', 0)
+            if offset >= len(entries):
+                offset = 0
+            end = min(len(entries), offset + self.limit)
+            progress = self.progress[name] = SourceProgress(offset, end, len(entries))
+            for position in range(offset, end):
+                entry = entries[position]
+                if self.store.needs_fetch(entry['title'], entry.get('url'), self.refetch_ttl):
+                    progress.pending.add(position)
+                    items.append(CrawlItem(name, position, entry))
+            self._advance(name)
+            print(f"{name}: 列表共 {len(entries)} 项，本轮处理 {offset}-{end}，需要抓取 {len(progress.pending)} 项")
+        return items
+
+    async def _detail(self, items):
+        return [CrawlItem(item.source, item.position,
+                          await self.sources[item.source].fetch_detail(self.spider, item.data))
+                for item in items]
+
+    async def _normalize(self, items):
+        results = []
+        for item in items:
+            question = self.sources[item.source].normalize(item.data)
+            question.setdefault('fetched_at', time.time())
+            results.append(CrawlItem(item.source, item.position, question))
+        return results
+
+    async def _dedup(self, items):
+        results, dropped = [], []
+        for item in items:
+            title, url = item.data['title'], item.data.get('url')
+            duplicate = title in self._seen_titles or (url and url in self._seen_urls)
+            # 抓取失败的已有题目保留原内容，等下次过期后再试
+            failed_refetch = not item.data['fetched_at'] and self.store.contains(title, url)
+            if duplicate or failed_refetch:
+                dropped.append(item)
+                continue
+            self._seen_titles.add(title)
+            if url:
+                self._seen_urls.add(url)
+            results.append(item)
+        if dropped:
+            self._drop(dropped)
+        return results
+
+    async def _persist(self, items):
+        self.save([item.data for item in items])
+        self.saved.extend(item.data for item in items)
+        self._drop(items)
+        return []
@@ -0,0 +1,211 @@
+"""后台定时抓取
+
+爬虫在独立进程的事件循环中按间隔运行，间隔带随机抖动，不与 Web 服务争用 GIL。
+同一时间只允许一轮抓取（包括其他进程中的调度器和手动运行），停止时当前一轮会被取消，
+浏览器和题库正常关闭，下次从断点继续。每轮抓取后把新抓到的题目分批导入应用数据库，
+整轮导入在一个事务中提交；每轮只导入新抓到的题目，持有 SQLite 写锁的时间很短。
+"""
+import asyncio
+import multiprocessing
+import os
+import random
+import signal
+import time
+
+from question_store import QuestionStore
+
+
+def _process_alive(pid):
+    """进程是否仍在运行；Windows 上 os.kill 会结束进程，无法这样探测，一律视为在运行"""
+    if os.name != 'posix':
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class CrawlLock:
+    """基于锁文件的跨进程互斥
+    
+    锁文件中记录持有者的 PID，持有者运行期间定时调用 refresh() 更新修改时间。
+    持有者进程已不存在，或超过 stale_after 秒没有更新（进程卡死）的锁视为遗留，可以接管。
+    stale_after 应远大于 refresh 的间隔，默认一天，也远长于一轮抓取的时间。
+    """
+    def __init__(self, path, stale_after=24 * 3600):
+        self.path = path
+        self.stale_after = stale_after
+
+    def acquire(self):
+        for _ in range(2):
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                try:
+                    if not self._is_stale():
+                        return False
+                    os.remove(self.path)
+                except FileNotFoundError:
+                    pass
+                continue
+            with os.fdopen(fd, 'w') as f:
+                f.write(str(os.getpid()))
+            return True
+        return False
+
+    def _owner(self):
+        try:
+            with open(self.path) as f:
+                return int(f.read().strip())
+        except ValueError:
+            return None
+
+    def _is_stale(self):
+        owner = self._owner()
+        if owner is not None and owner != os.getpid() and not _process_alive(owner):
+            return True
+        return time.time() - os.path.getmtime(self.path) >= self.stale_after
+
+    def refresh(self):
+        """持有期间的心跳：更新锁文件的修改时间"""
+        try:
+            os.utime(self.path)
+        except FileNotFoundError:
+            pass
+
+    def release(self):
+        """释放锁；锁已被其他进程接管时不删除"""
+        try:
+            if self._owner() in (os.getpid(), None):
+                os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def _run_process(scheduler, stop_event):
+    # Ctrl+C 由主进程处理后通过 stop_event 通知，终止信号同样转为正常停止
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *args: stop_event.set())
+    asyncio.run(scheduler.run(stop_event))
+
+
+class CrawlScheduler:
+    """按间隔运行爬虫并把抓到的题目导入应用数据库"""
+    POLL_INTERVAL = 0.5  # 检查停止信号的间隔（秒）
+    HEARTBEAT_INTERVAL = 60  # 抓取期间更新锁文件的间隔（秒）
+    IMPORT_CHECKPOINT = 'app_import'
+
+    def __init__(self, interval=6 * 3600, jitter=0.1, production=True, store_path='questions_db.jsonl',
+                 lock_path=None, import_batch_size=500):
+        self.interval = interval
+        self.jitter = jitter  # 间隔按比例随机浮动，避免多个实例同时访问目标站点
+        self.production = production
+        self.store_path = store_path
+        self.lock_path = lock_path or store_path + '.lock'
+        self.import_batch_size = import_batch_size
+        self._process = None
+        self._stop_event = None
+
+    def next_delay(self):
+        return self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    async def crawl(self):
+        """运行一轮抓取，结果保存在题库中"""
+        from education_spider import EducationSpider
+        spider = EducationSpider(store_path=self.store_path, production=self.production)
+        await spider.update_question_database()
+
+    def import_questions(self):
+        """把题库中新抓到的题目分批导入应用数据库，按链接跳过已导入的题目，返回 (导入数, 跳过数)
+
+        导入完成后把已导入的最大抓取时间记为题库中的 app_import 断点，下次只导入抓取时间
+        更晚的题目（新题目和重新抓取过的题目）。抓取时间在压缩题库后保持不变，偏移量则不然。
+        第一次导入时没有断点，导入整个题库；详情抓取失败的题目（抓取时间为 0）不导入。
+        """
+        from app import app
+        from models import upgrade_schema
+        from services import ProblemService
+        if not os.path.exists(self.store_path):
+            return 0, 0
+        with app.app_context(), QuestionStore(self.store_path) as store:
+            upgrade_schema()
+            after = store.get_checkpoint(self.IMPORT_CHECKPOINT).get('fetched_at')
+            until = store.max_fetched_at()
+            if after is None:
+                questions = (q for q in store if q.get('fetched_at') != 0)
+            else:
+                questions = store.iter_fetched(after, until)
+            result = ProblemService.bulk_import(questions, batch_size=self.import_batch_size,
+                                                key='url', default_source='spider', commit=True)
+            store.set_checkpoint(self.IMPORT_CHECKPOINT, {'fetched_at': until})
+            return result
+
+    async def run_once(self):
+        """运行一轮抓取和导入；已有其他抓取在运行时跳过，返回是否运行"""
+        lock = CrawlLock(self.lock_path)
+        if not lock.acquire():
+            print("已有抓取任务在运行，跳过本轮")
+            return False
+        heartbeat = asyncio.create_task(self._heartbeat(lock))
+        try:
+            await self.crawl()
+            imported, skipped = self.import_questions()
+            print(f"已导入 {imported} 道新题目，跳过 {skipped} 道")
+            return True
+        finally:
+            heartbeat.cancel()
+            lock.release()
+
+    async def _heartbeat(self, lock):
+        while True:
+            await asyncio.sleep(self.HEARTBEAT_INTERVAL)
+            lock.refresh()
+
+    async def run(self, stop_event):
+        """循环运行直到 stop_event 被设置，当前一轮会被取消"""
+        while not stop_event.is_set():
+            task = asyncio.create_task(self.run_once())
+            while not task.done():
+                await asyncio.wait({task}, timeout=self.POLL_INTERVAL)
+                if stop_event.is_set():
+                    task.cancel()
+            try:
+                task.result()
+            except asyncio.CancelledError:
+                print("抓取已取消")
+                return
+            except Exception as e:
+                print(f"抓取失败: {str(e)}")
+
+            deadline = time.monotonic() + self.next_delay()
+            while not stop_event.is_set() and time.monotonic() < deadline:
+                await asyncio.sleep(min(self.POLL_INTERVAL, deadline - time.monotonic()))
+
+    def start(self):
+        """在独立进程中启动调度"""
+        context = multiprocessing.get_context('spawn')
+        self._stop_event = context.Event()
+        process = context.Process(target=_run_process, args=(self, self._stop_event),
+                                  name='crawl-scheduler', daemon=True)
+        process.start()
+        self._process = process
+
+    def stop(self, timeout=30):
+        """通知调度进程停止并等待它关闭浏览器和题库，超时后强制结束"""
+        if self._process is None:
+            return
+        self._stop_event.set()
+        self._process.join(timeout)
+        if self._process.is_alive():
+            self._process.terminate()
+            self._process.join()
+        self._process = None
+
+    def __getstate__(self):
+        # 传给子进程时不带进程句柄
+        state = dict(self.__dict__)
+        state['_process'] = state['_stop_event'] = None
+        return state
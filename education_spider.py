@@ -1,32 +1,105 @@
 import asyncio
-from playwright.async_api import async_playwright
-import json
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+import os
+import sys
 import time
+from crawl_pipeline import CrawlPipeline, CrawlSource
+from question_store import QuestionStore
+
+class HostRateLimiter:
+    """按主机限速：同一主机相邻两次请求的开始时间至少间隔 1/rate 秒"""
+    def __init__(self, rate=2.0):
+        self.interval = 1 / rate if rate else 0
+        self._next_slot = {}
+    
+    async def wait(self, url):
+        host = urlsplit(url).netloc
+        now = asyncio.get_running_loop().time()
+        # 先占下时间槽再等待，并发的请求会依次排到后面的槽
+        slot = max(now, self._next_slot.get(host, now))
+        self._next_slot[host] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+class PagePool:
+    """可复用的页面池，同时使用的页面数不超过 size"""
+    def __init__(self, context, size=4, timeout=30000):
+        self.context = context
+        self.size = size
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(size)
+        self._idle = []
+        self._pages = []
+    
+    @asynccontextmanager
+    async def page(self):
+        async with self._semaphore:
+            page = self._idle.pop() if self._idle else await self._new_page()
+            try:
+                yield page
+            finally:
+                if not page.is_closed():
+                    self._idle.append(page)
+    
+    async def _new_page(self):
+        page = await self.context.new_page()
+        page.set_default_timeout(self.timeout)
+        self._pages.append(page)
+        return page
+    
+    async def close(self):
+        for page in self._pages:
+            if not page.is_closed():
+                await page.close()
+        self._pages, self._idle = [], []
 
 class EducationSpider:
-    def __init__(self):
-        self.questions_db = []
+    LEETCODE_BASE_URL = 'https://leetcode.cn'
+    NOWCODER_BASE_URL = 'https://www.nowcoder.com'
+    
+    # 生产模式下直接中止的资源类型，题目文本只依赖 HTML 和脚本
+    BLOCKED_RESOURCE_TYPES = {'image', 'font', 'stylesheet', 'media'}
+    
+    # 详情抓取失败时的占位内容，这样的题目下次会重新抓取
+    FAILED_CONTENTS = ("题目链接获取失败", "题目内容获取失败")
+    
+    def __init__(self, store_path='questions_db.jsonl', legacy_path='questions_db.json',
+                 concurrency=4, requests_per_second=2.0, production=False, refetch_ttl=7 * 24 * 3600):
+        self.store_path = store_path
+        self.legacy_path = legacy_path  # 旧版整文件 JSON 题库，首次加载时迁移
+        self.store = None
+        self.concurrency = concurrency  # 同时打开的页面数
+        self.rate_limiter = HostRateLimiter(requests_per_second)
+        self.playwright = self.browser = self.context = self.page_pool = None
+        # 生产模式：无界面运行、拦截非必要资源、等待列表元素出现而不是 networkidle 加固定等待
+        self.production = production
+        self.refetch_ttl = refetch_ttl  # 已抓取的题目超过该秒数后重新抓取详情
+        self.sources = [LeetCodeSource(), NowcoderSource()]
         
-    async def setup_browser(self):
-        """设置浏览器"""
+    async def setup_browser(self, headless=None, channel='msedge'):
+        """设置浏览器，所有页面共用同一个浏览器上下文"""
+        if headless is None:
+            headless = self.production  # 调试模式下可以看到浏览过程
         self.playwright = await async_playwright().start()
-        # 使用Edge浏览器
+        # 默认使用Edge浏览器
+        args = ['--disable-blink-features=AutomationControlled']  # 禁用自动化检测
+        if not headless:
+            args.append('--start-maximized')  # 最大化窗口
         self.browser = await self.playwright.chromium.launch(
-            channel='msedge',  # 使用Edge浏览器
-            headless=False,    # 设置为False可以看到浏览过程
-            args=[
-                '--start-maximized',  # 最大化窗口
-                '--disable-blink-features=AutomationControlled'  # 禁用自动化检测
-            ]
+            channel=channel,
+            headless=headless,
+            args=args
         )
         self.context = await self.browser.new_context(
-            viewport={'width': 1920, 'height': 1080},  # 设置视窗大小
+            viewport={'width': 1280, 'height': 720} if self.production else {'width': 1920, 'height': 1080},
             user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36 Edg/120.0.0.0'
         )
-        self.page = await self.context.new_page()
-        
-        # 设置超时时间
-        self.page.set_default_timeout(30000)  # 30秒
+        if self.production:
+            await self.context.route('**/*', self._block_resources)
+        # 列表页和详情页都从页面池中取用，用完放回复用，超时时间30秒
+        self.page_pool = PagePool(self.context, self.concurrency, timeout=30000)
         
         # 启用JavaScript
         await self.context.add_init_script("""
@@ -35,154 +108,119 @@ class EducationSpider:
             });
         """)
         
-    async def fetch_leetcode_problems(self, page=1, limit=50):
-        """获取LeetCode题目列表"""
-        try:
-            print("正在获取LeetCode题目...")
-            await self.page.goto('https://leetcode.cn/problemset/all/')
+    async def close_browser(self):
+        """依次关闭页面池、浏览器和 Playwright
+        
+        setup_browser 中途失败时只关闭已经创建的部分；关闭出错只打印，
+        不会掩盖调用方正在处理的异常。
+        """
+        for name, attr, method in (('页面池', 'page_pool', 'close'), ('浏览器', 'browser', 'close'),
+                                   ('Playwright', 'playwright', 'stop')):
+            resource = getattr(self, attr, None)
+            if resource is None:
+                continue
+            setattr(self, attr, None)
+            try:
+                await getattr(resource, method)()
+            except Exception as e:
+                print(f"关闭{name}失败: {str(e)}")
+        self.context = None
+    
+    async def _block_resources(self, route):
+        if route.request.resource_type in self.BLOCKED_RESOURCE_TYPES:
+            await route.abort()
+        else:
+            await route.continue_()
+    
+    async def _open_list_page(self, page, url, selector, scroll_rounds=3):
+        """在 page 中打开题目列表页，等到列表元素出现并滚动加载更多内容；调用方应在取页面前限速"""
+        if self.production:
+            await page.goto(url, wait_until='domcontentloaded')
+            await page.wait_for_selector(selector)
+        else:
+            await page.goto(url)
             
             # 等待页面加载完成
-            await self.page.wait_for_load_state('networkidle')
+            await page.wait_for_load_state('networkidle')
             await asyncio.sleep(2)  # 额外等待
             
             # 等待题目列表加载
-            await self.page.wait_for_selector('.odd\\:bg-layer-1')
-            
-            # 滚动页面以加载更多内容
-            for _ in range(3):
-                await self.page.evaluate('window.scrollTo(0, document.body.scrollHeight)')
+            await page.wait_for_selector(selector)
+        
+        # 滚动页面以加载更多内容
+        for _ in range(scroll_rounds):
+            count = await page.locator(selector).count()
+            await page.evaluate('window.scrollTo(0, document.body.scrollHeight)')
+            if not self.production:
                 await asyncio.sleep(1)
-            
-            questions = []
-            # 获取题目列表
-            problem_items = await self.page.query_selector_all('.odd\\:bg-layer-1')
-            
-            for item in problem_items[:limit]:
-                try:
-                    # 提取题目信息
-                    title_element = await item.query_selector('a.h-5')
-                    title_text = await title_element.text_content() if title_element else "未知标题"
-                    
-                    difficulty_element = await item.query_selector('.difficulty')
-                    difficulty_text = await difficulty_element.text_content() if difficulty_element else "medium"
-                    
-                    # 获取题目链接
-                    href = await title_element.get_attribute('href') if title_element else None
-                    
-                    question = {
-                        'title': title_text.strip(),
-                        'difficulty': self._convert_leetcode_difficulty(difficulty_text.strip()),
-                        'source': 'leetcode',
-                        'tags': ['算法', '编程'],
-                        'url': f"https://leetcode.cn{href}" if href else None,
-                        'content': await self._fetch_leetcode_problem_content(href if href else None)
-                    }
-                    
-                    questions.append(question)
-                    print(f"成功获取LeetCode题目: {title_text.strip()}")
-                    await asyncio.sleep(0.5)  # 防止请求过快
-                    
-                except Exception as e:
-                    print(f"处理题目时出错: {str(e)}")
-                    continue
-                
-            return questions
-        except Exception as e:
-            print(f"获取LeetCode题目列表失败: {str(e)}")
-            return []
+                continue
+            try:
+                # 等到新的列表项出现，一段时间内没有新内容说明已经到底
+                await page.wait_for_function(
+                    '([selector, count]) => document.querySelectorAll(selector).length > count',
+                    arg=[selector, count], timeout=2000)
+            except PlaywrightTimeoutError:
+                break
+    
+    async def crawl(self, sources, limit=50, report_interval=None):
+        """让各来源并发通过抓取流水线，返回新增或重新抓取的题目
+        
+        题库中已有且未过期的题目不再抓取详情；题目保存后推进断点，
+        中断后再次运行会从断点继续，整个列表处理完后断点回到开头。
+        """
+        if self.store is None:
+            self.load_questions()
+        pipeline = CrawlPipeline(self, sources, self.store, save=self.save_questions, limit=limit,
+                                 refetch_ttl=self.refetch_ttl, detail_workers=self.concurrency)
+        questions = await pipeline.run(report_interval)
+        for stats in pipeline.stats():
+            print(f"{stats['stage']}: 处理 {stats['processed']} 项，{stats['per_second']:.1f} 项/秒")
+        return questions
+    
+    async def fetch_leetcode_problems(self, page=1, limit=50):
+        """获取LeetCode题目列表"""
+        return await self.crawl([LeetCodeSource()], limit)
         
     async def fetch_nowcoder_problems(self, page=1, limit=50):
         """获取牛客网题目列表"""
-        try:
-            print("正在获取牛客网题目...")
-            await self.page.goto('https://www.nowcoder.com/exam/company')
-            
-            # 等待页面加载完成
-            await self.page.wait_for_load_state('networkidle')
-            await asyncio.sleep(2)  # 额外等待
-            
-            # 等待题目列表加载
-            await self.page.wait_for_selector('.question-item')
-            
-            # 滚动页面以加载更多内容
-            for _ in range(3):
-                await self.page.evaluate('window.scrollTo(0, document.body.scrollHeight)')
-                await asyncio.sleep(1)
-            
-            questions = []
-            # 获取题目列表
-            problem_items = await self.page.query_selector_all('.question-item')
-            
-            for item in problem_items[:limit]:
-                try:
-                    # 提取题目信息
-                    title_element = await item.query_selector('.question-title')
-                    title_text = await title_element.text_content() if title_element else "未知标题"
-                    
-                    company_element = await item.query_selector('.company-name')
-                    company_text = await company_element.text_content() if company_element else "未知公司"
-                    
-                    # 获取题目链接
-                    href = await title_element.get_attribute('href') if title_element else None
-                    
-                    question = {
-                        'title': title_text.strip(),
-                        'difficulty': 'medium',
-                        'source': 'nowcoder',
-                        'tags': ['面试题', company_text.strip()],
-                        'url': f"https://www.nowcoder.com{href}" if href else None,
-                        'content': f"题目：{title_text.strip()}\n请访问牛客网查看完整题目内容。"
-                    }
-                    
-                    questions.append(question)
-                    print(f"成功获取牛客网题目: {title_text.strip()}")
-                    await asyncio.sleep(0.5)  # 防止请求过快
-                    
-                except Exception as e:
-                    print(f"处理题目时出错: {str(e)}")
-                    continue
-                
-            return questions
-        except Exception as e:
-            print(f"获取牛客网题目列表失败: {str(e)}")
-            return []
+        return await self.crawl([NowcoderSource()], limit)
     
     async def _fetch_leetcode_problem_content(self, href):
         """获取LeetCode题目详情"""
         if not href:
             return "题目链接获取失败"
             
+        url = f"{self.LEETCODE_BASE_URL}{href}"
         try:
-            # 创建新标签页访问题目详情
-            page = await self.context.new_page()
-            await page.goto(f"https://leetcode.cn{href}")
-            await page.wait_for_load_state('networkidle')
-            await asyncio.sleep(3)  # 等待内容加载
-            
-            try:
-                # 尝试获取题目内容
-                content_element = await page.wait_for_selector('.content__1Y2H', timeout=5000)
-                if content_element:
-                    content_text = await content_element.text_content()
-                else:
-                    # 如果找不到指定选择器，尝试获取整个题目区域
-                    content_text = await page.evaluate('''() => {
-                        const content = document.querySelector('[role="main"]');
-                        return content ? content.innerText : "题目内容获取失败";
-                    }''')
-            except Exception as e:
-                print(f"使用主选择器获取内容失败，尝试备用方法: {str(e)}")
+            # 先按主机限速再从页面池取页面，被限速的主机不占用其他主机可用的页面；
+            # 内容出现即返回，不再等待 networkidle 和固定时长
+            await self.rate_limiter.wait(url)
+            async with self.page_pool.page() as page:
+                await page.goto(url, wait_until='domcontentloaded')
+                
                 try:
-                    # 备用方法：获取题目描述区域
-                    content_text = await page.evaluate('''() => {
-                        const elements = Array.from(document.querySelectorAll('div[class*="description"]'));
-                        return elements.map(el => el.innerText).join('\\n');
-                    }''')
-                except Exception as e2:
-                    print(f"备用方法也失败了: {str(e2)}")
-                    content_text = "题目内容获取失败"
+                    # 尝试获取题目内容
+                    content_element = await page.wait_for_selector('.content__1Y2H', timeout=5000)
+                    if content_element:
+                        content_text = await content_element.text_content()
+                    else:
+                        # 如果找不到指定选择器，尝试获取整个题目区域
+                        content_text = await page.evaluate('''() => {
+                            const content = document.querySelector('[role="main"]');
+                            return content ? content.innerText : "题目内容获取失败";
+                        }''')
+                except Exception as e:
+                    print(f"使用主选择器获取内容失败，尝试备用方法: {str(e)}")
+                    try:
+                        # 备用方法：获取题目描述区域
+                        content_text = await page.evaluate('''() => {
+                            const elements = Array.from(document.querySelectorAll('div[class*="description"]'));
+                            return elements.map(el => el.innerText).join('\\n');
+                        }''')
+                    except Exception as e2:
+                        print(f"备用方法也失败了: {str(e2)}")
+                        content_text = "题目内容获取失败"
             
-            await page.close()
             return content_text.strip() if content_text else "题目内容获取失败"
         except Exception as e:
             print(f"获取题目详情失败: {str(e)}")
@@ -198,21 +236,28 @@ class EducationSpider:
         else:
             return 'hard'
     
-    def save_questions(self, filename='questions_db.json'):
-        """保存题目到文件"""
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(self.questions_db, f, ensure_ascii=False, indent=2)
-        print(f"已保存 {len(self.questions_db)} 道题目到 {filename}")
+    def save_questions(self, questions):
+        """保存抓取到的题目：新题目和内容有变化的题目追加到题库，其余只更新抓取时间，返回追加的题目数"""
+        added = self.store.upsert_many(questions)
+        if self.store.maybe_compact():
+            print("已压缩题库文件")
+        if added:
+            print(f"已保存 {added} 道题目到 {self.store_path}，共 {len(self.store)} 道")
+        return added
     
-    def load_questions(self, filename='questions_db.json'):
-        """从文件加载题目"""
-        try:
-            with open(filename, 'r', encoding='utf-8') as f:
-                self.questions_db = json.load(f)
-            print(f"已加载 {len(self.questions_db)} 道题目")
-        except FileNotFoundError:
-            self.questions_db = []
-            print("题目数据库文件不存在，将创建新的数据库")
+    def load_questions(self):
+        """打开题库，只加载索引而不读入题目内容"""
+        if self.store is None:
+            self.store = QuestionStore(self.store_path)
+        if not len(self.store) and self.legacy_path and os.path.exists(self.legacy_path):
+            migrated = self.store.migrate_from_json(self.legacy_path)
+            print(f"已从 {self.legacy_path} 迁移 {migrated} 道题目")
+        print(f"已加载题库，共 {len(self.store)} 道题目")
+    
+    def close_questions(self):
+        if self.store is not None:
+            self.store.close()
+            self.store = None
     
     async def update_question_database(self):
         """更新题目数据库"""
@@ -225,34 +270,122 @@ class EducationSpider:
             # 加载现有题目
             self.load_questions()
             
-            # 获取新题目
-            leetcode_questions = await self.fetch_leetcode_problems(limit=10)  # 先获取10道题测试
-            await asyncio.sleep(2)  # 等待一下再获取下一个网站的题目
-            nowcoder_questions = await self.fetch_nowcoder_problems(limit=10)  # 先获取10道题测试
+            # 各来源并发地从断点继续抓取，抓到的题目随时保存
+            questions = await self.crawl(self.sources, limit=10, report_interval=10)  # 先获取10道题测试
             
-            # 更新数据库
-            new_questions = leetcode_questions + nowcoder_questions
+            fetched = len(questions)
+            print(f"数据库更新完成，抓取 {fetched} 道题目")
+            return fetched
+        finally:
+            # 关闭题库、页面池和浏览器
+            self.close_questions()
+            await self.close_browser()
+
+class LeetCodeSource(CrawlSource):
+    """LeetCode：列表页提供标题和难度，内容需要逐题打开详情页"""
+    name = 'leetcode'
+    LIST_SELECTOR = '.odd\\:bg-layer-1'
+    
+    async def list_entries(self, spider):
+        print("正在获取LeetCode题目...")
+        entries = []
+        url = f'{spider.LEETCODE_BASE_URL}/problemset/all/'
+        await spider.rate_limiter.wait(url)
+        async with spider.page_pool.page() as page:
+            await spider._open_list_page(page, url, self.LIST_SELECTOR)
             
-            # 去重（基于标题）
-            existing_titles = {q['title'] for q in self.questions_db}
-            unique_new_questions = [q for q in new_questions if q['title'] not in existing_titles]
+            # 获取题目列表
+            problem_items = await page.query_selector_all(self.LIST_SELECTOR)
             
-            # 添加新题目
-            self.questions_db.extend(unique_new_questions)
+            for item in problem_items:
+                try:
+                    # 提取题目信息
+                    title_element = await item.query_selector('a.h-5')
+                    title_text = await title_element.text_content() if title_element else "未知标题"
+                    
+                    difficulty_element = await item.query_selector('.difficulty')
+                    difficulty_text = await difficulty_element.text_content() if difficulty_element else "medium"
+                    
+                    # 获取题目链接
+                    href = await title_element.get_attribute('href') if title_element else None
+                    entries.append({
+                        'title': title_text.strip(),
+                        'difficulty': spider._convert_leetcode_difficulty(difficulty_text.strip()),
+                        'href': href,
+                        'url': f"{spider.LEETCODE_BASE_URL}{href}" if href else None
+                    })
+                    
+                except Exception as e:
+                    print(f"处理题目时出错: {str(e)}")
+                    continue
+        return entries
+    
+    async def fetch_detail(self, spider, entry):
+        content = await spider._fetch_leetcode_problem_content(entry['href'])
+        print(f"成功获取LeetCode题目: {entry['title']}")
+        return dict(entry, content=content)
+    
+    def normalize(self, entry):
+        return {
+            'title': entry['title'],
+            'difficulty': entry['difficulty'],
+            'source': self.name,
+            'tags': ['算法', '编程'],
+            'url': entry['url'],
+            'content': entry['content'],
+            'fetched_at': 0 if entry['content'] in EducationSpider.FAILED_CONTENTS else time.time()
+        }
+
+class NowcoderSource(CrawlSource):
+    """牛客网：列表页已包含全部信息，不需要打开详情页"""
+    name = 'nowcoder'
+    LIST_SELECTOR = '.question-item'
+    
+    async def list_entries(self, spider):
+        print("正在获取牛客网题目...")
+        entries = []
+        url = f'{spider.NOWCODER_BASE_URL}/exam/company'
+        await spider.rate_limiter.wait(url)
+        async with spider.page_pool.page() as page:
+            await spider._open_list_page(page, url, self.LIST_SELECTOR)
             
-            # 保存更新后的数据库
-            self.save_questions()
+            # 获取题目列表
+            problem_items = await page.query_selector_all(self.LIST_SELECTOR)
             
-            print(f"数据库更新完成，新增 {len(unique_new_questions)} 道题目")
-            return len(unique_new_questions)
-        finally:
-            # 关闭浏览器
-            await self.browser.close()
-            await self.playwright.stop()
+            for item in problem_items:
+                try:
+                    # 提取题目信息
+                    title_element = await item.query_selector('.question-title')
+                    title_text = await title_element.text_content() if title_element else "未知标题"
+                    
+                    company_element = await item.query_selector('.company-name')
+                    company_text = await company_element.text_content() if company_element else "未知公司"
+                    
+                    # 获取题目链接
+                    href = await title_element.get_attribute('href') if title_element else None
+                    
+                    entries.append({
+                        'title': title_text.strip(),
+                        'difficulty': 'medium',
+                        'source': self.name,
+                        'tags': ['面试题', company_text.strip()],
+                        'url': f"{spider.NOWCODER_BASE_URL}{href}" if href else None,
+                        'content': f"题目：{title_text.strip()}\n请访问牛客网查看完整题目内容。"
+                    })
+                    
+                except Exception as e:
+                    print(f"处理题目时出错: {str(e)}")
+                    continue
+        return entries
+    
+    def normalize(self, entry):
+        print(f"成功获取牛客网题目: {entry['title']}")
+        return dict(entry, fetched_at=time.time())
 
-async def main():
-    spider = EducationSpider()
+async def main(production=False):
+    spider = EducationSpider(production=production)
     await spider.update_question_database()
 
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    # python education_spider.py --production 以无界面、拦截资源的方式运行
+    asyncio.run(main(production='--production' in sys.argv[1:])) 
\ No newline at end of file
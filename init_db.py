@@ -1,12 +1,12 @@
 from app import app, db
-from models import User, Problem, LearningPath
-import json
+from models import User, LearningPath, upgrade_schema
+from services import ProblemService
 import os
 
 def init_db():
     with app.app_context():
-        # 创建所有表
-        db.create_all()
+        # 创建所有表，并为旧数据库补齐新增的列和索引
+        upgrade_schema()
         
         # 如果没有管理员用户，创建一个
         if not User.query.filter_by(username='admin').first():
@@ -17,20 +17,9 @@ def init_db():
             admin.set_password('admin123')
             db.session.add(admin)
         
-        # 如果存在示例题目数据，导入它们
+        # 如果存在示例题目数据，批量导入其中标题尚不存在的题目
         if os.path.exists('example_problems.json'):
-            with open('example_problems.json', 'r', encoding='utf-8') as f:
-                problems_data = json.load(f)
-                for data in problems_data:
-                    if not Problem.query.filter_by(title=data['title']).first():
-                        problem = Problem(
-                            title=data['title'],
-                            content=data['content'],
-                            difficulty=data['difficulty'],
-                            source=data.get('source', 'system'),
-                            tags=data.get('tags', [])
-                        )
-                        db.session.add(problem)
+            ProblemService.bulk_import('example_problems.json')
         
         # 创建默认学习路径
         if not LearningPath.query.filter_by(name='Python基础学习路径').first():
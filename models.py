@@ -2,6 +2,7 @@ from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime, UTC
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
+from sqlalchemy import inspect, text
 
 db = SQLAlchemy()
 
@@ -47,10 +48,11 @@ class Problem(db.Model):
     __tablename__ = 'problems'
     
     id = db.Column(db.Integer, primary_key=True)
-    title = db.Column(db.String(200), nullable=False)
+    title = db.Column(db.String(200), nullable=False, index=True)
     content = db.Column(db.Text, nullable=False)
-    difficulty = db.Column(db.String(20), nullable=False)  # easy, medium, hard
+    difficulty = db.Column(db.String(20), nullable=False, index=True)  # easy, medium, hard
     source = db.Column(db.String(50))  # leetcode, nowcoder等
+    url = db.Column(db.String(500), index=True)  # 原题链接，批量导入时用于去重
     tags = db.Column(db.JSON)  # ['array', 'dynamic-programming']等
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(UTC))
     
@@ -64,6 +66,11 @@ class Problem(db.Model):
 
 class Submission(db.Model):
     __tablename__ = 'submissions'
+    __table_args__ = (
+        db.Index('ix_submissions_user_submitted', 'user_id', 'submitted_at'),  # 最近提交统计
+        db.Index('ix_submissions_user_correct', 'user_id', 'is_correct'),  # 已解决题目
+        db.Index('ix_submissions_user_problem', 'user_id', 'problem_id'),  # 推荐时的反连接
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -73,14 +80,13 @@ class Submission(db.Model):
     is_correct = db.Column(db.Boolean, nullable=False)
     time_spent = db.Column(db.Integer)  # 以秒为单位
     submitted_at = db.Column(db.DateTime, default=lambda: datetime.now(UTC))
-    
-    user = db.relationship('User', backref=db.backref('submissions', lazy=True))
-    problem = db.relationship('Problem', backref=db.backref('submissions', lazy=True))
+    learning_path_id = db.Column(db.Integer, db.ForeignKey('learning_paths.id'))  # 所属学习路径
 
 class LearningPath(db.Model):
     __tablename__ = 'learning_paths'
     
     id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'))  # 创建者，系统默认路径为空
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
     topic_sequence = db.Column(db.JSON)  # ['arrays', 'linked-lists', 'trees']等
@@ -95,6 +101,9 @@ class LearningPath(db.Model):
 
 class UserActivity(db.Model):
     __tablename__ = 'user_activities'
+    __table_args__ = (
+        db.Index('ix_user_activities_user_created', 'user_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -106,3 +115,40 @@ class UserActivity(db.Model):
     effectiveness_score = db.Column(db.Float)  # 活动效果评分
     time_spent = db.Column(db.Integer)  # 花费时间（分钟）
     fatigue_level = db.Column(db.Float)  # 疲劳度
+
+class DailyActivityRollup(db.Model):
+    """按 (用户, 日期) 汇总的每日学习数据，随活动和提交写入同步更新"""
+    __tablename__ = 'daily_activity_rollups'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)  # UTC 日期
+    
+    # 学习活动汇总
+    total_time = db.Column(db.Integer, nullable=False, default=0)  # 活动总时间（分钟）
+    activity_count = db.Column(db.Integer, nullable=False, default=0)
+    effectiveness_sum = db.Column(db.Float, nullable=False, default=0.0)
+    max_fatigue = db.Column(db.Float, nullable=False, default=0.0)
+    
+    # 做题提交汇总
+    submission_count = db.Column(db.Integer, nullable=False, default=0)
+    correct_count = db.Column(db.Integer, nullable=False, default=0)
+    submission_time = db.Column(db.Integer, nullable=False, default=0)  # 提交耗时（秒）
+
+def upgrade_schema(engine=None):
+    """为已有数据库补齐新增的表、列和索引
+
+    create_all 只会创建缺失的表，不会修改已存在的表，旧的 app.db 需要经过这里升级。
+    新增列统一以可空列加入（SQLite 的 ADD COLUMN 不支持无默认值的 NOT NULL）。
+    """
+    engine = engine or db.engine
+    db.metadata.create_all(engine)
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} '
+                                      f'{column.type.compile(engine.dialect)}'))
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
@@ -0,0 +1,338 @@
+"""追加写入的 JSON Lines 题库
+
+题目按行追加到 .jsonl 文件，旁边的 SQLite 索引记录每条有效记录的偏移量、标题和链接。
+去重检查只查索引，读取时按偏移量流式读出，不需要把整个题库加载到内存。
+同一题目重新写入时旧行成为失效记录，失效记录过多时由 compact() 重写文件。
+索引中还保存每道题目的抓取时间和内容摘要，以及各来源的增量抓取断点。
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+
+def iter_json_records(path, chunk_size=1 << 16, max_record_size=1 << 24):
+    """流式读取 JSON 数组或 JSON Lines 文件中的记录，内存占用与文件大小无关
+    
+    数组中的一条记录超过 max_record_size 个字符仍解析不出来时（通常是记录格式错误），
+    抛出 ValueError 并给出记录开始处的字符偏移，不再无限补读。
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        buffer = f.read(chunk_size)
+        start = 0  # buffer[0] 在文件中的字符偏移
+        pos = len(buffer) - len(buffer.lstrip())
+        if not buffer[pos:pos + 1] == '[':
+            # JSON Lines：每行一条记录
+            f.seek(0)
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+
+        pos += 1
+        while True:
+            # 跳过元素间的空白和逗号，缓冲区用完时继续读
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos == len(buffer):
+                start += len(buffer)
+                buffer, pos = f.read(chunk_size), 0
+                if not buffer:
+                    raise ValueError(f'{path}: JSON 数组未结束')
+                continue
+            if buffer[pos] == ']':
+                return
+            try:
+                record, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as e:
+                if len(buffer) - pos > max_record_size:
+                    raise ValueError(f'{path}: 偏移 {start + pos} 处的记录格式错误或超过 '
+                                     f'{max_record_size} 个字符: {e.msg}') from e
+                # 记录跨越了缓冲区边界，丢掉已解析的部分后补读
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    raise ValueError(f'{path}: 偏移 {start + pos} 处的记录格式错误: {e.msg}') from e
+                start += pos
+                buffer, pos = buffer[pos:] + chunk, 0
+                continue
+            yield record
+
+
+def content_hash(question):
+    """题目内容的摘要，用于判断重新抓取后内容是否变化"""
+    content = question.get('content')
+    return hashlib.sha1(content.encode('utf-8')).hexdigest() if content is not None else None
+
+
+class QuestionStore:
+    """追加写入的题库，标题或链接相同的题目视为同一道题"""
+    BATCH_SIZE = 1000
+    COMPACT_RATIO = 0.5  # 失效行占比超过该值时压缩
+    COMPACT_MIN_STALE = 1000  # 失效行太少时不值得重写
+    INDEX_VERSION = 2  # 索引结构版本，变化时从文件重建索引
+
+    def __init__(self, path='questions_db.jsonl', index_path=None):
+        self.path = path
+        self.index_path = index_path or path + '.idx'
+        self._open()
+
+    def _open(self):
+        self.db = sqlite3.connect(self.index_path)
+        if self.db.execute('PRAGMA user_version').fetchone()[0] != self.INDEX_VERSION:
+            # 索引结构变化时丢弃旧索引，由 _recover 从文件重建
+            self.db.executescript('DROP TABLE IF EXISTS records; DROP TABLE IF EXISTS meta;')
+            self.db.execute(f'PRAGMA user_version = {self.INDEX_VERSION}')
+        self.db.executescript('''
+            CREATE TABLE IF NOT EXISTS records (
+                offset INTEGER PRIMARY KEY,
+                title TEXT NOT NULL,
+                url TEXT,
+                fetched_at REAL NOT NULL DEFAULT 0,
+                content_hash TEXT
+            );
+            CREATE UNIQUE INDEX IF NOT EXISTS ix_records_title ON records (title);
+            CREATE UNIQUE INDEX IF NOT EXISTS ix_records_url ON records (url);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                source TEXT PRIMARY KEY,
+                cursor TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            );
+        ''')
+        self._recover()
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _meta(self, key):
+        row = self.db.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else 0
+
+    def _set_meta(self, **values):
+        self.db.executemany('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', values.items())
+
+    def _recover(self):
+        """让索引与文件保持一致：文件变短说明被替换过，重建索引；文件变长说明上次只写了文件，补索引"""
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        indexed = self._meta('size')
+        if size < indexed:
+            self.reindex()
+        elif size > indexed:
+            self._index_tail(indexed)
+
+    def reindex(self):
+        """从文件重建整个索引"""
+        with self.db:
+            self.db.execute('DELETE FROM records')
+            self.db.execute('DELETE FROM meta')
+        self._index_tail(0)
+
+    def _index_tail(self, start):
+        """为 start 之后的行建立索引，末尾不完整的行（写入中断）会被截掉"""
+        lines = self._meta('lines')
+        if not os.path.exists(self.path):
+            with self.db:
+                self._set_meta(size=0, lines=0)
+            return
+        with open(self.path, 'rb+') as f, self.db:
+            f.seek(start)
+            offset = start
+            for line in f:
+                if not line.endswith(b'\n'):
+                    try:
+                        json.loads(line)
+                    except ValueError:
+                        f.truncate(offset)
+                        break
+                    # 手工编辑的文件末行可能缺少换行符
+                    f.seek(0, os.SEEK_END)
+                    f.write(b'\n')
+                    line += b'\n'
+                if line.strip():
+                    self._index(offset, json.loads(line))
+                    lines += 1
+                offset += len(line)
+            self._set_meta(size=offset, lines=lines)
+
+    def _index(self, offset, record):
+        # 后写入的行取代标题或链接相同的旧行
+        title, url = record['title'], record.get('url')
+        self.db.execute('DELETE FROM records WHERE title = ? OR url = ?', (title, url))
+        self.db.execute('INSERT INTO records (offset, title, url, fetched_at, content_hash) VALUES (?, ?, ?, ?, ?)',
+                        (offset, title, url, record.get('fetched_at') or 0, content_hash(record)))
+
+    def __len__(self):
+        return self.db.execute('SELECT count(*) FROM records').fetchone()[0]
+
+    @property
+    def stale_count(self):
+        """文件中已被取代的行数"""
+        return self._meta('lines') - len(self)
+
+    def contains(self, title=None, url=None):
+        """标题或链接是否已在题库中"""
+        return self.db.execute('SELECT 1 FROM records WHERE title = ? OR url = ? LIMIT 1',
+                               (title, url)).fetchone() is not None
+
+    def get(self, title=None, url=None):
+        """按标题或链接读取一道题目，不存在时返回 None"""
+        row = self.db.execute('SELECT offset FROM records WHERE title = ? OR url = ? LIMIT 1',
+                              (title, url)).fetchone()
+        if row is None:
+            return None
+        with open(self.path, 'rb') as f:
+            f.seek(row[0])
+            return json.loads(f.readline())
+
+    def __iter__(self):
+        """按写入顺序流式读取所有有效题目"""
+        return self._iter_where('1', ())
+    
+    def iter_fetched(self, after, until=None):
+        """按写入顺序流式读取抓取时间在 (after, until] 之间的有效题目"""
+        if until is None:
+            return self._iter_where('fetched_at > ?', (after,))
+        return self._iter_where('fetched_at > ? AND fetched_at <= ?', (after, until))
+    
+    def max_fetched_at(self):
+        return self.db.execute('SELECT MAX(fetched_at) FROM records').fetchone()[0] or 0
+    
+    def _iter_where(self, condition, params):
+        last = -1
+        with open(self.path, 'rb') as f:
+            while True:
+                offsets = self.db.execute(
+                    f'SELECT offset FROM records WHERE offset > ? AND {condition} ORDER BY offset LIMIT ?',
+                    (last, *params, self.BATCH_SIZE)).fetchall()
+                if not offsets:
+                    return
+                for (offset,) in offsets:
+                    f.seek(offset)
+                    yield json.loads(f.readline())
+                last = offsets[-1][0]
+
+    def add_many(self, questions, replace=False):
+        """追加题目，返回写入的题目数
+
+        replace=False 时跳过标题或链接已存在的题目；replace=True 时新记录取代旧记录。
+        """
+        added = 0
+        batch = []
+        for question in questions:
+            batch.append(question)
+            if len(batch) >= self.BATCH_SIZE:
+                added += self._append(batch, replace)
+                batch = []
+        if batch:
+            added += self._append(batch, replace)
+        return added
+
+    def add(self, question, replace=False):
+        return self.add_many([question], replace) == 1
+
+    def _append(self, questions, replace):
+        titles, urls = set(), set()
+        chunks, rows = [], []
+        offset = self._meta('size')
+        for question in questions:
+            title, url = question['title'], question.get('url')
+            if not replace and (title in titles or (url and url in urls) or self.contains(title, url)):
+                continue
+            titles.add(title)
+            if url:
+                urls.add(url)
+            data = (json.dumps(question, ensure_ascii=False) + '\n').encode('utf-8')
+            rows.append((offset, question))
+            chunks.append(data)
+            offset += len(data)
+        if not rows:
+            return 0
+
+        # 先写文件再更新索引，中途中断时由 _recover 补齐索引
+        with open(self.path, 'ab') as f:
+            f.write(b''.join(chunks))
+        with self.db:
+            for row in rows:
+                self._index(*row)
+            self._set_meta(size=offset, lines=self._meta('lines') + len(rows))
+        return len(rows)
+
+    def upsert_many(self, questions):
+        """写入重新抓取的题目：内容未变时只更新抓取时间，新题目或内容有变化时追加，返回追加的题目数"""
+        changed = []
+        with self.db:
+            for question in questions:
+                row = self.db.execute('SELECT offset, content_hash FROM records WHERE title = ? OR url = ? LIMIT 1',
+                                      (question['title'], question.get('url'))).fetchone()
+                if row and row[1] == content_hash(question):
+                    self.db.execute('UPDATE records SET fetched_at = ? WHERE offset = ?',
+                                    (question.get('fetched_at') or 0, row[0]))
+                else:
+                    changed.append(question)
+        return self.add_many(changed, replace=True)
+
+    def needs_fetch(self, title=None, url=None, ttl=None, now=None):
+        """题目不在题库中，或上次抓取早于 ttl 秒之前时需要抓取；ttl 为 None 表示已有题目不再抓取"""
+        row = self.db.execute('SELECT fetched_at FROM records WHERE title = ? OR url = ? LIMIT 1',
+                              (title, url)).fetchone()
+        if row is None:
+            return True
+        if ttl is None:
+            return False
+        return row[0] < (now if now is not None else time.time()) - ttl
+
+    def get_checkpoint(self, source):
+        """读取来源的抓取断点，没有时返回空字典"""
+        row = self.db.execute('SELECT cursor FROM checkpoints WHERE source = ?', (source,)).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def set_checkpoint(self, source, cursor):
+        with self.db:
+            self.db.execute('INSERT OR REPLACE INTO checkpoints (source, cursor, updated_at) VALUES (?, ?, ?)',
+                            (source, json.dumps(cursor, ensure_ascii=False), time.time()))
+
+    def maybe_compact(self):
+        """失效行足够多时压缩，返回是否进行了压缩"""
+        stale = self.stale_count
+        if stale < self.COMPACT_MIN_STALE or stale <= self._meta('lines') * self.COMPACT_RATIO:
+            return False
+        self.compact()
+        return True
+
+    def compact(self):
+        """只保留有效记录重写文件和索引"""
+        if not self.stale_count:
+            return
+        tmp_path, tmp_index_path = self.path + '.tmp', self.index_path + '.tmp'
+        for path in (tmp_path, tmp_index_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+        compacted = QuestionStore(tmp_path, tmp_index_path)
+        try:
+            compacted.add_many(self, replace=True)
+            # 抓取时间可能只在索引中更新过，断点也只存在索引里，一并带过去
+            with compacted.db:
+                compacted.db.executemany('UPDATE records SET fetched_at = ? WHERE title = ?',
+                                         self.db.execute('SELECT fetched_at, title FROM records'))
+                compacted.db.executemany('INSERT INTO checkpoints (source, cursor, updated_at) VALUES (?, ?, ?)',
+                                         self.db.execute('SELECT source, cursor, updated_at FROM checkpoints'))
+        finally:
+            compacted.close()
+        self.close()
+        # 先替换数据文件：若在两次替换之间中断，旧索引记录的大小超过新文件，打开时会重建索引
+        os.replace(tmp_path, self.path)
+        os.replace(tmp_index_path, self.index_path)
+        self._open()
+
+    def migrate_from_json(self, json_path):
+        """把旧版整文件 JSON 题库导入进来，返回导入的题目数"""
+        return self.add_many(iter_json_records(json_path))
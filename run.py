@@ -1,20 +1,18 @@
-import threading
-from education_spider import EducationSpider
-from app import app
-
-def run_spider():
-    """运行爬虫定期更新题库"""
-    spider = EducationSpider()
-    spider.update_question_database()
+from app import app, recommendation_service
+from crawl_scheduler import CrawlScheduler
 
 def main():
-    # 启动爬虫线程
-    spider_thread = threading.Thread(target=run_spider)
-    spider_thread.daemon = True
-    spider_thread.start()
+    # 爬虫在独立进程中定时运行，抓到的题目分批导入数据库
+    scheduler = CrawlScheduler()
+    scheduler.start()
+    # 推荐矩阵在后台构建，构建完成前推荐按难度补充
+    recommendation_service.start_refresh(app)
     
-    # 启动Flask应用
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    try:
+        # 启动Flask应用；关闭重载器，否则重载时会再启动一个爬虫进程
+        app.run(host='0.0.0.0', port=5000, debug=True, use_reloader=False)
+    finally:
+        scheduler.stop()
 
 if __name__ == '__main__':
     main() 
\ No newline at end of file
@@ -0,0 +1,44 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+from app import app, db
+from services import UserService, RecommendationService
+
+
+@pytest.fixture
+def app_context():
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    with app.app_context():
+        db.create_all()
+        UserService._statistics_cache.clear()
+        RecommendationService._solved_cache.clear()
+        yield
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def count_queries():
+    """返回一个上下文管理器，记录代码块内执行的 SQL 语句
+
+    with_parameters=True 时记录 (语句, 参数)，executemany 只取第一组参数。
+    """
+    @contextmanager
+    def count(with_parameters=False):
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if with_parameters:
+                statements.append((statement, parameters[0] if executemany else parameters))
+            else:
+                statements.append(statement)
+
+        engine = db.engine
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    return count
@@ -0,0 +1,301 @@
+import gc
+import os
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from adaptive_learning_system import AdaptiveLearningSystem, PerformanceHistogram, ProfileStore
+
+
+def make_attempts(n_users=30, n_topics=4, seed=11):
+    """生成按答题顺序排列的列式记录，以及对应的逐个 topic_data"""
+    rng = random.Random(seed)
+    columns = {'user_id': [], 'topic_id': [], 'time_spent': [], 'correct': []}
+    topic_data = {}
+    for _ in range(2000):
+        user_id = f'user_{rng.randrange(n_users)}'
+        topic_id = f'topic_{rng.randrange(n_topics)}'
+        attempt = {'time_spent': rng.randrange(1, 600) / 4, 'correct': rng.random() < 0.6}
+        columns['user_id'].append(user_id)
+        columns['topic_id'].append(topic_id)
+        columns['time_spent'].append(attempt['time_spent'])
+        columns['correct'].append(attempt['correct'])
+        data = topic_data.setdefault((user_id, topic_id), {
+            'topic_id': topic_id,
+            'completion_time': rng.randrange(0, 60),
+            'correct_rate': rng.random(),
+            'exercise_attempts': [],
+        })
+        data['exercise_attempts'].append(attempt)
+    return columns, topic_data
+
+
+def test_batch_analysis_matches_scalar():
+    """测试批量能力分析与逐个计算结果完全一致"""
+    columns, topic_data = make_attempts()
+    system = AdaptiveLearningSystem()
+    topic_info = {key: {'completion_time': data['completion_time'], 'correct_rate': data['correct_rate']}
+                  for key, data in topic_data.items()}
+
+    results = system.analyze_learning_ability_batch(columns, topic_info)
+
+    assert set(results) == set(topic_data)
+    for key, data in topic_data.items():
+        metrics = results[key]
+        assert metrics['comprehension_speed'] == system._calculate_comprehension_speed(data)
+        assert metrics['accuracy_rate'] == system._calculate_accuracy(data)
+        assert metrics['consistency'] == system._analyze_learning_consistency(data)
+        assert metrics['difficulty_handling'] == system._analyze_difficulty_adaptation(data)
+        assert metrics['fatigue_level'] == system._analyze_fatigue_level(data)
+        assert metrics == system.analyze_learning_ability(key[0], data)
+
+
+def test_batch_analysis_single_attempt_and_profiles():
+    """测试单次答题的分组和画像更新"""
+    system = AdaptiveLearningSystem()
+    system.user_profiles['u1'] = system.UserProfile()
+    columns = {'user_id': ['u1', 'u2', 'u1'], 'topic_id': ['a', 'a', 'a'],
+               'time_spent': [5, 7, 9], 'correct': [True, False, False]}
+
+    results = system.analyze_learning_ability_batch(columns)
+
+    assert results[('u2', 'a')]['fatigue_level'] == 0
+    assert results[('u2', 'a')]['accuracy_rate'] == 0
+    assert results[('u1', 'a')]['accuracy_rate'] == 0.5
+    assert results[('u1', 'a')]['comprehension_speed'] == 0
+    assert list(system.user_profiles['u1'].accuracy_history) == [0.5]
+    assert system.analyze_learning_ability_batch(
+        {'user_id': [], 'topic_id': [], 'time_spent': [], 'correct': []}) == {}
+
+
+def test_analysis_uses_given_attempts():
+    """测试传入答题记录时按这份记录计算，与之前分析过的记录无关"""
+    system = AdaptiveLearningSystem()
+    right = [{'time_spent': 5, 'correct': True}, {'time_spent': 6, 'correct': True}]
+    wrong = [{'time_spent': 5, 'correct': False}, {'time_spent': 6, 'correct': False}]
+
+    assert system.analyze_learning_ability('u1', {'topic_id': 'a', 'exercise_attempts': right})['accuracy_rate'] == 1
+    assert system.analyze_learning_ability('u1', {'topic_id': 'a', 'exercise_attempts': wrong})['accuracy_rate'] == 0
+    assert 'u1' not in system.learner_metrics
+
+
+def test_streaming_metrics_match_full_computation():
+    """测试逐次 record_attempt 累计的在线指标与按完整记录计算的结果一致"""
+    system = AdaptiveLearningSystem()
+    columns, topic_data = make_attempts(n_users=1, n_topics=1)
+    data = topic_data[('user_0', 'topic_0')]
+
+    for attempt in data['exercise_attempts']:
+        metrics = system.record_attempt('user_0', 'topic_0', attempt['time_spent'], attempt['correct'])
+    assert metrics.accuracy == system._calculate_accuracy(data)
+    assert metrics.fatigue_level == system._analyze_fatigue_level(data)
+    assert metrics.consistency == pytest.approx(system._analyze_learning_consistency(data), rel=1e-12)
+
+    streamed = system.analyze_learning_ability('user_0', {'topic_id': 'topic_0'})
+    assert streamed['fatigue_level'] == system._analyze_fatigue_level(data)
+
+
+def test_track_progress_reads_streaming_metrics():
+    """测试进度追踪从在线指标读取疲劳度"""
+    system = AdaptiveLearningSystem()
+    system.user_profiles['u1'] = system.UserProfile()
+    for time_spent, correct in [(5, True), (6, True), (8, False), (10, False)]:
+        system.record_attempt('u1', 'math_101', time_spent, correct)
+    performance_data = {'completion_rate': 0.9, 'accuracy': 0.5}
+
+    adjustments = system.track_progress('u1', 'math_101', performance_data)
+
+    assert adjustments['fatigue_status']['level'] == 1
+    assert system.user_profiles['u1'].fatigue_pattern['math_101'] == 1
+
+
+class CountingAttempts(list):
+    """记录被读取的答题记录条数"""
+    reads = 0
+
+    def __iter__(self):
+        for item in super().__iter__():
+            self.reads += 1
+            yield item
+
+    def __getitem__(self, index):
+        self.reads += 1
+        return super().__getitem__(index)
+
+
+def test_track_progress_folds_only_new_attempts():
+    """测试进度追踪只合并新增的答题记录，冷启动或记录被替换时才整体重算"""
+    system = AdaptiveLearningSystem()
+    system.user_profiles['u1'] = system.UserProfile()
+    columns, topic_data = make_attempts(n_users=1, n_topics=1)
+    history = topic_data[('user_0', 'topic_0')]['exercise_attempts']
+    attempts = CountingAttempts(history[:100])
+    performance_data = {'completion_rate': 0.5, 'accuracy': 0.5, 'exercise_attempts': attempts}
+
+    system.track_progress('u1', 'math', performance_data)
+    assert attempts.reads >= 100  # 冷启动
+
+    for attempt in history[100:]:
+        attempts.append(attempt)
+        attempts.reads = 0
+        adjustments = system.track_progress('u1', 'math', performance_data)
+        assert attempts.reads <= 2
+    expected = system._analyze_fatigue_level({'exercise_attempts': history})
+    assert adjustments['fatigue_status']['level'] == expected
+
+    replaced = {'completion_rate': 0.5, 'accuracy': 0.5,
+                'exercise_attempts': [{'time_spent': 5, 'correct': True}, {'time_spent': 6, 'correct': False}]}
+    adjustments = system.track_progress('u1', 'math', replaced)
+    assert adjustments['fatigue_status']['level'] == system._analyze_fatigue_level(replaced)
+
+
+def test_profile_history_is_bounded():
+    """测试准确率历史为定长环形缓冲"""
+    profile = AdaptiveLearningSystem.UserProfile(history_limit=3)
+    for value in range(5):
+        profile.accuracy_history.append(value)
+    assert list(profile.accuracy_history) == [2, 3, 4]
+    assert not hasattr(profile, '__dict__')
+    assert profile.to_dict()['accuracy_history'] == [2, 3, 4]
+
+
+def test_profile_store_spills_and_rehydrates(tmp_path):
+    """测试 LRU 淘汰写盘并在访问时加载回内存"""
+    store = ProfileStore(capacity=2, spill_path=str(tmp_path / 'profiles.db'))
+    for user_id in range(5):
+        profile = AdaptiveLearningSystem.UserProfile()
+        profile.learning_style = f'style_{user_id}'
+        store[user_id] = profile
+
+    assert store.hot_size == 2
+    assert len(store) == 5
+    assert 0 in store and 'missing' not in store
+    assert store[0].learning_style == 'style_0'
+    assert store.hot_size == 2
+    assert sorted(store) == [0, 1, 2, 3, 4]
+
+    store[1].fatigue_pattern['math'] = 0.5
+    for user_id in (2, 3, 4):
+        store[user_id]
+    assert store[1].fatigue_pattern == {'math': 0.5}
+
+    del store[3]
+    assert 3 not in store and len(store) == 4
+    assert store.get('missing') is None
+    store.close()
+
+
+def test_stores_share_spill_file(tmp_path):
+    """测试多个存储共用一个磁盘文件时，一个存储的删除不会锁住其他存储的写入"""
+    system = AdaptiveLearningSystem(profile_capacity=1, spill_path=str(tmp_path / 'spill.db'))
+    system.user_profiles[0] = system.UserProfile()
+    system.user_profiles[1] = system.UserProfile()
+    system.user_profiles[1] = system.UserProfile()
+    for user_id in range(3):
+        system.learning_sessions[user_id] = {'math': user_id}
+    assert system.learning_sessions[0] == {'math': 0}
+    del system.user_profiles[0]
+    system.learner_metrics['u1'] = {}
+    system.learner_metrics['u2'] = {}
+    assert len(system.user_profiles) == 1 and len(system.learning_sessions) == 3
+    system.close()
+
+
+def test_temp_spill_files_are_removed():
+    """测试自动创建的临时文件在 with 语句结束或存储被回收时删除"""
+    with AdaptiveLearningSystem(profile_capacity=1) as system:
+        for user_id in range(3):
+            system.user_profiles[user_id] = system.UserProfile()
+        path = system.user_profiles.spill_path
+        assert os.path.exists(path)
+    assert not os.path.exists(path)
+
+    store = ProfileStore(capacity=1)
+    store['a'] = store['b'] = 1
+    path = store.spill_path
+    del store
+    gc.collect()
+    assert not os.path.exists(path)
+
+
+def test_learning_system_with_small_capacity():
+    """测试小容量下学习系统仍能正确读写用户数据"""
+    system = AdaptiveLearningSystem(profile_capacity=1)
+    for user_id in ('u1', 'u2'):
+        system.user_profiles[user_id] = system.UserProfile()
+        system.record_attempt(user_id, 'math', 5, True)
+        system.track_progress(user_id, 'math', {'completion_rate': 0.5, 'accuracy': 0.9})
+    assert system.user_profiles.hot_size == 1
+    assert system.learner_metrics['u1']['math'].count == 1
+    assert 'math' in system.learning_sessions['u1']
+    system.close()
+
+
+def test_best_learning_time_from_histogram():
+    """测试增量直方图维护最佳学习时间"""
+    system = AdaptiveLearningSystem()
+    system.user_profiles['u1'] = system.UserProfile()
+    base = datetime(2024, 3, 4)
+    for hour, score in [(9, 0.9), (14, 0.7), (20, 0.8), (9, 0.6), (22, 0.85)]:
+        system.record_performance('u1', base.replace(hour=hour), score)
+
+    assert system.analyze_best_learning_time('u1') == [22, 20, 9]
+    assert system.user_profiles['u1'].best_learning_hours == [22, 20, 9]
+    assert system.analyze_best_learning_time('u1', k=1) == [22]
+    assert system.analyze_best_learning_time('missing') == []
+    history = [{'timestamp': base.replace(hour=h), 'performance_score': s}
+               for h, s in [(9, 0.9), (14, 0.7), (20, 0.8)]]
+    assert system.analyze_best_learning_time('u1', history) == [9, 20, 14]
+
+
+def test_best_learning_time_ties_keep_first_seen_order():
+    """测试平均得分相同的时间段按第一次出现的先后排列，批量计算与之一致"""
+    system = AdaptiveLearningSystem()
+    base = datetime(2024, 3, 4)
+    records = [(14, 0.8), (9, 0.8), (20, 0.5), (3, 0.8), (9, 0.8)]
+    history = [{'timestamp': base.replace(hour=h), 'performance_score': s} for h, s in records]
+    assert system.analyze_best_learning_time('u1', history) == [14, 9, 3]
+
+    results = AdaptiveLearningSystem.best_learning_hours_batch(
+        ['u1'] * len(records), [base.replace(hour=h) for h, _ in records], [s for _, s in records])
+    assert results == {'u1': [14, 9, 3]}
+
+
+def test_hour_of_week_histogram():
+    """测试按一周中的小时统计"""
+    histogram = PerformanceHistogram(buckets=PerformanceHistogram.HOURS_OF_WEEK)
+    histogram.add(datetime(2024, 3, 4, 9), 0.5)   # 星期一
+    histogram.add(datetime(2024, 3, 9, 9), 0.9)   # 星期六
+    assert histogram.best_hours() == [5 * 24 + 9, 9]
+
+
+def test_best_learning_hours_batch_matches_incremental():
+    """测试批量计算与逐条累计结果一致"""
+    rng = random.Random(5)
+    system = AdaptiveLearningSystem()
+    user_ids, timestamps, scores = [], [], []
+    for _ in range(3000):
+        user_id = rng.randrange(40)
+        timestamp = datetime(2024, 1, 1) + timedelta(minutes=rng.randrange(60 * 24 * 14))
+        score = rng.randrange(0, 20) / 20
+        user_ids.append(user_id)
+        timestamps.append(timestamp)
+        scores.append(score)
+        if user_id not in system.user_profiles:
+            system.user_profiles[user_id] = system.UserProfile()
+        system.record_performance(user_id, timestamp, score)
+
+    results = AdaptiveLearningSystem.best_learning_hours_batch(user_ids, timestamps, scores)
+    assert set(results) == set(user_ids)
+    for user_id, hours in results.items():
+        assert hours == system.analyze_best_learning_time(user_id)
+
+    weekly = AdaptiveLearningSystem.best_learning_hours_batch(
+        user_ids, timestamps, scores, k=5, buckets=PerformanceHistogram.HOURS_OF_WEEK)
+    for user_id, hours in weekly.items():
+        histogram = PerformanceHistogram(PerformanceHistogram.HOURS_OF_WEEK)
+        for u, t, s in zip(user_ids, timestamps, scores):
+            if u == user_id:
+                histogram.add(t, s)
+        assert hours == histogram.best_hours(5)
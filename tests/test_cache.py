@@ -0,0 +1,143 @@
+import time
+
+import pytest
+from app import app, db, response_cache
+from cache import FileCache, MemoryCache, ResponseCache
+from models import User, Problem
+
+
+def test_memory_cache_lru_and_ttl():
+    cache = MemoryCache(maxsize=2, ttl=0.05)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    assert cache.get('b') is None  # 最久未使用的被淘汰
+    cache.set('d', 4, ttl=None)
+    time.sleep(0.06)
+    assert cache.get('c') is None
+    assert cache.get('d') == 4
+
+
+def test_file_cache_shared_between_instances(tmp_path):
+    """测试文件缓存可以被另一个实例（进程）读到，过期后失效"""
+    writer, reader = FileCache(str(tmp_path), ttl=0.05), FileCache(str(tmp_path))
+    writer.set('key', {'title': '题目'})
+    writer.set('forever', [1, 2], ttl=None)
+    assert reader.get('key') == {'title': '题目'}
+    time.sleep(0.06)
+    assert reader.get('key') is None
+    assert reader.get('forever') == [1, 2]
+
+
+@pytest.mark.parametrize('backend', ['memory', 'file'])
+def test_versioned_keys(tmp_path, backend):
+    """测试实体版本更新后依赖它的缓存项和 ETag 失效，其他实体不受影响"""
+    cache = ResponseCache(MemoryCache() if backend == 'memory' else FileCache(str(tmp_path)))
+    calls = []
+
+    def load(value):
+        calls.append(value)
+        return value
+
+    assert cache.cached('page', ['a'], lambda: load(1)) == 1
+    assert cache.cached('page', ['a'], lambda: load(2)) == 1
+    assert cache.cached('other', ['b'], lambda: load(3)) == 3
+    etag = cache.etag('page', ['a'])
+
+    cache.invalidate('a')
+    assert cache.etag('page', ['a']) != etag
+    assert cache.cached('page', ['a'], lambda: load(4)) == 4
+    assert cache.cached('other', ['b'], lambda: load(5)) == 3
+    assert calls == [1, 3, 4]
+
+
+def test_versions_across_workers(tmp_path):
+    """测试其他 worker 的修改：进程内后端的版本号在 ttl 后过期，文件后端立即可见"""
+    handled, other = ResponseCache(MemoryCache(ttl=0.05)), ResponseCache(MemoryCache(ttl=0.05))
+    etag = other.etag('page', ['a'])
+    handled.invalidate('a')
+    time.sleep(0.06)
+    assert other.etag('page', ['a']) != etag
+
+    handled, other = ResponseCache(FileCache(str(tmp_path))), ResponseCache(FileCache(str(tmp_path)))
+    etag = other.etag('page', ['a'])
+    handled.invalidate('a')
+    assert other.etag('page', ['a']) != etag
+
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    with app.app_context():
+        db.create_all()
+        response_cache.clear()
+        user = User(username='testuser', email='testuser@example.com')
+        user.set_password('testpass')
+        db.session.add(user)
+        db.session.commit()
+        with app.test_client() as client:
+            client.post('/login', json={'username': 'testuser', 'password': 'testpass'})
+            yield client
+        db.session.remove()
+        db.drop_all()
+
+
+def test_learning_paths_cached_until_post(client, count_queries):
+    """测试学习路径列表命中缓存时不再查询路径表，创建路径后失效"""
+    client.post('/learning-paths', json={'name': '算法入门', 'description': '基础', 'topics': ['数组']})
+    first = client.get('/learning-paths')
+    assert first.status_code == 200 and '算法入门' in first.get_data(as_text=True)
+
+    with count_queries() as statements:
+        second = client.get('/learning-paths')
+    assert second.get_data() == first.get_data()
+    assert not any('learning_paths' in s for s in statements)
+
+    client.post('/learning-paths', json={'name': '动态规划', 'description': '进阶', 'topics': []})
+    assert '动态规划' in client.get('/learning-paths').get_data(as_text=True)
+
+
+def test_etag_not_modified(client, count_queries):
+    """测试带着相同 ETag 的请求返回 304，内容变化后 ETag 随之变化"""
+    client.post('/learning-paths', json={'name': '算法入门', 'description': '基础', 'topics': []})
+    etag = client.get('/learning-paths/1').headers['ETag']
+    list_etag = client.get('/learning-paths').headers['ETag']
+
+    with count_queries() as statements:
+        response = client.get('/learning-paths/1', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert not any('learning_paths' in s for s in statements)
+
+    client.post('/learning-paths', json={'name': '动态规划', 'description': '进阶', 'topics': []})
+    assert client.get('/learning-paths', headers={'If-None-Match': list_etag}).status_code == 200
+    assert client.get('/learning-paths/1', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_etag_matches_body_when_version_expires(client, monkeypatch):
+    """测试版本号在一次请求中途过期时，ETag 仍与返回的内容对应同一个缓存键"""
+    client.post('/learning-paths', json={'name': '算法入门', 'description': '基础', 'topics': []})
+    versions = iter(range(1000))
+    monkeypatch.setattr(response_cache, 'version', lambda entity: str(next(versions)))
+
+    response = client.get('/learning-paths/1')
+    assert response.status_code == 200
+    backend = response_cache.backend
+    etag, _ = response.get_etag()
+    assert any(ResponseCache.etag_of(key) == etag
+               and backend.get(key) == response.get_data(as_text=True) for key in list(backend._items))
+
+
+def test_problem_page_cached(client, count_queries):
+    problem = Problem(title='两数之和', content='给定一个整数数组', difficulty='easy', tags=['数组'])
+    db.session.add(problem)
+    db.session.commit()
+    problem_id = problem.id
+    assert '两数之和' in client.get(f'/problems/{problem_id}').get_data(as_text=True)
+    db.session.expunge_all()  # 避免从会话的对象缓存中取到题目
+
+    with count_queries() as statements:
+        assert '两数之和' in client.get(f'/problems/{problem_id}').get_data(as_text=True)
+    assert not any('problems' in s for s in statements)
+    assert client.get('/problems/999').status_code == 404
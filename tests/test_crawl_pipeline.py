@@ -0,0 +1,76 @@
+import asyncio
+import time
+
+import pytest
+from crawl_pipeline import CrawlPipeline, CrawlSource
+from question_store import QuestionStore
+
+
+class SlowSource(CrawlSource):
+    def __init__(self, name, titles, list_delay=0.0, detail_delay=0.0):
+        self.name = name
+        self.titles = titles
+        self.list_delay = list_delay
+        self.detail_delay = detail_delay
+        self.pipeline = None
+        self.queue_depths = []
+
+    async def list_entries(self, spider):
+        await asyncio.sleep(self.list_delay)
+        return [{'title': title, 'url': f'https://{self.name}.com/{title}'} for title in self.titles]
+
+    async def fetch_detail(self, spider, entry):
+        if self.pipeline is not None:
+            self.queue_depths.append(self.pipeline.stages[1].queue.qsize())
+        await asyncio.sleep(self.detail_delay)
+        return dict(entry, content=f"{entry['title']}的内容")
+
+    def normalize(self, entry):
+        return dict(entry, source=self.name)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = QuestionStore(str(tmp_path / 'questions.jsonl'))
+    yield store
+    store.close()
+
+
+def test_sources_crawl_concurrently(store):
+    """测试多个来源的列表和详情并发抓取"""
+    sources = [SlowSource(f's{i}', [f's{i}-{j}' for j in range(5)], list_delay=0.1, detail_delay=0.02)
+               for i in range(3)]
+    pipeline = CrawlPipeline(None, sources, store, detail_workers=5)
+    start = time.perf_counter()
+    saved = asyncio.run(pipeline.run())
+    elapsed = time.perf_counter() - start
+
+    assert len(saved) == len(store) == 15
+    # 串行需要 3 × 0.1 秒列表加 15 × 0.02 秒详情
+    assert elapsed < 0.3
+    assert all(store.get_checkpoint(s.name)['offset'] == 0 for s in sources)
+
+
+def test_dedup_across_sources_and_stage_stats(store):
+    """测试不同来源的同名题目只保存一次，各阶段统计处理量"""
+    store.add({'title': '旧题', 'url': 'https://a.com/旧题', 'content': '旧内容'})
+    sources = [SlowSource('a', ['题目1', '题目2', '旧题']), SlowSource('b', ['题目2', '题目3'])]
+    pipeline = CrawlPipeline(None, sources, store)
+    saved = asyncio.run(pipeline.run())
+
+    assert sorted(q['title'] for q in saved) == ['题目1', '题目2', '题目3']
+    assert len(store) == 4
+    stats = {s['stage']: s for s in pipeline.stats()}
+    assert [stats[name]['processed'] for name in ('list', 'detail', 'normalize', 'dedup', 'persist')] == [2, 4, 4, 4, 3]
+    assert all(s['queue_depth'] == 0 and s['per_second'] > 0 for s in stats.values())
+
+
+def test_queues_are_bounded(store):
+    """测试详情阶段跟不上时列表阶段等待，队列深度不超过上限"""
+    source = SlowSource('a', [f'题目{i}' for i in range(30)], detail_delay=0.005)
+    pipeline = CrawlPipeline(None, [source], store, detail_workers=1, queue_size=3)
+    source.pipeline = pipeline
+    asyncio.run(pipeline.run())
+
+    assert len(store) == 30
+    assert 2 <= max(source.queue_depths) <= 3
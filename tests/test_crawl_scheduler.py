@@ -0,0 +1,155 @@
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+from crawl_scheduler import CrawlLock, CrawlScheduler
+from models import Problem
+from question_store import QuestionStore
+
+
+class FakeScheduler(CrawlScheduler):
+    POLL_INTERVAL = 0.01
+
+    def __init__(self, tmp_path, crawl_time=0.0, **kwargs):
+        super().__init__(store_path=str(tmp_path / 'questions.jsonl'), **kwargs)
+        self.crawl_time = crawl_time
+        self.runs = self.active = self.peak = 0
+        self.cancelled = False
+
+    async def crawl(self):
+        self.runs += 1
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.crawl_time)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        finally:
+            self.active -= 1
+
+    def import_questions(self):
+        return 0, 0
+
+
+def run_until(scheduler, stop_after):
+    stop = threading.Event()
+    threading.Timer(stop_after, stop.set).start()
+    start = time.perf_counter()
+    asyncio.run(scheduler.run(stop))
+    return time.perf_counter() - start
+
+
+def test_next_delay_jitter(tmp_path):
+    scheduler = FakeScheduler(tmp_path, interval=100, jitter=0.2)
+    delays = [scheduler.next_delay() for _ in range(200)]
+    assert all(80 <= d <= 120 for d in delays)
+    assert max(delays) - min(delays) > 10
+
+
+def test_runs_repeatedly_without_overlap(tmp_path):
+    """测试按间隔重复运行，上一轮结束前不会开始下一轮"""
+    scheduler = FakeScheduler(tmp_path, crawl_time=0.05, interval=0.02, jitter=0.5)
+    run_until(scheduler, 0.4)
+    assert scheduler.runs >= 3
+    assert scheduler.peak == 1
+    assert not os.path.exists(scheduler.lock_path)
+
+
+def test_lock_skips_concurrent_crawl(tmp_path):
+    """测试其他进程持有锁时跳过本轮，遗留的过期锁会被清理"""
+    scheduler = FakeScheduler(tmp_path)
+    lock = CrawlLock(scheduler.lock_path)
+    assert lock.acquire()
+    assert not asyncio.run(scheduler.run_once())
+    assert scheduler.runs == 0
+
+    old = time.time() - 25 * 3600
+    os.utime(scheduler.lock_path, (old, old))
+    assert asyncio.run(scheduler.run_once())
+    assert scheduler.runs == 1
+
+
+@pytest.mark.skipif(os.name != 'posix', reason='需要探测进程是否存在')
+def test_lock_of_exited_process_is_taken_over(tmp_path):
+    """测试持有者进程已退出的锁即使刚更新过也会被接管"""
+    import subprocess
+    import sys
+    child = subprocess.Popen([sys.executable, '-c', 'pass'])
+    child.wait()
+    scheduler = FakeScheduler(tmp_path)
+    with open(scheduler.lock_path, 'w') as f:
+        f.write(str(child.pid))
+    assert asyncio.run(scheduler.run_once())
+    assert scheduler.runs == 1
+    assert not os.path.exists(scheduler.lock_path)
+
+
+def test_heartbeat_keeps_long_crawl_locked(tmp_path):
+    """测试抓取期间心跳不断更新锁文件，运行超过 stale_after 的抓取不会被当作遗留锁"""
+    class SlowScheduler(FakeScheduler):
+        HEARTBEAT_INTERVAL = 0.01
+
+        async def crawl(self):
+            old = time.time() - 25 * 3600
+            os.utime(self.lock_path, (old, old))
+            await super().crawl()
+
+    scheduler = SlowScheduler(tmp_path, crawl_time=0.1)
+    other = FakeScheduler(tmp_path)
+
+    async def main():
+        task = asyncio.create_task(scheduler.run_once())
+        await asyncio.sleep(0.05)
+        assert not await other.run_once()
+        assert await task
+
+    asyncio.run(main())
+    assert other.runs == 0
+    assert not os.path.exists(scheduler.lock_path)
+
+
+def test_release_keeps_lock_taken_over_by_others(tmp_path):
+    """测试锁被其他进程接管后，原持有者释放时不会删除它"""
+    lock = CrawlLock(str(tmp_path / 'crawl.lock'))
+    assert lock.acquire()
+    with open(lock.path, 'w') as f:
+        f.write('1')
+    lock.release()
+    assert os.path.exists(lock.path)
+
+
+def test_stop_cancels_running_crawl(tmp_path):
+    """测试停止时取消正在运行的一轮并释放锁"""
+    scheduler = FakeScheduler(tmp_path, crawl_time=30)
+    elapsed = run_until(scheduler, 0.1)
+    assert elapsed < 1
+    assert scheduler.cancelled
+    assert not os.path.exists(scheduler.lock_path)
+
+
+def test_import_questions_in_batches(tmp_path, app_context):
+    """测试题库分批导入数据库，之后只导入新抓到的题目，抓取失败的题目跳过"""
+    scheduler = CrawlScheduler(store_path=str(tmp_path / 'questions.jsonl'), import_batch_size=3)
+    with QuestionStore(scheduler.store_path) as store:
+        store.add_many([{'title': f'题目{i}', 'difficulty': 'easy', 'content': f'内容{i}',
+                         'url': f'https://example.com/p{i}', 'fetched_at': time.time()} for i in range(7)])
+        store.add({'title': '失败的题目', 'difficulty': 'easy', 'content': '题目内容获取失败',
+                   'url': 'https://example.com/failed', 'fetched_at': 0})
+
+    assert scheduler.import_questions() == (7, 0)
+    assert scheduler.import_questions() == (0, 0)
+
+    with QuestionStore(scheduler.store_path) as store:
+        store.upsert_many([{'title': '题目7', 'difficulty': 'easy', 'content': '内容7',
+                            'url': 'https://example.com/p7', 'fetched_at': time.time() + 1},
+                           {'title': '题目0', 'difficulty': 'easy', 'content': '内容0',
+                            'url': 'https://example.com/p0', 'fetched_at': time.time() + 1}])
+        store.compact()  # 压缩后偏移量改变，断点不受影响
+
+    assert scheduler.import_questions() == (1, 1)
+    assert scheduler.import_questions() == (0, 0)
+    assert Problem.query.count() == 8
+    assert {p.source for p in Problem.query} == {'spider'}
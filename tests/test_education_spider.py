@@ -0,0 +1,223 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip('playwright')
+from crawl_pipeline import CrawlSource
+from education_spider import EducationSpider, HostRateLimiter, PagePool
+
+
+class FakePage:
+    def __init__(self):
+        self.closed = False
+
+    def is_closed(self):
+        return self.closed
+
+    def set_default_timeout(self, timeout):
+        pass
+
+    async def close(self):
+        self.closed = True
+
+    async def goto(self, url, **kwargs):
+        self.url = url
+
+    async def wait_for_selector(self, selector, **kwargs):
+        page = self
+
+        class Element:
+            async def text_content(self):
+                return f'{page.url} 的内容'
+        return Element()
+
+
+class FakeContext:
+    def __init__(self):
+        self.pages = []
+
+    async def new_page(self):
+        page = FakePage()
+        self.pages.append(page)
+        return page
+
+
+def test_rate_limiter_spaces_requests_per_host():
+    """测试同一主机的请求按间隔排队，不同主机互不影响"""
+    async def run():
+        limiter = HostRateLimiter(rate=20)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        starts = {}
+
+        async def request(url):
+            await limiter.wait(url)
+            starts.setdefault(url.split('/')[2], []).append(loop.time() - start)
+
+        await asyncio.gather(*(request(f'https://{host}/p{i}') for host in ('a.com', 'b.com') for i in range(4)))
+        return starts
+
+    starts = asyncio.run(run())
+    for times in starts.values():
+        gaps = [b - a for a, b in zip(times, times[1:])]
+        assert all(gap >= 0.045 for gap in gaps)
+        assert times[0] < 0.02
+
+
+def test_page_pool_bounds_and_reuses_pages():
+    """测试页面池限制同时使用的页面数并复用页面"""
+    async def run():
+        context = FakeContext()
+        pool = PagePool(context, size=3)
+        active = peak = 0
+
+        async def task():
+            nonlocal active, peak
+            async with pool.page():
+                active += 1
+                peak = max(peak, active)
+                await asyncio.sleep(0.01)
+                active -= 1
+
+        await asyncio.gather(*(task() for _ in range(20)))
+        await pool.close()
+        return context, peak
+
+    context, peak = asyncio.run(run())
+    assert peak == 3
+    assert len(context.pages) == 3
+    assert all(page.closed for page in context.pages)
+
+
+def test_throttled_host_does_not_hold_pool_pages():
+    """测试等待限速时不占用页面池，其他主机的请求不会被挡住"""
+    async def run():
+        spider = EducationSpider()
+        spider.rate_limiter = HostRateLimiter(rate=5)
+        spider.page_pool = PagePool(FakeContext(), size=1)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+
+        async def other_host():
+            await asyncio.sleep(0.05)  # 此时 LeetCode 的后两个请求正在等待限速
+            await spider.rate_limiter.wait('https://www.nowcoder.com/p1')
+            async with spider.page_pool.page():
+                return loop.time() - start
+
+        results = await asyncio.gather(
+            *(spider._fetch_leetcode_problem_content(f'/problems/p{i}') for i in range(3)), other_host())
+        return results
+
+    *contents, other_done = asyncio.run(run())
+    assert contents[0] == 'https://leetcode.cn/problems/p0 的内容'
+    assert other_done < 0.15
+
+
+class FakeRoute:
+    def __init__(self, resource_type):
+        self.request = type('Request', (), {'resource_type': resource_type})()
+        self.action = None
+
+    async def abort(self):
+        self.action = 'abort'
+
+    async def continue_(self):
+        self.action = 'continue'
+
+
+def test_production_mode_blocks_non_essential_resources():
+    """测试生产模式只放行页面和脚本等必要资源"""
+    spider = EducationSpider(production=True)
+    routes = {t: FakeRoute(t) for t in ('document', 'script', 'xhr', 'fetch', 'image', 'font', 'stylesheet', 'media')}
+    for route in routes.values():
+        asyncio.run(spider._block_resources(route))
+    assert {t for t, r in routes.items() if r.action == 'abort'} == {'image', 'font', 'stylesheet', 'media'}
+    assert all(r.action == 'continue' for t, r in routes.items() if t in ('document', 'script', 'xhr', 'fetch'))
+
+
+class FakeSource(CrawlSource):
+    name = 'test'
+
+    def __init__(self, count, fail_on=None):
+        self.entries = [{'title': f'题目{i}', 'url': f'https://example.com/p{i}'} for i in range(count)]
+        self.fail_on = fail_on
+        self.fetched = []
+
+    async def list_entries(self, spider):
+        return self.entries
+
+    async def fetch_detail(self, spider, entry):
+        if entry['title'] == self.fail_on:
+            raise RuntimeError('浏览器崩溃')
+        self.fetched.append(entry['title'])
+        return dict(entry, content=f"{entry['title']}的内容")
+
+
+def test_crawl_resumes_from_checkpoint_and_skips_fresh_entries(tmp_path):
+    """测试失败的条目不阻塞断点推进，已抓取且未过期的题目不再抓取详情"""
+    spider = EducationSpider(store_path=str(tmp_path / 'questions.jsonl'), legacy_path=None, concurrency=2)
+    spider.load_questions()
+
+    fetched = asyncio.run(spider.crawl([FakeSource(6, fail_on='题目3')], limit=4))
+    assert sorted(q['title'] for q in fetched) == ['题目0', '题目1', '题目2']
+    assert spider.store.get_checkpoint('test') == {'offset': 4}
+
+    source = FakeSource(6)
+    asyncio.run(spider.crawl([source], limit=10))
+    assert sorted(source.fetched) == ['题目4', '题目5']
+    assert spider.store.get_checkpoint('test')['offset'] == 0
+
+    source = FakeSource(6)
+    fetched = asyncio.run(spider.crawl([source], limit=10))
+    assert [q['title'] for q in fetched] == ['题目3']
+    assert len(spider.store) == 6
+    assert [q['title'] for q in asyncio.run(spider.crawl([FakeSource(6)], limit=10))] == []
+    spider.close_questions()
+
+
+class FakeClosable:
+    def __init__(self, error=None):
+        self.error = error
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+        if self.error:
+            raise self.error
+
+    stop = close
+
+
+def test_cleanup_does_not_mask_setup_errors(tmp_path, monkeypatch):
+    """测试浏览器启动失败时抛出原来的异常，已创建的部分照常关闭"""
+    spider = EducationSpider(store_path=str(tmp_path / 'questions.jsonl'), legacy_path=None)
+    playwright = FakeClosable()
+
+    async def failing_setup():
+        spider.playwright = playwright
+        raise RuntimeError('找不到浏览器')
+
+    monkeypatch.setattr(spider, 'setup_browser', failing_setup)
+    with pytest.raises(RuntimeError, match='找不到浏览器'):
+        asyncio.run(spider.update_question_database())
+    assert playwright.closed
+    assert spider.store is None
+
+
+def test_close_browser_closes_pool_first_and_continues_on_errors():
+    """测试关闭时先关页面池，其中一步出错不影响后续步骤"""
+    spider = EducationSpider()
+    order = []
+    pool, browser, playwright = FakeClosable(), FakeClosable(RuntimeError('浏览器已断开')), FakeClosable()
+    for name, resource in (('pool', pool), ('browser', browser), ('playwright', playwright)):
+        original = resource.close
+
+        async def close(name=name, original=original):
+            order.append(name)
+            await original()
+        resource.close = resource.stop = close
+    spider.page_pool, spider.browser, spider.playwright = pool, browser, playwright
+
+    asyncio.run(spider.close_browser())
+    assert order == ['pool', 'browser', 'playwright']
+    assert spider.page_pool is None and spider.browser is None and spider.playwright is None
@@ -0,0 +1,313 @@
+import os
+import random
+import threading
+
+import numpy as np
+import pytest
+
+from adaptive_learning_system import AdaptiveLearningSystem, FrozenKnowledgeGraph, KnowledgeGraph
+
+
+def build_graph():
+    graph = KnowledgeGraph()
+    for node in ['variables', 'loops', 'functions', 'recursion', 'sorting']:
+        graph.add_node(node)
+    graph.add_edge('variables', 'loops', 'prerequisite')
+    graph.add_edge('variables', 'functions', 'prerequisite')
+    graph.add_edge('loops', 'sorting', 'prerequisite')
+    graph.add_edge('functions', 'recursion', 'prerequisite')
+    graph.add_edge('recursion', 'sorting', 'related')
+    return graph
+
+
+def test_prerequisites_use_reverse_index():
+    """测试反向索引返回前置知识点"""
+    graph = build_graph()
+    assert graph.get_prerequisites('loops') == ['variables']
+    assert graph.get_prerequisites('sorting') == ['loops']
+    assert graph.get_incoming('sorting') == ['loops', 'recursion']
+    assert graph.get_prerequisites('variables') == []
+
+
+def test_edge_type_change_updates_index():
+    """测试重复添加边时按最新类型更新索引"""
+    graph = build_graph()
+    graph.add_edge('recursion', 'sorting', 'prerequisite')
+    assert sorted(graph.get_prerequisites('sorting')) == ['loops', 'recursion']
+    assert graph.get_incoming('sorting', 'related') == []
+
+
+def test_remove_edge_and_node():
+    """测试删除边和节点时维护反向索引"""
+    graph = build_graph()
+    assert graph.remove_edge('loops', 'sorting')
+    assert not graph.remove_edge('loops', 'sorting')
+    assert graph.get_prerequisites('sorting') == []
+    assert 'sorting' not in graph.graph['loops']
+
+    assert graph.remove_node('variables')
+    assert graph.get_prerequisites('loops') == []
+    assert graph.get_prerequisites('functions') == []
+    assert 'variables' not in graph.graph
+    assert 'variables' not in graph.node_weights
+
+
+def test_find_learning_path_shortest():
+    """测试最短学习路径"""
+    graph = build_graph()
+    assert graph.find_learning_path('variables', 'sorting') == ['variables', 'loops', 'sorting']
+    assert graph.find_learning_path('sorting', 'variables') is None
+    assert graph.find_learning_path('variables', 'unknown') is None
+
+
+def test_find_learning_paths_multi_target():
+    """测试一次遍历返回多个目标的路径"""
+    graph = build_graph()
+    paths = graph.find_learning_paths('variables', ['recursion', 'sorting', 'unknown', 'variables'])
+    assert paths == {
+        'recursion': ['variables', 'functions', 'recursion'],
+        'sorting': ['variables', 'loops', 'sorting'],
+        'unknown': None,
+        'variables': None,
+    }
+
+
+def test_find_learning_path_wide_graph():
+    """测试宽图上不复制路径也能找到正确结果"""
+    graph = KnowledgeGraph()
+    graph.add_node('root')
+    for i in range(2000):
+        graph.add_node(f'leaf_{i}')
+        graph.add_edge('root', f'leaf_{i}')
+    graph.add_node('goal')
+    graph.add_edge('leaf_1999', 'goal')
+    assert graph.find_learning_path('root', 'goal') == ['root', 'leaf_1999', 'goal']
+
+
+def test_all_prerequisites_closure():
+    """测试传递前置闭包"""
+    graph = build_graph()
+    assert graph.get_all_prerequisites('sorting') == {'variables', 'loops'}
+    assert graph.get_all_prerequisites('recursion') == {'variables', 'functions'}
+    assert graph.get_all_prerequisites('variables') == set()
+
+
+def test_closure_cache_invalidation():
+    """测试只失效受影响子图的缓存"""
+    graph = build_graph()
+    for node in ['loops', 'sorting', 'recursion', 'functions']:
+        graph.get_all_prerequisites(node)
+
+    graph.add_node('basics')
+    graph.add_edge('basics', 'loops', 'prerequisite')
+    assert 'loops' not in graph._ancestor_cache
+    assert 'sorting' not in graph._ancestor_cache
+    assert 'recursion' in graph._ancestor_cache
+    assert graph.get_all_prerequisites('sorting') == {'variables', 'loops', 'basics'}
+
+    graph.add_edge('recursion', 'sorting', 'prerequisite')
+    assert graph.get_all_prerequisites('sorting') == {'variables', 'loops', 'basics', 'functions', 'recursion'}
+
+    graph.remove_edge('loops', 'sorting')
+    assert graph.get_all_prerequisites('sorting') == {'variables', 'functions', 'recursion'}
+
+
+def test_topological_sort_and_cycles():
+    """测试拓扑排序与循环检测"""
+    graph = build_graph()
+    order = graph.topological_sort()
+    assert set(order) == {'variables', 'loops', 'functions', 'recursion', 'sorting'}
+    assert order.index('variables') < order.index('loops') < order.index('sorting')
+    assert order.index('functions') < order.index('recursion')
+
+    graph.add_edge('sorting', 'variables', 'prerequisite')
+    with pytest.raises(ValueError):
+        graph.topological_sort()
+
+
+def test_check_prerequisites():
+    """测试按学习顺序返回未掌握的前置知识点"""
+    system = AdaptiveLearningSystem()
+    system.knowledge_graph = build_graph()
+    system.knowledge_graph.add_edge('recursion', 'sorting', 'prerequisite')
+    assert system._check_prerequisites('sorting', ['loops']) == ['variables', 'functions', 'recursion']
+    assert system._check_prerequisites('variables') == []
+
+
+def build_random_graph(n_nodes=300, n_edges=900, seed=7):
+    rng = random.Random(seed)
+    graph = KnowledgeGraph()
+    for i in range(n_nodes):
+        graph.add_node(f't{i}', weight=rng.uniform(0.5, 2.0))
+    for _ in range(n_edges):
+        i, j = rng.randrange(n_nodes), rng.randrange(n_nodes + 20)
+        graph.add_edge(f't{i}', f't{j}', rng.choice(['prerequisite', 'related']))
+    return graph
+
+
+def test_frozen_graph_matches_dynamic():
+    """测试 CSR 表示与动态图查询结果一致"""
+    graph = build_random_graph()
+    frozen = graph.freeze()
+    nodes = [f't{i}' for i in range(0, 320, 7)]
+    targets = [f't{i}' for i in range(0, 320, 3)]
+
+    for node in nodes:
+        assert sorted(frozen.get_prerequisites(node)) == sorted(graph.get_prerequisites(node))
+        assert frozen.get_all_prerequisites(node) == graph.get_all_prerequisites(node)
+        assert frozen.find_learning_paths(node, targets) == graph.find_learning_paths(node, targets)
+    assert frozen.find_learning_path('missing', 't1') is None
+    assert np.allclose(frozen.node_weights[:300], [graph.node_weights[f't{i}'] for i in range(300)])
+
+
+def test_frozen_topological_sort():
+    """测试 CSR 表示上的拓扑排序"""
+    frozen = build_graph().freeze()
+    order = frozen.topological_sort()
+    assert order.index('variables') < order.index('loops') < order.index('sorting')
+    assert order.index('functions') < order.index('recursion')
+
+    cyclic = build_graph()
+    cyclic.add_edge('sorting', 'variables', 'prerequisite')
+    with pytest.raises(ValueError):
+        cyclic.freeze().topological_sort()
+
+
+def build_weighted_graph():
+    graph = KnowledgeGraph()
+    for node, weight in [('start', 1.0), ('hard', 10.0), ('easy_a', 1.0), ('easy_b', 2.0),
+                         ('medium', 4.0), ('goal', 1.0)]:
+        graph.add_node(node, weight=weight)
+    graph.add_edge('start', 'hard', 'prerequisite')
+    graph.add_edge('hard', 'goal', 'prerequisite')
+    graph.add_edge('start', 'easy_a', 'prerequisite')
+    graph.add_edge('easy_a', 'easy_b', 'prerequisite')
+    graph.add_edge('easy_b', 'goal', 'prerequisite')
+    graph.add_edge('start', 'medium', 'related')
+    graph.add_edge('medium', 'goal', 'related')
+    return graph
+
+
+def test_weighted_learning_path():
+    """测试按节点权重选择学习路径"""
+    graph = build_weighted_graph()
+    assert graph.find_learning_path('start', 'goal') == ['start', 'hard', 'goal']
+    assert graph.find_weighted_learning_path('start', 'goal') == (
+        ['start', 'easy_a', 'easy_b', 'goal'], 5.0)
+    assert graph.find_weighted_learning_path('start', 'goal', max_weight=4.0) is None
+    assert graph.find_weighted_learning_path('goal', 'start') is None
+
+
+def test_k_learning_paths():
+    """测试 k 条备选路径按总权重排序"""
+    graph = build_weighted_graph()
+    paths = graph.find_k_learning_paths('start', 'goal', k=5)
+    assert paths == [
+        (['start', 'easy_a', 'easy_b', 'goal'], 5.0),
+        (['start', 'medium', 'goal'], 6.0),
+        (['start', 'hard', 'goal'], 12.0),
+    ]
+    assert graph.find_k_learning_paths('start', 'goal', k=2, max_weight=5.5) == paths[:1]
+    assert graph.freeze().find_k_learning_paths('start', 'goal', k=5) == paths
+
+
+def test_k_learning_paths_match_brute_force():
+    """测试 Yen 算法与穷举所有简单路径的结果一致"""
+    graph = build_random_graph(n_nodes=12, n_edges=60, seed=2)
+
+    def all_simple_paths(node, goal, path):
+        if node == goal:
+            yield path
+            return
+        for next_node in graph.edge_types.get(node, {}):
+            if next_node not in path and next_node in graph.graph:
+                yield from all_simple_paths(next_node, goal, path + [next_node])
+
+    for start, goal in [('t0', 't10'), ('t3', 't7'), ('t1', 't8')]:
+        costs = sorted(sum(graph.node_weights[n] for n in path)
+                       for path in all_simple_paths(start, goal, [start]))
+        found = graph.find_k_learning_paths(start, goal, k=6)
+        assert found
+        assert [round(cost, 9) for _, cost in found] == [round(cost, 9) for cost in costs[:6]]
+
+
+def test_weighted_path_rejects_negative_weight():
+    """测试负权重节点"""
+    graph = build_weighted_graph()
+    graph.node_weights['easy_a'] = -1.0
+    with pytest.raises(ValueError):
+        graph.find_weighted_learning_path('start', 'goal')
+
+
+def test_snapshot_roundtrip(tmp_path):
+    """测试快照保存后以内存映射方式加载"""
+    graph = build_random_graph()
+    frozen = graph.freeze()
+    path = tmp_path / 'graph.kgs'
+    frozen.save(path)
+    loaded = FrozenKnowledgeGraph.load(path)
+
+    assert len(loaded) == len(frozen)
+    assert loaded.edge_type_names == frozen.edge_type_names
+    assert 't5' in loaded and 't305' not in loaded and 'missing' not in loaded
+    assert loaded.node_id('t5') == frozen.node_id('t5')
+    nodes = [f't{i}' for i in range(0, 320, 11)]
+    for node in nodes:
+        assert loaded.get_prerequisites(node) == frozen.get_prerequisites(node)
+        assert loaded.get_all_prerequisites(node) == frozen.get_all_prerequisites(node)
+        assert loaded.find_learning_paths(node, nodes) == frozen.find_learning_paths(node, nodes)
+        assert loaded.find_weighted_learning_path(node, 't1') == \
+            frozen.find_weighted_learning_path(node, 't1')
+
+
+def test_snapshot_close_releases_mapping(tmp_path):
+    """测试关闭快照时释放内存映射"""
+    path = tmp_path / 'graph.kgs'
+    build_graph().freeze().save(path)
+    with FrozenKnowledgeGraph.load(path) as loaded:
+        buffer = loaded._snapshot
+        assert loaded.get_all_prerequisites('sorting')
+        loaded.topological_sort()
+    assert buffer.closed
+    loaded.close()
+
+
+def test_concurrent_snapshot_saves(tmp_path):
+    """测试并发保存同一路径时各自使用临时文件，最终文件完整且没有遗留临时文件"""
+    frozen = build_random_graph().freeze()
+    path = tmp_path / 'graph.kgs'
+    errors = []
+
+    def save():
+        try:
+            for _ in range(10):
+                frozen.save(path)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=save) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert os.listdir(tmp_path) == ['graph.kgs']
+    with FrozenKnowledgeGraph.load(path) as loaded:
+        assert len(loaded) == len(frozen)
+
+
+def test_snapshot_used_by_learning_system(tmp_path):
+    """测试学习系统直接使用快照"""
+    path = tmp_path / 'graph.kgs'
+    build_graph().freeze().save(path)
+    system = AdaptiveLearningSystem(knowledge_graph=FrozenKnowledgeGraph.load(path))
+    assert system.knowledge_graph.topological_sort() == build_graph().freeze().topological_sort()
+    assert system._check_prerequisites('sorting') == ['variables', 'loops']
+
+
+def test_snapshot_rejects_invalid_file(tmp_path):
+    """测试加载非快照文件"""
+    path = tmp_path / 'bad.kgs'
+    path.write_bytes(b'not a snapshot' * 10)
+    with pytest.raises(ValueError):
+        FrozenKnowledgeGraph.load(path)
@@ -0,0 +1,82 @@
+import pytest
+from sqlalchemy import create_engine, inspect
+from app import db
+from models import User, Problem, Submission, upgrade_schema
+from services import UserService, ProblemService, ActivityTrackingService, RecommendationService
+
+
+def full_scans(queries):
+    """对每条查询执行 EXPLAIN QUERY PLAN，返回其中的全表扫描步骤"""
+    connection = db.session.connection()
+    scans = []
+    for statement, parameters in queries:
+        if not statement.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE')):
+            continue
+        for row in connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters):
+            if row[-1].startswith('SCAN '):
+                scans.append((row[-1], statement))
+    return scans
+
+
+def populate():
+    users = [User(username=f'user{i}', email=f'user{i}@example.com') for i in range(3)]
+    problems = [Problem(title=f'题目{i}', content='内容', difficulty=d, source='test')
+                for i, d in enumerate(['easy', 'medium', 'hard'] * 4)]
+    db.session.add_all(users + problems)
+    db.session.commit()
+    db.session.add_all([Submission(user_id=u.id, problem_id=p.id, is_correct=(u.id + p.id) % 2 == 0,
+                                   time_spent=60) for u in users for p in problems])
+    db.session.commit()
+    return users[0], problems[0]
+
+
+HOT_QUERIES = {
+    'user_statistics': lambda user, problem: UserService.get_user_statistics(user),
+    'user_features': lambda user, problem: RecommendationService().get_user_features(user),
+    'solved_problems': lambda user, problem: RecommendationService.get_solved_problems(user.id),
+    'recommend_by_difficulty': lambda user, problem: RecommendationService()._recommend_by_difficulty(user, 5),
+    'problems_by_difficulty': lambda user, problem: ProblemService.get_problems_by_difficulty('easy'),
+    'problem_by_title': lambda user, problem: Problem.query.filter_by(title=problem.title).first(),
+    'record_activity': lambda user, problem: ActivityTrackingService.record_activity(
+        user.id, 'problem_solving', {'problem_id': problem.id, 'is_correct': True}, 30),
+    'daily_statistics': lambda user, problem: ActivityTrackingService.get_daily_statistics(
+        user.id, problem.created_at.date()),
+    'rebuild_user_rollups': lambda user, problem: ActivityTrackingService.rebuild_daily_rollups(user.id),
+    'record_problem_submission': lambda user, problem: ProblemService.record_submission(
+        Submission(problem_id=problem.id, is_correct=True, time_spent=30)),
+}
+
+
+@pytest.mark.parametrize('name', sorted(HOT_QUERIES))
+def test_hot_queries_use_indexes(app_context, count_queries, name):
+    """测试热点服务查询都走索引，没有全表扫描"""
+    user, problem = populate()
+    user_id, problem_id = user.id, problem.id
+    user, problem = User.query.get(user_id), Problem.query.get(problem_id)
+
+    with count_queries(with_parameters=True) as queries:
+        HOT_QUERIES[name](user, problem)
+
+    assert queries
+    assert full_scans(queries) == []
+
+
+def test_upgrade_schema_adds_columns_and_indexes(tmp_path):
+    """测试旧数据库升级后补齐新增的列和索引，原有数据保留"""
+    engine = create_engine(f'sqlite:///{tmp_path / "app.db"}')
+    with engine.begin() as conn:
+        conn.exec_driver_sql('CREATE TABLE submissions (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, '
+                             'problem_id INTEGER NOT NULL, code TEXT, language VARCHAR(20), '
+                             'is_correct BOOLEAN NOT NULL, time_spent INTEGER, submitted_at DATETIME)')
+        conn.exec_driver_sql('INSERT INTO submissions (user_id, problem_id, is_correct) VALUES (1, 1, 1)')
+
+    upgrade_schema(engine)
+    upgrade_schema(engine)  # 重复执行不报错
+
+    inspector = inspect(engine)
+    assert 'learning_path_id' in {c['name'] for c in inspector.get_columns('submissions')}
+    assert {i['name'] for i in inspector.get_indexes('submissions')} >= {
+        'ix_submissions_user_submitted', 'ix_submissions_user_correct', 'ix_submissions_user_problem'}
+    assert 'ix_user_activities_user_created' in {i['name'] for i in inspector.get_indexes('user_activities')}
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql('SELECT count(*) FROM submissions').scalar() == 1
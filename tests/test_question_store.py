@@ -0,0 +1,169 @@
+import json
+import os
+
+import pytest
+from question_store import QuestionStore, iter_json_records
+
+
+def question(i, url=True, **extra):
+    record = {'title': f'题目{i}', 'difficulty': 'easy', 'source': 'leetcode',
+              'url': f'https://leetcode.cn/problems/p{i}' if url else None, 'content': f'内容{i}'}
+    record.update(extra)
+    return record
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = QuestionStore(str(tmp_path / 'questions.jsonl'))
+    yield store
+    store.close()
+
+
+def test_add_skips_existing_title_or_url(store):
+    """测试按标题或链接去重，同一批内的重复也会跳过"""
+    assert store.add_many([question(1), question(2), question(1)]) == 2
+    assert store.add_many([question(3, title='题目1'),
+                           question(4, url=False, title='题目2'),
+                           question(5, url=False),
+                           {'title': '新标题', 'url': 'https://leetcode.cn/problems/p2'}]) == 1
+    assert len(store) == 3
+    assert store.contains(title='题目5')
+    assert store.contains(url='https://leetcode.cn/problems/p1')
+    assert not store.contains(title='题目9', url='https://leetcode.cn/problems/p9')
+    assert store.get(url='https://leetcode.cn/problems/p2')['content'] == '内容2'
+    assert [q['title'] for q in store] == ['题目1', '题目2', '题目5']
+
+
+def test_append_only_writes_new_records(store):
+    """测试追加写入不重写已有内容"""
+    store.add_many(question(i) for i in range(10))
+    with open(store.path, 'rb') as f:
+        head = f.read()
+    store.add_many(question(i) for i in range(5, 15))
+    with open(store.path, 'rb') as f:
+        content = f.read()
+    assert content.startswith(head)
+    assert content.count(b'\n') == 15
+
+
+def test_replace_and_compact(store):
+    """测试取代旧记录后压缩，只保留最新的有效记录"""
+    store.add_many(question(i) for i in range(20))
+    store.add_many((question(i, content='新内容') for i in range(0, 20, 2)), replace=True)
+    assert (len(store), store.stale_count) == (20, 10)
+    expected = list(store)
+
+    store.compact()
+
+    assert (len(store), store.stale_count) == (20, 0)
+    assert list(store) == expected
+    assert store.get(title='题目4')['content'] == '新内容'
+    with open(store.path, encoding='utf-8') as f:
+        assert sum(1 for _ in f) == 20
+
+
+def test_maybe_compact_threshold(store):
+    store.COMPACT_MIN_STALE = 5
+    store.add_many(question(i) for i in range(10))
+    store.add_many((question(i, content='新内容') for i in range(4)), replace=True)
+    assert not store.maybe_compact()
+    store.add_many((question(i, content='再次更新') for i in range(10)), replace=True)
+    assert store.maybe_compact()
+    assert store.stale_count == 0
+
+
+def test_recover_after_interrupted_write(tmp_path):
+    """测试只写了文件没写索引、以及末行写到一半时，重新打开能恢复一致"""
+    path = str(tmp_path / 'questions.jsonl')
+    with QuestionStore(path) as store:
+        store.add_many(question(i) for i in range(3))
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(question(3), ensure_ascii=False) + '\n')
+        f.write('{"title": "写到一半')
+
+    with QuestionStore(path) as store:
+        assert [q['title'] for q in store] == ['题目0', '题目1', '题目2', '题目3']
+        assert store.add(question(4))
+        assert len(store) == 5
+
+    os.remove(path + '.idx')
+    with QuestionStore(path) as store:
+        assert len(store) == 5
+
+
+def test_migrate_from_json(tmp_path, store):
+    """测试从旧版整文件 JSON 题库迁移"""
+    legacy = tmp_path / 'questions_db.json'
+    legacy.write_text(json.dumps([question(i) for i in range(5)] + [question(0)],
+                                 ensure_ascii=False, indent=2), encoding='utf-8')
+    assert store.migrate_from_json(str(legacy)) == 5
+    assert store.migrate_from_json(str(legacy)) == 0
+    assert list(store) == list(iter_json_records(str(legacy)))[:5]
+
+
+def test_upsert_only_appends_changed_content(store):
+    """测试重新抓取后内容未变时只更新抓取时间，内容变化时追加新记录"""
+    store.add_many([question(1, fetched_at=100), question(2, fetched_at=100)])
+    size = os.path.getsize(store.path)
+
+    assert store.upsert_many([question(1, fetched_at=200), question(2, content='新内容', fetched_at=200),
+                              question(3, fetched_at=200)]) == 2
+
+    assert store.get(title='题目2')['content'] == '新内容'
+    assert store.stale_count == 1
+    assert os.path.getsize(store.path) > size
+    assert not store.needs_fetch(title='题目1', ttl=50, now=240)
+    assert store.needs_fetch(title='题目1', ttl=50, now=260)
+
+
+def test_needs_fetch_ttl(store):
+    store.add_many([question(1, fetched_at=1000), question(2, url=False)])
+    assert store.needs_fetch(title='新题目', ttl=None)
+    assert not store.needs_fetch(url='https://leetcode.cn/problems/p1', ttl=None)
+    assert not store.needs_fetch(url='https://leetcode.cn/problems/p1', ttl=100, now=1050)
+    assert store.needs_fetch(url='https://leetcode.cn/problems/p1', ttl=100, now=1200)
+    assert store.needs_fetch(title='题目2', ttl=100, now=1050)  # 没有抓取时间的旧记录视为过期
+
+
+def test_checkpoints_survive_reopen_and_compaction(tmp_path):
+    """测试断点和只记录在索引中的抓取时间在重新打开和压缩后仍然保留"""
+    path = str(tmp_path / 'questions.jsonl')
+    with QuestionStore(path) as store:
+        store.add_many([question(1, fetched_at=100), question(2, fetched_at=100)])
+        store.upsert_many([question(1, fetched_at=500)])
+        store.add_many([question(2, content='新内容', fetched_at=100)], replace=True)
+        store.set_checkpoint('leetcode', {'offset': 20})
+    with QuestionStore(path) as store:
+        assert store.get_checkpoint('leetcode') == {'offset': 20}
+        assert store.get_checkpoint('nowcoder') == {}
+        store.compact()
+        assert store.get_checkpoint('leetcode') == {'offset': 20}
+        assert not store.needs_fetch(title='题目1', ttl=100, now=550)
+
+
+def test_old_index_is_rebuilt(tmp_path):
+    """测试旧版本的索引文件会从数据文件重建"""
+    path = str(tmp_path / 'questions.jsonl')
+    with QuestionStore(path) as store:
+        store.add_many([question(1, fetched_at=100)])
+        store.db.execute('PRAGMA user_version = 1')
+    with QuestionStore(path) as store:
+        assert len(store) == 1
+        assert not store.needs_fetch(title='题目1', ttl=100, now=150)
+
+
+def test_malformed_record_in_array_is_bounded(tmp_path):
+    """测试数组中格式错误的记录不会让缓冲区无限增长，报错时给出记录的偏移"""
+    path = tmp_path / 'problems.json'
+    good = json.dumps(question(1), ensure_ascii=False)
+    prefix = f'[{good}, '
+    path.write_text(prefix + '{"title": "坏记录",, ' + ', '.join([good] * 200) + ']', encoding='utf-8')
+
+    records = iter_json_records(str(path), chunk_size=64, max_record_size=1024)
+    assert next(records) == question(1)
+    with pytest.raises(ValueError, match=f'偏移 {len(prefix)} '):
+        next(records)
+
+    path.write_text(prefix + '{"title": "未结束"', encoding='utf-8')
+    with pytest.raises(ValueError, match=f'偏移 {len(prefix)} '):
+        list(iter_json_records(str(path), chunk_size=64))
@@ -0,0 +1,482 @@
+import json
+import random
+
+import numpy as np
+import pytest
+from app import app, db
+from models import User, Problem, Submission, UserActivity, DailyActivityRollup
+from services import UserService, ProblemService, ActivityTrackingService, RecommendationService
+from datetime import datetime, timedelta, UTC
+
+
+def create_user(username='testuser'):
+    user = User(username=username, email=f'{username}@example.com')
+    user.set_password('testpass')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def create_problems(difficulties=('easy', 'medium', 'hard')):
+    problems = [Problem(title=f'题目{i}', content='内容', difficulty=d, source='test')
+                for i, d in enumerate(difficulties)]
+    db.session.add_all(problems)
+    db.session.commit()
+    return problems
+
+
+def test_user_statistics_aggregate(app_context):
+    """测试最近24小时统计只统计窗口内的提交"""
+    user = create_user()
+    problem = create_problems()[0]
+    now = datetime.now(UTC)
+    for minutes, correct, time_spent in [(10, True, 300), (20, False, 600), (30, True, 900)]:
+        db.session.add(Submission(user_id=user.id, problem_id=problem.id, is_correct=correct,
+                                  time_spent=time_spent, submitted_at=now - timedelta(minutes=minutes)))
+    db.session.add(Submission(user_id=user.id, problem_id=problem.id, is_correct=True,
+                              time_spent=1000, submitted_at=now - timedelta(hours=30)))
+    db.session.commit()
+
+    stats = UserService.get_user_statistics(user)
+
+    assert stats['total_time'] == 1800
+    assert stats['activity_count'] == 3
+    assert stats['average_effectiveness'] == pytest.approx(2 / 3)
+    assert stats['fatigue_level'] == pytest.approx(0.5 * (1 - 2 / 3))
+
+
+def test_user_statistics_cache_invalidation(app_context):
+    """测试统计缓存命中与提交后失效"""
+    user = create_user()
+    problem = create_problems()[0]
+    assert UserService.get_user_statistics(user)['activity_count'] == 0
+
+    db.session.add(Submission(user_id=user.id, problem_id=problem.id, is_correct=True, time_spent=60))
+    db.session.commit()
+    assert UserService.get_user_statistics(user)['activity_count'] == 0
+
+    UserService.invalidate_statistics(user.id)
+    assert UserService.get_user_statistics(user)['activity_count'] == 1
+
+
+def test_daily_rollup_tracks_activities(app_context):
+    """测试记录活动时同步更新每日汇总"""
+    user = create_user()
+    problem = create_problems()[0]
+    problem.average_time = 20
+    db.session.commit()
+
+    first = ActivityTrackingService.record_activity(user.id, 'review', {}, 240)
+    second = ActivityTrackingService.record_activity(
+        user.id, 'problem_solving', {'problem_id': problem.id, 'is_correct': True}, 10)
+    third = ActivityTrackingService.record_activity(user.id, 'review', {}, 30)
+
+    assert first.fatigue_level == 0
+    assert second.fatigue_level == pytest.approx(0.5)
+    assert third.fatigue_level == pytest.approx(250 / 480)
+    stats = ActivityTrackingService.get_daily_statistics(user.id, datetime.utcnow().date())
+    assert stats == {
+        'total_time': 280,
+        'average_effectiveness': pytest.approx(1.0 / 3),
+        'activity_count': 3,
+        'fatigue_level': pytest.approx(250 / 480),
+    }
+    empty = ActivityTrackingService.get_daily_statistics(user.id, datetime(2000, 1, 1))
+    assert empty['activity_count'] == 0
+
+
+def test_fatigue_uses_rolling_window_across_midnight(app_context):
+    """测试疲劳度按最近 24 小时计算，跨过零点时昨天的学习时间按比例计入"""
+    user = create_user()
+    evening = datetime(2024, 3, 4, 23, 0)
+    ActivityTrackingService.record_activity(user.id, 'review', {}, 240, now=evening)
+
+    after_midnight = ActivityTrackingService.record_activity(
+        user.id, 'review', {}, 30, now=datetime(2024, 3, 5, 0, 30))
+    assert after_midnight.fatigue_level == pytest.approx(240 * (1 - 0.5 / 24) / 480)
+
+    next_evening = ActivityTrackingService.record_activity(
+        user.id, 'review', {}, 30, now=datetime(2024, 3, 5, 23, 30))
+    assert next_evening.fatigue_level == pytest.approx((30 + 240 * (0.5 / 24)) / 480)
+
+    two_days_later = ActivityTrackingService.record_activity(
+        user.id, 'review', {}, 30, now=datetime(2024, 3, 7, 0, 30))
+    assert two_days_later.fatigue_level == 0
+
+
+def test_rebuild_daily_rollups(app_context):
+    """测试从原始记录批量重建每日汇总"""
+    user = create_user()
+    problem = create_problems()[0]
+    day = datetime(2024, 3, 4, 10)
+    db.session.add_all([
+        UserActivity(user_id=user.id, activity_type='review', time_spent=30,
+                     effectiveness_score=0.5, fatigue_level=0.2, created_at=day),
+        UserActivity(user_id=user.id, activity_type='review', time_spent=60,
+                     effectiveness_score=0.7, fatigue_level=0.4, created_at=day + timedelta(hours=2)),
+        UserActivity(user_id=user.id, activity_type='review', time_spent=15,
+                     fatigue_level=0.1, created_at=day + timedelta(days=1)),
+        Submission(user_id=user.id, problem_id=problem.id, is_correct=True, time_spent=100, submitted_at=day),
+        Submission(user_id=user.id, problem_id=problem.id, is_correct=False, time_spent=50,
+                   submitted_at=day + timedelta(days=2)),
+    ])
+    db.session.commit()
+
+    assert ActivityTrackingService.rebuild_daily_rollups() == 3
+    stats = ActivityTrackingService.get_daily_statistics(user.id, day.date())
+    assert stats['total_time'] == 90
+    assert stats['activity_count'] == 2
+    assert stats['average_effectiveness'] == pytest.approx(0.6)
+    assert stats['fatigue_level'] == pytest.approx(0.4)
+    rollup = DailyActivityRollup.query.filter_by(user_id=user.id, day=day.date()).one()
+    assert (rollup.submission_count, rollup.correct_count, rollup.submission_time) == (1, 1, 100)
+
+    assert ActivityTrackingService.rebuild_daily_rollups(user_id=user.id) == 3
+    assert DailyActivityRollup.query.count() == 3
+
+
+def test_submission_updates_rollup(app_context):
+    """测试提交题目时在同一事务中更新汇总"""
+    user = create_user()
+    problem = create_problems()[0]
+    client = app.test_client()
+    client.post('/login', json={'username': 'testuser', 'password': 'testpass'})
+    for correct in (True, False):
+        response = client.post(f'/submit/{problem.id}', json={'is_correct': correct, 'time_spent': 120})
+        assert response.status_code == 200
+
+    rollup = DailyActivityRollup.query.filter_by(user_id=user.id).one()
+    assert (rollup.submission_count, rollup.correct_count, rollup.submission_time) == (2, 1, 240)
+
+
+def legacy_user_features(user):
+    """原实现：逐条加载提交并访问 problem 关系"""
+    submissions = Submission.query.filter_by(user_id=user.id).all()
+    times = [s.time_spent for s in submissions]
+    by_difficulty = {}
+    for s in submissions:
+        by_difficulty.setdefault(s.problem.difficulty, []).append(1 if s.is_correct else 0)
+    scores = [sum(r) / len(r) * RecommendationService.DIFFICULTY_SCORES[d] for d, r in by_difficulty.items()]
+    return np.array([
+        sum(1 for s in submissions if s.is_correct) / len(submissions),
+        sum(times) / len(times),
+        1 - np.std(times) / np.mean(times),
+        sum(scores) / len(scores),
+    ])
+
+
+def test_user_features_single_query(app_context, count_queries):
+    """测试用户特征只用一条聚合查询，结果与逐条计算一致"""
+    user = create_user()
+    problems = create_problems(['easy', 'medium', 'hard', 'medium'])
+    rng = random.Random(3)
+    db.session.execute(Submission.__table__.insert(), [
+        {'user_id': user.id, 'problem_id': rng.choice(problems).id,
+         'is_correct': rng.random() < 0.6, 'time_spent': rng.randrange(30, 900)}
+        for _ in range(2000)
+    ])
+    db.session.commit()
+    db.session.refresh(user)
+    service = RecommendationService()
+
+    with count_queries() as statements:
+        features = service.get_user_features(user)
+
+    assert len(statements) == 1
+    assert features == pytest.approx(legacy_user_features(user), rel=1e-9)
+
+
+def test_user_features_without_submissions(app_context):
+    """测试没有提交记录的用户"""
+    user = create_user()
+    assert RecommendationService().get_user_features(user).tolist() == [0, 0, 0, 0]
+
+
+def add_submissions(rows):
+    submissions = [Submission(user_id=u, problem_id=p, is_correct=c, time_spent=t) for u, p, c, t in rows]
+    db.session.add_all(submissions)
+    db.session.commit()
+    return submissions
+
+
+def test_recommendations_from_similar_users(app_context):
+    """测试推荐来自相似用户做对、且目标用户尚未完成的题目"""
+    alice, bob, carol = create_user('alice'), create_user('bob'), create_user('carol')
+    problems = create_problems(['easy', 'easy', 'medium', 'medium', 'hard', 'hard'])
+    p = [problem.id for problem in problems]
+    add_submissions([
+        (alice.id, p[0], True, 300), (alice.id, p[2], True, 600), (alice.id, p[4], False, 900),
+        (bob.id, p[0], True, 320), (bob.id, p[2], True, 580), (bob.id, p[3], True, 610),
+        (bob.id, p[4], False, 880),
+        (carol.id, p[1], False, 60), (carol.id, p[5], True, 1800), (carol.id, p[5], False, 1900),
+    ])
+    service = RecommendationService()
+    service.refresh()
+
+    recommended = [problem.id for problem in service.recommend_problems(alice, count=1)]
+
+    assert recommended == [p[3]]
+
+
+def test_recommendations_before_refresh_fall_back(app_context, count_queries):
+    """测试矩阵构建完成前请求不会构建矩阵，只按难度补充"""
+    user = create_user()
+    problems = create_problems(['medium', 'medium'])
+    add_submissions([(user.id, problems[0].id, True, 60)])
+    service = RecommendationService()
+
+    with count_queries() as statements:
+        recommended = service.recommend_problems(user, count=5)
+
+    assert [p.id for p in recommended] == [problems[1].id]
+    assert not any('GROUP BY' in s for s in statements)
+    assert not service._ready
+
+
+def test_refresh_skips_unknown_problems(app_context):
+    """测试引用已删除题目的提交不会让重建和增量更新失败"""
+    user = create_user()
+    problems = create_problems(['easy', 'medium'])
+    add_submissions([(user.id, problems[0].id, True, 60), (user.id, 9999, True, 60)])
+    service = RecommendationService()
+    service.refresh()
+    assert service.interactions.nnz == 1
+
+    service.record_submission(add_submissions([(user.id, 8888, True, 30)])[0])
+    service.record_submission(add_submissions([(user.id, problems[1].id, True, 30)])[0])
+    service.recommend_problems(user)
+    assert 8888 not in service.problem_index
+    assert service.interactions.nnz == 2
+
+
+def test_submissions_during_refresh_are_replayed(app_context):
+    """测试重建期间记录的提交在重建完成后补上，快照中已有的不重复计入"""
+    users = [create_user(f'user{i}') for i in range(3)]
+    problems = create_problems(['easy', 'medium', 'hard'])
+    add_submissions([(users[0].id, problems[0].id, True, 100), (users[1].id, problems[1].id, False, 200)])
+
+    class ConcurrentService(RecommendationService):
+        def _feature_query(self):
+            # 模拟快照之后、重建完成之前其他请求写入的提交
+            if self._replay is not None and not self._replay:
+                for submission in add_submissions([(users[2].id, problems[2].id, True, 300)]):
+                    self.record_submission(submission)
+            return super()._feature_query()
+
+    service = ConcurrentService()
+    service.refresh()
+    service.recommend_problems(users[0])
+    rebuilt = RecommendationService()
+    rebuilt.refresh()
+
+    order = [service.user_index[u] for u in rebuilt.user_index]
+    columns = [service.problem_index[p] for p in rebuilt.problem_ids]
+    assert service.feature_matrix[order] == pytest.approx(rebuilt.feature_matrix, rel=1e-9)
+    assert (service.interactions[order][:, columns] != rebuilt.interactions).nnz == 0
+
+
+def test_recommendation_incremental_update(app_context):
+    """测试增量更新后的矩阵与全量重建一致"""
+    users = [create_user(f'user{i}') for i in range(4)]
+    problems = create_problems(['easy', 'medium', 'hard'] * 3)
+    rng = random.Random(5)
+    add_submissions([(rng.choice(users).id, rng.choice(problems).id, rng.random() < 0.6,
+                      rng.randrange(30, 900)) for _ in range(40)])
+    service = RecommendationService()
+    service.refresh()
+
+    newcomer = create_user('newcomer')
+    extra = create_problems(['medium'])
+    for submission in add_submissions([(newcomer.id, extra[0].id, True, 200),
+                                       (users[1].id, problems[0].id, True, 100)]):
+        service.record_submission(submission)
+    service.recommend_problems(users[0])
+    rebuilt = RecommendationService()
+    rebuilt.refresh()
+
+    order = [service.user_index[u] for u in rebuilt.user_index]
+    columns = [service.problem_index[p] for p in rebuilt.problem_ids]
+    assert service.feature_matrix[order] == pytest.approx(rebuilt.feature_matrix, rel=1e-9)
+    assert (service.interactions[order][:, columns] != rebuilt.interactions).nnz == 0
+
+
+def test_fallback_excludes_solved_problems(app_context, count_queries):
+    """测试按难度补充推荐时排除已做对的题目，已做题目很多时也不受参数个数限制"""
+    user = create_user()
+    problems = create_problems(['medium'] * 1500)
+    add_submissions([(user.id, problem.id, True, 60) for problem in problems[:1499]])
+    db.session.refresh(user)
+
+    with count_queries() as statements:
+        recommended = RecommendationService()._recommend_by_difficulty(user, 5)
+
+    assert [p.id for p in recommended] == [problems[-1].id]
+    assert 'NOT (EXISTS' in statements[0]
+
+
+def test_solved_problems_updated_on_submission(app_context, count_queries):
+    """测试正确提交后已做对的题目随之更新"""
+    user_id = create_user().id
+    problems = create_problems(['easy', 'medium', 'hard'])
+    service = RecommendationService()
+    add_submissions([(user_id, problems[0].id, True, 60), (user_id, problems[1].id, False, 60)])
+
+    solved = service.get_solved_problems(user_id)
+    assert [service.is_solved(solved, p.id) for p in problems] == [True, False, False]
+
+    for submission in add_submissions([(user_id, problems[2].id, True, 60)]):
+        service.record_submission(submission)
+    with count_queries() as statements:
+        solved = service.get_solved_problems(user_id)
+    assert statements == []
+    assert [service.is_solved(solved, p.id) for p in problems] == [True, False, True]
+    assert solved.tolist() == sorted([problems[0].id, problems[2].id])
+
+
+def test_solved_problems_size_independent_of_ids(app_context):
+    """测试已做对题目的缓存大小只与题数有关，与题目 ID 的大小无关"""
+    user_id = create_user().id
+    RecommendationService._solved_cache[user_id] = RecommendationService.get_solved_problems(user_id)
+    for problem_id in (999_999, 5, 70_000, 5):
+        RecommendationService.mark_solved(user_id, problem_id)
+    solved = RecommendationService.get_solved_problems(user_id)
+    assert solved.tolist() == [5, 70_000, 999_999]
+    assert solved.nbytes == 12
+    assert RecommendationService.is_solved(solved, 999_999)
+    assert not RecommendationService.is_solved(solved, 6)
+    assert not RecommendationService.is_solved(solved, 2_000_000)
+
+
+def test_solved_cache_is_bounded_lru(app_context, monkeypatch):
+    """测试已做对题目的缓存按 LRU 淘汰，最近读取的用户保留"""
+    monkeypatch.setattr(RecommendationService, 'SOLVED_CACHE_SIZE', 2)
+    for user_id in (1, 2):
+        RecommendationService.get_solved_problems(user_id)
+    RecommendationService.get_solved_problems(1)
+    RecommendationService.get_solved_problems(3)
+    assert list(RecommendationService._solved_cache) == [1, 3]
+
+
+def test_recommendations_exclude_problems_solved_elsewhere(app_context):
+    """测试其他进程写入的正确提交（本进程的矩阵和缓存都没看到）也不会被推荐"""
+    alice, bob, carol = create_user('alice'), create_user('bob'), create_user('carol')
+    problems = create_problems(['easy', 'easy', 'medium', 'medium', 'hard', 'hard'])
+    p = [problem.id for problem in problems]
+    add_submissions([
+        (alice.id, p[0], True, 300), (alice.id, p[2], True, 600), (alice.id, p[4], False, 900),
+        (bob.id, p[0], True, 320), (bob.id, p[2], True, 580), (bob.id, p[3], True, 610),
+        (bob.id, p[4], False, 880),
+        (carol.id, p[1], False, 60), (carol.id, p[5], True, 1800), (carol.id, p[5], False, 1900),
+    ])
+    service = RecommendationService()
+    service.refresh()
+    assert [problem.id for problem in service.recommend_problems(alice, count=1)] == [p[3]]
+    add_submissions([(alice.id, p[3], True, 500)])  # 其他 worker 处理的提交
+
+    recommended = [problem.id for problem in service.recommend_problems(alice, count=1)]
+
+    assert p[3] not in recommended
+
+
+def test_problem_statistics_incremental(app_context, count_queries):
+    """测试逐次提交更新的题目统计与全量重算一致，每次提交只发一条 UPDATE"""
+    user = create_user()
+    problems = create_problems(['easy', 'medium', 'hard'])
+    rng = random.Random(11)
+    rows = [(user.id, rng.choice(problems[:2]).id, rng.random() < 0.5, rng.choice([None, 60, 300]))
+            for _ in range(50)]
+    submissions = add_submissions(rows)
+    with count_queries() as statements:
+        for submission in submissions:
+            ProblemService.record_submission(submission)
+    db.session.commit()
+    assert sum(1 for s in statements if s.startswith('UPDATE problems')) == len(rows)
+
+    incremental = [(p.submission_count, p.success_rate, p.average_time)
+                   for p in Problem.query.order_by(Problem.id)]
+    ProblemService.recompute_statistics()
+    expected = [(p.submission_count, p.success_rate, p.average_time)
+                for p in Problem.query.order_by(Problem.id)]
+    assert incremental[2] == expected[2] == (0, 0.0, 0.0)
+    for got, want in zip(incremental, expected):
+        assert got == pytest.approx(want, rel=1e-9)
+
+
+def test_submit_route_updates_problem_statistics(app_context):
+    """测试提交后题目统计随提交一起写入数据库"""
+    create_user()
+    problem_id = create_problems(['easy'])[0].id
+    with app.test_client() as client:
+        client.post('/login', json={'username': 'testuser', 'password': 'testpass'})
+        for correct, time_spent in [(True, 60), (False, 120), (True, None)]:
+            client.post(f'/submit/{problem_id}', json={'code': 'pass', 'is_correct': correct,
+                                                        'time_spent': time_spent})
+    db.session.expire_all()
+    problem = Problem.query.get(problem_id)
+    assert problem.submission_count == 3
+    assert problem.success_rate == pytest.approx(2 / 3)
+    assert problem.average_time == pytest.approx(60)
+
+
+def test_record_activity_without_problem_statistics(app_context):
+    """测试题目尚无统计或用时为 0 时记录活动不会除零"""
+    user = create_user()
+    problem = create_problems()[0]
+    for time_spent in (0, 120):
+        activity = ActivityTrackingService.record_activity(
+            user.id, 'problem_solving', {'problem_id': problem.id, 'is_correct': True}, time_spent)
+        assert activity.effectiveness_score == pytest.approx(1.0)
+
+
+def test_bulk_import_deduplicates_by_title(app_context, tmp_path):
+    """测试批量导入跳过已存在和文件内重复的标题，数组与 JSON Lines 结果一致"""
+    create_problems(['easy'])
+    records = [{'title': f'新题{i % 7}', 'content': '内容', 'difficulty': 'medium', 'tags': ['array']}
+               for i in range(20)]
+    records += [{'title': '题目0', 'content': '内容', 'difficulty': 'hard'},
+                {'title': '缺少内容', 'difficulty': 'hard'}]
+    array_file = tmp_path / 'problems.json'
+    array_file.write_text(json.dumps(records, ensure_ascii=False, indent=2), encoding='utf-8')
+    lines_file = tmp_path / 'problems.jsonl'
+    lines_file.write_text('\n'.join(json.dumps(r, ensure_ascii=False) for r in records), encoding='utf-8')
+
+    assert ProblemService.bulk_import(str(array_file), batch_size=3) == (7, 15)
+    assert ProblemService.bulk_import(str(lines_file), batch_size=4) == (0, 22)
+    problem = Problem.query.filter_by(title='新题3').one()
+    assert (problem.source, problem.tags, problem.submission_count) == ('system', ['array'], 0)
+    assert problem.created_at is not None
+    assert Problem.query.count() == 8
+    assert [p.title for p in Problem.query.order_by(Problem.id)][1:] == [f'新题{i}' for i in range(7)]
+
+
+def test_bulk_import_transaction(app_context):
+    """测试批量导入不会提交调用方的改动；commit=True 时中途出错整体回滚"""
+    records = [{'title': f'题目{i}', 'content': '内容', 'difficulty': 'easy'} for i in range(10)]
+    db.session.add(User(username='pending', email='pending@example.com'))
+    assert ProblemService.bulk_import(iter(records), batch_size=3) == (10, 0)
+    db.session.rollback()
+    assert Problem.query.count() == 0
+    assert User.query.count() == 0
+
+    def failing():
+        yield from records
+        raise ValueError('文件损坏')
+
+    with pytest.raises(ValueError):
+        ProblemService.bulk_import(failing(), batch_size=3, commit=True)
+    assert Problem.query.count() == 0
+    assert ProblemService.bulk_import(iter(records), batch_size=3, commit=True) == (10, 0)
+    db.session.rollback()
+    assert Problem.query.count() == 10
+
+
+def test_bulk_import_deduplicates_by_url(app_context):
+    """测试按链接去重时同名但链接不同的题目都会导入，没有链接的按标题去重"""
+    records = [
+        {'title': '两数之和', 'content': '内容', 'difficulty': 'easy', 'url': 'https://leetcode.cn/problems/two-sum'},
+        {'title': '两数之和', 'content': '内容', 'difficulty': 'easy', 'url': 'https://www.nowcoder.com/two-sum'},
+        {'title': '两数之和', 'content': '内容', 'difficulty': 'easy', 'url': 'https://leetcode.cn/problems/two-sum'},
+        {'title': '无链接', 'content': '内容', 'difficulty': 'easy'},
+        {'title': '无链接', 'content': '内容', 'difficulty': 'easy'},
+    ]
+    assert ProblemService.bulk_import(iter(records), key='url') == (3, 2)